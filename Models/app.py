@@ -1,75 +1,75 @@
 import uvicorn
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
+from typing import List
 from triage_logic import TriageEngine
+from explanation_service import ExplanationService
+from model_registry import ModelRegistry
+from model_metrics import ModelMetricsStore
+from executors import Executors
+from database import ConnectionPool, migrate, table_columns, risk_priority, PATIENT_INSERT_SQL
+from pagination import KeysetQuery, drive_chunks, parse_fields, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, RESPONSE_FORMATS
+from patient_queue import WaitingQueue
+from patient_stats import PatientStats
+from live_updates import QueueBroadcaster
+from archive import PatientArchiver
+from write_behind import GroupCommitWriter
+from micro_batcher import MicroBatcher, DEFAULT_WINDOW_MS, DEFAULT_MAX_BATCH_SIZE
+from ehr_parser import spool_upload, parse_spooled_ehr, UploadTooLarge, MAX_UPLOAD_BYTES, MAX_PAGES
+from clinical_extractor import EXTRACTOR
+from ehr_cache import EhrParseCache
+from bulk_ingest import IngestPipeline, list_members, BULK_MAX_UPLOAD_BYTES, BULK_MAX_FILES
 from train_model_v2 import train_model
 import os
-import io
-import re
-from pypdf import PdfReader
+import asyncio
+import hashlib
+import json
+import time
 import requests
 
 
 import sqlite3
-from collections import Counter
 
 # --- Database Setup ---
-DB_NAME = "patients.db"
+# Pooled, WAL-mode connections to Models/patients.db (see database.py)
+db = ConnectionPool()
+
+# Create / upgrade the schema on startup (versioned migrations, see database.py)
+migrate(db)
+
+# In-memory heap of waiting patients behind /doctor/next (claims persist via conditional UPDATE)
+waiting_queue = WaitingQueue(db)
+# Valid ?fields= projections
+PATIENT_COLUMNS = table_columns(db, 'patients')
+# /admin/stats counters and trend rollups (kept by triggers, cached per process)
+patient_stats = PatientStats(db)
+# Server-sent queue deltas for dashboards (GET /events/queue)
+queue_events = QueueBroadcaster(db)
+# Completed visits move to monthly archive tables on a timer (see archive.py)
+archiver = PatientArchiver(db)
 
-def init_db():
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    
-    # Unified Users Table (RBAC)
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE,
-            password TEXT,
-            role TEXT, -- 'doctor' or 'patient'
-            name TEXT,
-            specialty TEXT -- Nullable, for doctors
-        )
-    ''')
-
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS patients (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER, -- FK to users.id
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            age INTEGER,
-            gender TEXT,
-            symptoms TEXT,
-            bp INTEGER,
-            heart_rate INTEGER,
-            temp REAL,
-            o2_sat INTEGER,
-            pain_level INTEGER,
-            consciousness TEXT,
-            condition TEXT,
-            risk_level TEXT,
-            department TEXT,
-            confidence REAL,
-            visit_status TEXT DEFAULT 'Waiting'
-        )
-    ''')
-    
-    # Seed default doctor if not exists
-    c.execute("SELECT count(*) FROM users WHERE username='admin'")
-    if c.fetchone()[0] == 0:
-        c.execute("INSERT INTO users (username, password, role, name, specialty) VALUES (?, ?, ?, ?, ?)", 
-                  ('admin', 'admin123', 'doctor', 'Dr. MedCognis Health', 'Chief Medical Officer'))
-        print("✅ Default Doctor (admin) created.")
+app = FastAPI(title="MedCognis Health AI Triage System")
 
-    conn.commit()
-    conn.close()
+# Executor layer: route handlers await blocking work here so the event loop only does I/O
+executors = Executors()
 
-# Initialize DB on startup
-init_db()
+@app.on_event("startup")
+def start_archiver():
+    # Per serving process (each pre-forked worker runs its own startup)
+    archiver.start()
 
-app = FastAPI(title="MedCognis Health AI Triage System")
+@app.on_event("shutdown")
+def shutdown_pools():
+    archiver.stop()
+    # Flush queued patient rows before the connections go away
+    patient_writer.close()
+    queue_events.close()
+    executors.shutdown(wait=False)
+    db.close()
+    ehr_cache.close()
 
 # CORS for frontend
 app.add_middleware(
@@ -80,18 +80,123 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize Engine
+# Versioned model artifacts (model_versions/ next to triage_xgboost_v2.pkl)
+registry = ModelRegistry()
+
+# Initialize Engine on the registry's active version
 try:
-    engine = TriageEngine()
+    engine = TriageEngine(registry.bootstrap())
 except Exception as e:
     print(f"Failed to load model: {e}")
     engine = None
 
+def load_patient_record(patient_id):
+    """Rebuild the engine input for a stored patient row (used to re-explain older visits)."""
+    with db.connection() as conn:
+        # Older visits may already have been archived
+        row = archiver.find(conn, patient_id)
+    if row is None:
+        return None
+    return {
+        'Age': row['age'],
+        'Gender': row['gender'],
+        'Symptoms': row['symptoms'],
+        'Blood_Pressure': row['bp'],
+        'Heart_Rate': row['heart_rate'],
+        'Temperature': row['temp'],
+        'O2_Saturation': row['o2_sat'],
+        'Pain_Severity': row['pain_level'],
+        'Consciousness': row['consciousness'],
+        'Pre_Existing_Conditions': row['condition']
+    }
+
+# Deferred SHAP explanations (computed off the /predict latency budget)
+explanations = ExplanationService(engine, load_record=load_patient_record) if engine else None
+
+# Benchmarks computed once per model version in the background (at startup and on every swap)
+model_metrics = ModelMetricsStore(engine) if engine else None
+
+def after_fork():
+    """Called in each pre-forked worker (serve.py): background threads don't survive fork()."""
+    if engine:
+        engine.after_fork()
+    if model_metrics:
+        model_metrics.after_fork()
+    if explanations:
+        explanations.after_fork()
+    db.after_fork()
+    patient_stats.after_fork()
+    queue_events.after_fork()
+    archiver.after_fork()
+    patient_writer.after_fork()
+    ehr_cache.after_fork()
+
+# Concurrent single-patient /predict calls are coalesced into one vectorized engine call
+BATCH_WINDOW_MS = DEFAULT_WINDOW_MS
+BATCH_MAX_SIZE = DEFAULT_MAX_BATCH_SIZE
+batcher = MicroBatcher(engine, executors.model, window_ms=BATCH_WINDOW_MS, max_batch_size=BATCH_MAX_SIZE) if engine else None
+
 @app.get("/metrics")
 async def get_metrics():
-    """Return model performance metrics."""
-    metrics = engine.calculate_benchmarks()
-    return metrics
+    """Return model performance metrics for the active version (precomputed, served from memory)."""
+    if not engine:
+        raise HTTPException(status_code=500, detail="Model engine not initialized.")
+    return model_metrics.get(engine.model_version)
+
+@app.get("/admin/cache-stats")
+async def get_cache_stats():
+    """Hit/miss/eviction counters for the prediction and explanation caches."""
+    if not engine:
+        raise HTTPException(status_code=500, detail="Model engine not initialized.")
+    # The EHR cache counts its disk entries with a query: off the event loop like every DB read
+    ehr_stats = await executors.db.run(ehr_cache.stats)
+    return {
+        "status": "success",
+        "model_version": engine.model_version,
+        "prediction_cache": engine.prediction_cache.stats(),
+        "explanation_cache": explanations.stats(),
+        "ehr_parse_cache": ehr_stats
+    }
+
+@app.get("/admin/rule-stats")
+async def get_rule_stats():
+    """How many rows the safety rule table decided without running the model."""
+    if not engine:
+        raise HTTPException(status_code=500, detail="Model engine not initialized.")
+    return {"status": "success", **engine.rule_stats()}
+
+@app.get("/admin/executor-stats")
+async def get_executor_stats():
+    """Queue depth, queue wait and run time per executor pool."""
+    return {
+        "status": "success",
+        "pools": executors.stats(),
+        "db_connections": db.stats(),
+        "patient_writer": patient_writer.stats(),
+        "queue_events": queue_events.stats()
+    }
+
+@app.get("/admin/archive")
+async def get_archive_status():
+    """Archiver schedule / totals and the monthly partitions."""
+    partitions = await executors.db.run(archiver.partitions)
+    return {"status": "success", "archiver": archiver.stats(), "partitions": partitions}
+
+@app.post("/admin/archive")
+async def run_archive():
+    """Archive eligible completed visits now instead of waiting for the timer."""
+    try:
+        moved = await executors.db.run(archiver.run_once)
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+    return {"status": "success", "moved": moved, "archiver": archiver.stats()}
+
+@app.get("/admin/batch-stats")
+async def get_batch_stats():
+    """Micro-batching: batch-size and queue-wait histograms for /predict."""
+    if not batcher:
+        raise HTTPException(status_code=500, detail="Model engine not initialized.")
+    return {"status": "success", **batcher.stats()}
 
 @app.get("/health")
 async def health_check():
@@ -112,164 +217,277 @@ class PatientData(BaseModel):
     Pre_Existing_Conditions: str
     user_id: int = None  # Optional, links to registered user
 
+class BatchPatientData(BaseModel):
+    patients: List[PatientData]
+
 class ChatRequest(BaseModel):
     message: str
     history: list = []
 
 
+def patient_row(input_data, result):
+    """Build the `patients` INSERT parameters for one scored intake."""
+    return (
+        input_data.get('user_id'),
+        input_data['Age'],
+        input_data['Gender'],
+        input_data['Symptoms'],
+        input_data['Blood_Pressure'],
+        input_data['Heart_Rate'],
+        input_data['Temperature'],
+        input_data.get('O2_Saturation', 98),
+        input_data.get('Pain_Severity', 0),
+        input_data.get('Consciousness', 'Alert'),
+        input_data['Pre_Existing_Conditions'],
+        result['risk_level'],
+        result['department'],
+        result['confidence'],
+        risk_priority(result['risk_level'])
+    )
+
+# 'group': /predict rows arriving within a few ms share one transaction (one commit);
+# 'sync': one transaction per request. Both return the row id only once committed.
+PATIENT_WRITE_MODE = "group"
+patient_writer = GroupCommitWriter(db, PATIENT_INSERT_SQL, mode=PATIENT_WRITE_MODE, executor=executors.db)
+
+def insert_patients(records, results):
+    """Store a scored batch in a single transaction."""
+    try:
+        with db.transaction() as conn:
+            conn.executemany(PATIENT_INSERT_SQL, [patient_row(record, result) for record, result in zip(records, results)])
+    except Exception as e:
+        print(f"DB Error: {e}")
+
 @app.post("/predict")
-async def predict_risk(data: PatientData):
+async def predict_risk(data: PatientData, explain: str = "exact"):
+    """
+    `explain` is 'none', 'fast' or 'exact', or 'deferred' to return straight away with
+    an explanation handle that GET /explain/{patient_id} resolves later.
+    """
     if not engine:
         raise HTTPException(status_code=500, detail="Model engine not initialized.")
     
 
     # Convert Pydantic model to dict
     input_data = data.dict()
+    deferred = explain == "deferred"
     
     # Get Prediction from Engine
-    result = engine.predict_patient(input_data)
+    result = await batcher.predict(input_data, explain="none" if deferred else explain)
     if result.get("status") == "error":
         raise HTTPException(status_code=400, detail=result.get("message"))
         
     # Save to Database
+    patient_id = None
     try:
-        conn = sqlite3.connect(DB_NAME)
-        c = conn.cursor()
-        c.execute('''
-            INSERT INTO patients (user_id, age, gender, symptoms, bp, heart_rate, temp, o2_sat, pain_level, consciousness, condition, risk_level, department, confidence)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            input_data.get('user_id'),
-            input_data['Age'], 
-            input_data['Gender'], 
-            input_data['Symptoms'], 
-            input_data['Blood_Pressure'], 
-            input_data['Heart_Rate'], 
-            input_data['Temperature'],
-            input_data.get('O2_Saturation', 98),
-            input_data.get('Pain_Severity', 0),
-            input_data.get('Consciousness', 'Alert'),
-            input_data['Pre_Existing_Conditions'], 
-            result['risk_level'], 
-            result['department'], 
-            result['confidence']
-        ))
-        conn.commit()
+        patient_id = await patient_writer.insert(patient_row(input_data, result))
+        queue_events.notify()
     except Exception as e:
         print(f"DB Error: {e}")
-    finally:
-        conn.close()
+
+    if deferred:
+        if patient_id is not None:
+            explanations.submit(patient_id, input_data)
+            result["explanation"] = {"status": "pending", "patient_id": patient_id, "url": f"/explain/{patient_id}"}
+        else:
+            result["explanation"] = {"status": "unavailable"}
 
     return {**input_data, **result}
 
+@app.get("/explain/{patient_id}")
+async def get_explanation(patient_id: int):
+    """Resolve a deferred explanation handle returned by /predict?explain=deferred."""
+    if not explanations:
+        raise HTTPException(status_code=500, detail="Model engine not initialized.")
+    # May reload the stored row from SQLite for older visits
+    explanation = await executors.db.run(explanations.get, patient_id)
+    if explanation is None:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    return {"patient_id": patient_id, **explanation}
+
+@app.post("/predict/batch")
+async def predict_risk_batch(data: BatchPatientData, explain: str = "exact"):
+    """Score many patients in one vectorized engine call and store them in one transaction."""
+    if not engine:
+        raise HTTPException(status_code=500, detail="Model engine not initialized.")
+
+    records = [patient.dict() for patient in data.patients]
+    try:
+        results = await executors.model.run(engine.predict_batch, records, explain=explain)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Save all rows in a single transaction
+    await executors.db.run(insert_patients, records, results)
+    queue_events.notify()
+
+    return {
+        "status": "success",
+        "count": len(results),
+        "results": [{**record, **result} for record, result in zip(records, results)]
+    }
+
+# Listing order for keyset pagination; both end in id so the sort key is unique.
+# idx_patients_user_history / idx_patients_queue (+ rowid) serve them without a sort.
+HISTORY_KEYS = (('timestamp', 'DESC'), ('id', 'DESC'))
+QUEUE_KEYS = (('priority', 'ASC'), ('timestamp', 'ASC'), ('id', 'ASC'))
+
+def fetch_page(query, cursor, limit):
+    with db.connection() as conn:
+        return query.page(conn, cursor, limit)
+
+async def list_patients(query, limit, cursor, fmt, wrap):
+    """
+    Serve a patients listing. With `limit` or `cursor`: one bounded keyset page, the
+    next page's cursor in the X-Next-Cursor header. Without: every row, streamed
+    from the SQLite cursor in chunks. `wrap(rows, next_cursor)` gives the JSON body.
+    """
+    if fmt not in RESPONSE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format '{fmt}'. Use one of {RESPONSE_FORMATS}.")
+
+    if limit is None and cursor is None:
+        empty = json.dumps(wrap([], None))
+        prefix, suffix = empty.split('[]', 1) if fmt == 'json' else ('', '')
+        chunks = query.iter_chunks(db, fmt, prefix.encode(), suffix.encode())
+        media_type = "application/json" if fmt == 'json' else "application/x-ndjson"
+        return StreamingResponse(drive_chunks(chunks, executors.db), media_type=media_type)
+
+    limit = min(max(limit or DEFAULT_PAGE_SIZE, 1), MAX_PAGE_SIZE)
+    try:
+        rows, next_cursor = await executors.db.run(fetch_page, query, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    if fmt == 'ndjson':
+        body = ''.join(json.dumps(row, default=str) + '\n' for row in rows)
+        return Response(content=body, media_type="application/x-ndjson", headers=headers)
+    return JSONResponse(wrap(rows, next_cursor), headers=headers)
+
+def projection(fields):
+    try:
+        return parse_fields(fields, PATIENT_COLUMNS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.get("/history/{user_id}")
-async def get_patient_history(user_id: int):
+async def get_patient_history(user_id: int, limit: int = None, cursor: str = None, fields: str = None, format: str = "json"):
+    """Visits of one user, newest first. ?limit=&cursor= pages, ?fields=a,b projects, ?format=ndjson streams lines."""
+    columns = projection(fields)
+    # Hot table plus whichever archive partitions hold this user's visits
+    tables = await executors.db.run(archiver.tables_for_user, user_id)
+    query = KeysetQuery(tables, HISTORY_KEYS, "user_id = ?", (user_id,), columns, all_columns=PATIENT_COLUMNS)
+    return await list_patients(
+        query, limit, cursor, format,
+        lambda rows, next_cursor: {"status": "success", "history": rows, "next_cursor": next_cursor}
+    )
+
+def fetch_admin_stats():
     try:
-        conn = sqlite3.connect(DB_NAME)
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
-        c.execute("SELECT * FROM patients WHERE user_id=? ORDER BY timestamp DESC", (user_id,))
-        rows = c.fetchall()
-        history = [dict(row) for row in rows]
-        return {"status": "success", "history": history}
+        return patient_stats.summary()
     except Exception as e:
         return {"status": "error", "message": str(e)}
-    finally:
-        conn.close()
 
 @app.get("/admin/stats")
 async def get_admin_stats():
     """Fetch analytics for Admin HQ."""
+    return await executors.db.run(fetch_admin_stats)
+
+@app.get("/admin/stats/trends")
+async def get_admin_trends(granularity: str = "hour", buckets: int = None, department: str = None):
+    """Patient arrivals per hour/day (per department and risk level) for trend charts."""
     try:
-        conn = sqlite3.connect(DB_NAME)
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
-        
-        # Risk Distribution
-        c.execute("SELECT risk_level, COUNT(*) as count FROM patients GROUP BY risk_level")
-        risks = {row['risk_level']: row['count'] for row in c.fetchall()}
-        
-        # Department Load
-        c.execute("SELECT department, COUNT(*) as count FROM patients GROUP BY department")
-        depts = {row['department']: row['count'] for row in c.fetchall()}
-        
-        # Recent Patients
-        c.execute("SELECT * FROM patients ORDER BY timestamp DESC LIMIT 10")
-        recent = [dict(row) for row in c.fetchall()]
-        
-        return {
-            "status": "success",
-            "risk_distribution": risks,
-            "department_load": depts,
-            "recent_patients": recent
-        }
+        return await executors.db.run(patient_stats.trends, granularity, buckets, department)
     except Exception as e:
         return {"status": "error", "message": str(e)}
-    finally:
-        conn.close()
+
+# /parse_ehr limits: uploads above EHR_MAX_UPLOAD_BYTES get a 413, PDFs are read up to EHR_MAX_PAGES pages
+EHR_MAX_UPLOAD_BYTES = MAX_UPLOAD_BYTES
+EHR_MAX_PAGES = MAX_PAGES
+# Repeat uploads (same bytes) are answered from here instead of being parsed again
+ehr_cache = EhrParseCache()
 
 @app.post("/parse_ehr")
 async def parse_ehr(file: UploadFile = File(...)):
+    started = time.perf_counter()
+    filename = file.filename or ""
+    digest = hashlib.sha256()
     try:
-        content = await file.read()
-        text = ""
-        
-        # Determine file type
-        if file.filename.endswith(".pdf"):
-            pdf_file = io.BytesIO(content)
-            reader = PdfReader(pdf_file)
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
+        # Spooled to disk (size-capped) so the workers read the file instead of a pickled copy;
+        # hashed on the way through for the parse cache
+        path, size = await spool_upload(file, executors.io, EHR_MAX_UPLOAD_BYTES, digest)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    spooled = time.perf_counter()
+    digest = digest.hexdigest()
+    variant = f"pdf:{EHR_MAX_PAGES}" if filename.lower().endswith(".pdf") else "text"
+    try:
+        result, tier = await executors.db.run(ehr_cache.get, digest, variant)
+        if result is None:
+            # pypdf is pure Python: page ranges are extracted in the process pool
+            result = await parse_spooled_ehr(path, filename, executors.cpu, EHR_MAX_PAGES)
+            timings = result.pop("timings_ms")
+            await executors.db.run(ehr_cache.put, digest, variant, result)
         else:
-            # Assume text
-            text = content.decode("utf-8")
-            
-        # Simple Regex Extraction (Heuristic)
-        data = {}
-        
-        # Age
-        age_match = re.search(r"Age[:\s]+(\d+)", text, re.IGNORECASE)
-        if age_match:
-            data["Age"] = int(age_match.group(1))
-            
-        # Gender
-        if re.search(r"Male", text, re.IGNORECASE):
-            data["Gender"] = "Male"
-        elif re.search(r"Female", text, re.IGNORECASE):
-            data["Gender"] = "Female"
-            
-        # Symptoms (Keyword matching from known list)
-        symptoms_list = ["Chest Pain", "Fever", "Cough", "Numbness", "Abdominal Pain", "Headache", "Breathlessness", "Vomiting"]
-        for s in symptoms_list:
-            if re.search(re.escape(s), text, re.IGNORECASE):
-                data["Symptoms"] = s
-                break
-        
-        # Vitals
-        bp_match = re.search(r"BP[:\s]+(\d+)", text, re.IGNORECASE) # Systolic only for simplicity
-        if bp_match:
-            data["Blood_Pressure"] = int(bp_match.group(1))
-            
-        hr_match = re.search(r"Heart Rate[:\s]+(\d+)", text, re.IGNORECASE)
-        if hr_match:
-            data["Heart_Rate"] = int(hr_match.group(1))
-            
-        temp_match = re.search(r"Temp(?:erature)?[:\s]+(\d+\.?\d*)", text, re.IGNORECASE)
-        if temp_match:
-            data["Temperature"] = float(temp_match.group(1))
-            
-        # Pre-existing (Keyword matching)
-        conditions_list = ["Hypertension", "Diabetes", "Asthma", "Heart Disease"]
-        data["Pre_Existing_Conditions"] = "None"
-        for c in conditions_list:
-            if re.search(re.escape(c), text, re.IGNORECASE):
-                data["Pre_Existing_Conditions"] = c
-                break
-                
-        return {"status": "success", "data": data, "raw_text_preview": text[:200]}
-
+            timings = {"extract": 0.0}
     except Exception as e:
         return {"status": "error", "message": str(e)}
+    finally:
+        await executors.io.run(os.remove, path)
+    timings["spool"] = round((spooled - started) * 1000, 2)
+    timings["total"] = round((time.perf_counter() - started) * 1000, 2)
+    return {**result, "bytes": size, "sha256": digest, "cache": tier or "miss", "timings_ms": timings}
+
+def store_patients(records, results):
+    """Store a scored batch in a single transaction; returns the new patient ids in order."""
+    with db.transaction() as conn:
+        return [conn.execute(PATIENT_INSERT_SQL, patient_row(record, result)).lastrowid
+                for record, result in zip(records, results)]
+
+async def score_intakes(records):
+    return await executors.model.run(engine.predict_batch, records, explain="none")
+
+async def store_intakes(records, results):
+    ids = await executors.db.run(store_patients, records, results)
+    queue_events.notify()
+    return ids
+
+async def stream_ingest(pipeline, path, start):
+    try:
+        yield (json.dumps(start) + "\n").encode()
+        async for event in pipeline.run():
+            yield (json.dumps(event, default=str) + "\n").encode()
+    except Exception as e:
+        yield (json.dumps({"event": "summary", "status": "error", "message": str(e)}) + "\n").encode()
+    finally:
+        await executors.io.run(os.remove, path)
+
+@app.post("/ingest/bulk")
+async def ingest_bulk(file: UploadFile = File(...)):
+    """
+    Transfer a zip of EHR PDFs / text notes: every document is parsed, scored and
+    stored as a patient. Streams NDJSON progress: a "start" line, one "file" line
+    per document as it is stored / skipped / failed, then a "summary" line.
+    """
+    if not engine:
+        raise HTTPException(status_code=500, detail="Model engine not initialized.")
+    try:
+        path, size = await spool_upload(file, executors.io, BULK_MAX_UPLOAD_BYTES)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    try:
+        documents, ignored = await executors.io.run(list_members, path, BULK_MAX_FILES)
+    except ValueError as e:
+        await executors.io.run(os.remove, path)
+        raise HTTPException(status_code=400, detail=str(e))
+
+    pipeline = IngestPipeline(path, documents, executors.cpu, score_intakes, store_intakes, max_pages=EHR_MAX_PAGES)
+    start = {"event": "start", "files": len(documents), "ignored": ignored, "bytes": size}
+    # The spooled zip is removed when the stream ends (or the client goes away)
+    return StreamingResponse(stream_ingest(pipeline, path, start), media_type="application/x-ndjson")
+
+def write_upload(path, content):
+    with open(path, "wb") as f:
+        f.write(content)
 
 @app.post("/train")
 async def train_new_model(file: UploadFile = File(...)):
@@ -280,63 +498,93 @@ async def train_new_model(file: UploadFile = File(...)):
         file_path = os.path.join(data_dir, "uploaded_training_data.csv")
         
         content = await file.read()
-        with open(file_path, "wb") as f:
-            f.write(content)
+        await executors.io.run(write_upload, file_path, content)
             
-        # Train model
-        success, result = train_model(data_path=file_path)
+        # Train model in a separate process; the server keeps answering meanwhile
+        success, result = await executors.cpu.run(train_model, data_path=file_path)
         
         if success:
-            # Reload engine model
+            # Register the new artifact, then load + warm it in the background and swap
+            # it in atomically; /predict keeps serving the current version meanwhile.
+            version = await executors.io.run(registry.register, result["path"], source=file.filename)
             if engine:
-                engine.reload_model()
-            return {"status": "success", "metrics": result}
+                engine.load_model_async(registry.path_for(version), on_swap=registry.mark_active)
+            return {"status": "success", "metrics": result, "model_version": version, "swap": "loading"}
         else:
             return {"status": "error", "message": result}
             
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+@app.get("/models")
+async def list_models():
+    """Registered model versions plus the active / previous ones held in memory."""
+    return {
+        "status": "success",
+        "active_version": engine.model_version if engine else None,
+        "previous_version": engine.previous_version if engine else None,
+        "registry": registry.describe()
+    }
+
+@app.post("/models/rollback")
+async def rollback_model():
+    """Instantly swap back to the previously active model version."""
+    if not engine:
+        raise HTTPException(status_code=500, detail="Model engine not initialized.")
+    try:
+        version = engine.rollback()
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    await executors.io.run(registry.mark_active, version)
+    return {"status": "success", "active_version": version}
+
+@app.post("/models/{version}/activate")
+async def activate_model(version: str):
+    """Load a registered version in the background and hot-swap it in."""
+    if not engine:
+        raise HTTPException(status_code=500, detail="Model engine not initialized.")
+    path = registry.path_for(version)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail=f"Unknown model version {version}")
+    engine.load_model_async(path, on_swap=registry.mark_active)
+    return {"status": "loading", "model_version": version, "active_version": engine.model_version}
+
 @app.post("/analyze-report")
 async def analyze_report(data: dict):
     """
     Analyze a medical report text and return structured insights.
     """
     text = data.get("report", "")
-    age = data.get("age", 30)
-    gender = data.get("gender", "Male")
-    
-    # Simple extraction logic (can be improved with LLM)
-    symptoms = []
-    if "fever" in text.lower(): symptoms.append("Fever")
-    if "cough" in text.lower(): symptoms.append("Cough")
-    if "chest pain" in text.lower(): symptoms.append("Chest Pain")
-    if "breath" in text.lower(): symptoms.append("Shortness of Breath")
-    
-    # Default vitals if not found
+    # One pass over the report: symptoms, conditions, vitals, negations
+    entities = EXTRACTOR.extract(text)
+    symptoms = entities["symptoms"]
+    found = EXTRACTOR.engine_fields(entities)
+
+    # Measured vitals feed the engine; the defaults only fill what the report doesn't state
     vitals = {
-        "heartRate": 85,
-        "bloodPressure": "120/80",
-        "spo2": 97,
-        "temperature": 37.2
+        "heartRate": found.get("Heart_Rate", 85),
+        "bloodPressure": (f"{entities['vitals']['bp_systolic']}/{entities['vitals'].get('bp_diastolic', 80)}"
+                          if "bp_systolic" in entities["vitals"] else "120/80"),
+        "spo2": found.get("O2_Saturation", 97),
+        "temperature": found.get("Temperature", 37.2)
     }
-    
+
     # Predict risk using engine
     risk_data = {
-        "Age": age,
-        "Gender": gender,
-        "Symptoms": ";".join(symptoms) if symptoms else "None",
-        "Blood_Pressure": 120, # Simplified
+        "Age": data.get("age", found.get("Age", 30)),
+        "Gender": data.get("gender", found.get("Gender", "Male")),
+        "Symptoms": found.get("Symptoms", "None"),
+        "Blood_Pressure": found.get("Blood_Pressure", 120),
         "Heart_Rate": vitals["heartRate"],
         "Temperature": vitals["temperature"],
         "O2_Saturation": vitals["spo2"],
-        "Pain_Severity": 3,
-        "Consciousness": "Alert",
-        "Pre_Existing_Conditions": "None"
+        "Pain_Severity": found.get("Pain_Severity", 3),
+        "Consciousness": found.get("Consciousness", "Alert"),
+        "Pre_Existing_Conditions": found.get("Pre_Existing_Conditions", "None")
     }
     
     try:
-        prediction = engine.predict_patient(risk_data) if engine else {"risk_level": "Low", "risk_score": 10, "department": "General Medicine", "justification": ["Insufficient data"]}
+        prediction = await executors.model.run(engine.predict_patient, risk_data) if engine else {"risk_level": "Low", "risk_score": 10, "department": "General Medicine", "justification": ["Insufficient data"]}
         
         # Simple risk mapping for UI
         risk_level = prediction.get("risk_level", "Low")
@@ -363,9 +611,13 @@ async def analyze_report(data: dict):
                 "recommended_specialist": prediction.get("recommended_specialist", "General Physician"),
                 "curing_process": prediction.get("curing_process", ["Observation"]),
                 "symptoms": symptoms,
+                "negated_symptoms": entities["negated_symptoms"],
+                "conditions": entities["conditions"],
+                "vitals": vitals,
                 "summary": summary,
                 "chartData": chart_data
-            }
+            },
+            "model_version": prediction.get("model_version")
         }
     except Exception as e:
         print(f"Error in analyze_report: {e}")
@@ -408,7 +660,8 @@ async def chat_with_ai(data: ChatRequest):
     
     try:
         # Connect to local Ollama instance
-        response = requests.post(
+        response = await executors.io.run(
+            requests.post,
             "http://localhost:11434/api/chat",
             json={
                 "model": "llama3", # User can change this to their local model
@@ -451,14 +704,13 @@ class RegisterRequest(BaseModel):
     password: str
     name: str
 
+def find_user(username, password):
+    with db.connection() as conn:
+        return conn.execute("SELECT * FROM users WHERE username=? AND password=?", (username, password)).fetchone()
+
 @app.post("/login")
 async def login(creds: LoginRequest):
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    c.execute("SELECT * FROM users WHERE username=? AND password=?", (creds.username, creds.password))
-    user = c.fetchone()
-    conn.close()
+    user = await executors.db.run(find_user, creds.username, creds.password)
     
     if user:
         return {
@@ -471,89 +723,69 @@ async def login(creds: LoginRequest):
     else:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-@app.post("/register")
-async def register(creds: RegisterRequest):
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
+def create_patient_user(username, password, name):
     try:
-        c.execute("INSERT INTO users (username, password, role, name) VALUES (?, ?, ?, ?)",
-                  (creds.username, creds.password, 'patient', creds.name))
-        conn.commit()
+        with db.transaction() as conn:
+            conn.execute("INSERT INTO users (username, password, role, name) VALUES (?, ?, ?, ?)",
+                         (username, password, 'patient', name))
         return {"status": "success", "message": "Account created"}
     except sqlite3.IntegrityError:
         raise HTTPException(status_code=400, detail="Username already exists")
-    finally:
-        conn.close()
+
+@app.post("/register")
+async def register(creds: RegisterRequest):
+    return await executors.db.run(create_patient_user, creds.username, creds.password, creds.name)
+
+@app.get("/events/queue")
+async def queue_event_stream(request: Request, department: str = None):
+    """
+    Server-sent events for doctor / admin screens: patient_added, patient_claimed,
+    patient_completed, status_changed and risk_changed deltas (optionally for one
+    department), replacing /doctor/queue and /admin/stats polling. Reconnects resume
+    from Last-Event-ID; a 'resync' event means "refetch /doctor/queue".
+    """
+    try:
+        last_event_id = int(request.headers.get("last-event-id", ""))
+    except ValueError:
+        last_event_id = None
+    subscriber, position = await executors.db.run(
+        queue_events.subscribe, asyncio.get_running_loop(), department, last_event_id
+    )
+    return StreamingResponse(
+        queue_events.stream(subscriber, position),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.get("/doctor/queue")
-async def get_queue():
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    
+async def get_queue(department: str = None, limit: int = None, cursor: str = None, fields: str = None, format: str = "json"):
     # Priority Order: High > Medium > Low, then by time
-    # We use a CASE statement for custom sorting
-    query = '''
-        SELECT * FROM patients 
-        WHERE visit_status = 'Waiting' 
-        ORDER BY 
-            CASE risk_level 
-                WHEN 'High' THEN 1 
-                WHEN 'Medium' THEN 2 
-                WHEN 'Low' THEN 3 
-                ELSE 4 
-            END ASC,
-            timestamp ASC
-    '''
-    c.execute(query)
-    patients = [dict(row) for row in c.fetchall()]
-    conn.close()
-    return patients
-
-@app.post("/doctor/next")
-async def next_patient():
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    
-    # Find next patient
-    query = '''
-        SELECT id FROM patients 
-        WHERE visit_status = 'Waiting' 
-        ORDER BY 
-            CASE risk_level 
-                WHEN 'High' THEN 1 
-                WHEN 'Medium' THEN 2 
-                WHEN 'Low' THEN 3 
-                ELSE 4 
-            END ASC,
-            timestamp ASC
-        LIMIT 1
-    '''
-    c.execute(query)
-    row = c.fetchone()
-    
-    if row:
-        pid = row['id']
-        c.execute("UPDATE patients SET visit_status='Consulting' WHERE id=?", (pid,))
-        conn.commit()
-        
-        # Return the patient details
-        c.execute("SELECT * FROM patients WHERE id=?", (pid,))
-        patient = dict(c.fetchone())
-        conn.close()
+    # Stored priority column: idx_patients_queue returns rows already in this order
+    where = "visit_status = 'Waiting'" + (" AND department = ?" if department else "")
+    query = KeysetQuery('patients', QUEUE_KEYS, where, (department,) if department else (), projection(fields))
+    return await list_patients(query, limit, cursor, format, lambda rows, next_cursor: rows)
+
+def claim_next_patient(department=None):
+    patient = waiting_queue.claim(department)
+    if patient:
+        queue_events.notify()
         return {"status": "success", "patient": patient}
     else:
-        conn.close()
         return {"status": "empty", "message": "No patients in waiting queue."}
 
+@app.post("/doctor/next")
+async def next_patient(department: str = None):
+    """Claim the highest-priority waiting patient, optionally from one department's sub-queue."""
+    return await executors.db.run(claim_next_patient, department)
+
+def mark_patient_completed(patient_id):
+    with db.transaction() as conn:
+        conn.execute("UPDATE patients SET visit_status='Completed' WHERE id=?", (patient_id,))
+
 @app.post("/doctor/complete/{id}")
 async def complete_patient(id: int):
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute("UPDATE patients SET visit_status='Completed' WHERE id=?", (id,))
-    conn.commit()
-    conn.close()
+    await executors.db.run(mark_patient_completed, id)
+    queue_events.notify()
     return {"status": "success"}
 
 
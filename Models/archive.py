@@ -0,0 +1,204 @@
+import threading
+import time
+
+# Completed visits stay in the hot table this long (same-day dashboards, re-explains)
+ARCHIVE_AFTER_HOURS = 24
+# Seconds between scheduled archive runs per process
+ARCHIVE_INTERVAL = 3600
+# Rows moved per write transaction, so the write lock is never held for long
+ARCHIVE_BATCH = 5000
+PARTITION_PREFIX = 'patients_archive_'
+
+# Oldest completed visits first; idx_patients_queue narrows to visit_status='Completed'
+CANDIDATES_SQL = f'''
+    SELECT id, COALESCE(strftime('%Y_%m', timestamp), '0000_00') AS month FROM patients
+    WHERE visit_status = 'Completed' AND timestamp < datetime('now', ?)
+    ORDER BY id LIMIT ?
+'''
+
+
+def partition_name(month):
+    return PARTITION_PREFIX + month
+
+
+class PatientArchiver:
+    """
+    Moves completed visits out of the hot `patients` table into monthly archive
+    tables (patients_archive_YYYY_MM, by visit time) in the same database file.
+
+    The hot table then only holds Waiting / Consulting visits plus the last day of
+    completions, so the queue, claim and dashboard paths work on a table whose size
+    tracks current load, not total history. Each batch copies and deletes in one
+    transaction; archive_partitions catalogues the tables (row count, id range) and
+    archive_user_partitions records which of them hold a user's visits, so history
+    reads only open the partitions that matter. Runs on a timer in every worker;
+    concurrent runs simply serialize on SQLite's write lock.
+    """
+
+    def __init__(self, pool, interval=ARCHIVE_INTERVAL, after_hours=ARCHIVE_AFTER_HOURS, batch=ARCHIVE_BATCH):
+        self.pool = pool
+        self.interval = interval
+        self.after_hours = after_hours
+        self.batch = batch
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._runs = 0
+        self._moved = 0
+        self._last_run = None
+        self._last_seconds = None
+        self._last_error = None
+
+    # --- Partitions ---
+
+    def _hot_columns(self, conn):
+        return [(row['name'], row['type']) for row in conn.execute("PRAGMA table_info(patients)")]
+
+    def _ensure_partition(self, conn, name, month, hot_columns):
+        existing = {row['name'] for row in conn.execute(f"PRAGMA table_info({name})")}
+        if not existing:
+            columns = ', '.join(
+                f"{column} INTEGER PRIMARY KEY" if column == 'id' else f"{column} {column_type}"
+                for column, column_type in hot_columns
+            )
+            conn.execute(f"CREATE TABLE {name} ({columns})")
+            conn.execute(f"CREATE INDEX {name}_user_history ON {name} (user_id, timestamp)")
+            conn.execute("INSERT OR IGNORE INTO archive_partitions (name, month) VALUES (?, ?)", (name, month))
+            return
+        # Columns added to patients by later migrations
+        for column, column_type in hot_columns:
+            if column not in existing:
+                conn.execute(f"ALTER TABLE {name} ADD COLUMN {column} {column_type}")
+
+    def partitions(self, conn=None):
+        if conn is None:
+            with self.pool.connection() as conn:
+                return self.partitions(conn)
+        return [dict(row) for row in conn.execute("SELECT * FROM archive_partitions ORDER BY month")]
+
+    def tables_for_user(self, user_id):
+        """Hot table plus the archive partitions holding visits of `user_id`."""
+        with self.pool.connection() as conn:
+            names = [row['name'] for row in conn.execute(
+                "SELECT name FROM archive_user_partitions WHERE user_id = ? ORDER BY name DESC", (user_id,)
+            )]
+        return ['patients'] + names
+
+    def find(self, conn, patient_id):
+        """A visit by id from the hot table, else from the partition whose id range covers it."""
+        row = conn.execute("SELECT * FROM patients WHERE id = ?", (patient_id,)).fetchone()
+        if row is not None:
+            return row
+        for partition in conn.execute(
+            "SELECT name FROM archive_partitions WHERE ? BETWEEN min_id AND max_id", (patient_id,)
+        ).fetchall():
+            row = conn.execute(f"SELECT * FROM {partition['name']} WHERE id = ?", (patient_id,)).fetchone()
+            if row is not None:
+                return row
+        return None
+
+    # --- Moving visits ---
+
+    def _move_batch(self, conn):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            candidates = conn.execute(CANDIDATES_SQL, (f"-{self.after_hours} hours", self.batch)).fetchall()
+            if not candidates:
+                conn.rollback()
+                return 0
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS archive_batch (id INTEGER PRIMARY KEY, month TEXT)")
+            conn.execute("DELETE FROM temp.archive_batch")
+            conn.executemany("INSERT INTO temp.archive_batch (id, month) VALUES (?, ?)",
+                             [(row['id'], row['month']) for row in candidates])
+
+            hot_columns = self._hot_columns(conn)
+            column_list = ', '.join(column for column, _ in hot_columns)
+            for month in sorted({row['month'] for row in candidates}):
+                name = partition_name(month)
+                self._ensure_partition(conn, name, month, hot_columns)
+                conn.execute(f'''
+                    INSERT INTO {name} ({column_list})
+                    SELECT {column_list} FROM patients
+                    WHERE id IN (SELECT id FROM temp.archive_batch WHERE month = ?)
+                ''', (month,))
+                conn.execute('''
+                    INSERT OR IGNORE INTO archive_user_partitions (user_id, name)
+                    SELECT DISTINCT user_id, ? FROM patients
+                    WHERE user_id IS NOT NULL AND id IN (SELECT id FROM temp.archive_batch WHERE month = ?)
+                ''', (name, month))
+                conn.execute(f'''
+                    UPDATE archive_partitions SET
+                        rows = (SELECT COUNT(*) FROM {name}),
+                        min_id = (SELECT MIN(id) FROM {name}),
+                        max_id = (SELECT MAX(id) FROM {name}),
+                        archived_at = CURRENT_TIMESTAMP
+                    WHERE name = ?
+                ''', (name,))
+            conn.execute("DELETE FROM patients WHERE id IN (SELECT id FROM temp.archive_batch)")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return len(candidates)
+
+    def run_once(self):
+        """Archive every eligible completed visit now; returns how many rows moved."""
+        start = time.perf_counter()
+        moved = 0
+        try:
+            with self.pool.connection() as conn:
+                while True:
+                    count = self._move_batch(conn)
+                    moved += count
+                    if count < self.batch:
+                        break
+        except Exception as e:
+            with self._lock:
+                self._last_error = str(e)
+            raise
+        finally:
+            with self._lock:
+                self._runs += 1
+                self._moved += moved
+                self._last_run = time.strftime('%Y-%m-%d %H:%M:%S')
+                self._last_seconds = round(time.perf_counter() - start, 3)
+        if moved:
+            print(f"✅ Archived {moved} completed visits in {self._last_seconds}s")
+        return moved
+
+    # --- Schedule ---
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="patient-archiver", daemon=True)
+                self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Archive Error: {e}")
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "interval_seconds": self.interval,
+                "after_hours": self.after_hours,
+                "runs": self._runs,
+                "moved": self._moved,
+                "last_run": self._last_run,
+                "last_seconds": self._last_seconds,
+                "last_error": self._last_error
+            }
+
+    def after_fork(self):
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
@@ -0,0 +1,265 @@
+import asyncio
+import time
+import zipfile
+
+from ehr_parser import scan_document, found_fields, MAX_UPLOAD_BYTES, MAX_PAGES
+
+# Archive limits: the zip itself, the members taken from it, and each member's unpacked size
+BULK_MAX_UPLOAD_BYTES = 500 * 1024 * 1024
+BULK_MAX_FILES = 1000
+BULK_MAX_FILE_BYTES = MAX_UPLOAD_BYTES
+BULK_FILE_TYPES = ('.pdf', '.txt')
+
+# Parse tasks kept in flight per process-pool worker (one running, one queued)
+PARSE_IN_FLIGHT_PER_WORKER = 2
+# Parsed documents scored per engine call: after the first one, wait up to
+# SCORE_WINDOW_MS for more (parsing trickles documents in one at a time)
+SCORE_BATCH = 64
+SCORE_WINDOW_MS = 20.0
+# Bounded hand-offs between stages: a slow stage stalls the one before it
+# instead of letting parsed / scored documents pile up in memory
+PARSED_QUEUE = 2 * SCORE_BATCH
+STORE_QUEUE = 4
+
+# Engine inputs a transferred document doesn't state (same as /analyze-report);
+# every stored file lists the ones it fell back on under "defaulted"
+INTAKE_DEFAULTS = {
+    "Age": 30,
+    "Gender": "Male",
+    "Symptoms": "None",
+    "Blood_Pressure": 120,
+    "Heart_Rate": 85,
+    "Temperature": 37.2,
+    "O2_Saturation": 97,
+    "Pain_Severity": 3,
+    "Consciousness": "Alert",
+    "Pre_Existing_Conditions": "None"
+}
+
+_DONE = object()
+
+
+def list_members(path, max_files=BULK_MAX_FILES):
+    """
+    (documents, ignored) of a spooled zip: the .pdf / .txt members in archive order,
+    and the names of everything else. Raises ValueError for a bad or oversized archive.
+    """
+    try:
+        with zipfile.ZipFile(path) as archive:
+            infos = archive.infolist()
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"Not a zip archive: {e}")
+    documents, ignored = [], []
+    for info in infos:
+        if info.is_dir():
+            continue
+        base = info.filename.rsplit('/', 1)[-1]
+        if info.filename.startswith('__MACOSX/') or base.startswith('.') or not base.lower().endswith(BULK_FILE_TYPES):
+            ignored.append(info.filename)
+        else:
+            documents.append((info.filename, info.file_size))
+    if len(documents) > max_files:
+        raise ValueError(f"Archive holds {len(documents)} documents, the limit is {max_files}")
+    return documents, ignored
+
+
+def parse_member(path, name, max_bytes=BULK_MAX_FILE_BYTES, max_pages=MAX_PAGES):
+    """
+    Process-pool task: read one member straight from the spooled zip (never through
+    the server process) and extract its fields. The read is capped at max_bytes
+    whatever the archive's header claims.
+    """
+    began = time.perf_counter()
+    with zipfile.ZipFile(path) as archive:
+        with archive.open(name) as member:
+            content = member.read(max_bytes + 1)
+    if len(content) > max_bytes:
+        raise ValueError(f"File exceeds the {max_bytes} byte limit")
+    result = scan_document(name, content, max_pages)
+    result["bytes"] = len(content)
+    result["seconds"] = time.perf_counter() - began
+    return result
+
+
+def intake_record(fields):
+    """Extracted fields -> a complete engine / patients record, plus the fields that were defaulted."""
+    defaulted = [key for key in INTAKE_DEFAULTS if key not in fields]
+    return {**INTAKE_DEFAULTS, **fields}, defaulted
+
+
+class IngestPipeline:
+    """
+    One bulk transfer: parse -> score -> store over the members of a spooled zip.
+
+    Parse runs whole documents on the cpu process pool, a couple per worker at a
+    time; score gathers the documents parsed within a short window (up to
+    SCORE_BATCH) into one engine.predict_batch call; store commits each scored batch in one
+    transaction. The stages are joined by bounded asyncio queues, so memory stays
+    at a few batches of small dicts however large the archive, and all three run
+    at once. run() yields one progress dict per file as it finishes, then a summary.
+    """
+
+    def __init__(self, path, documents, parse_pool, score, store,
+                 max_file_bytes=BULK_MAX_FILE_BYTES, max_pages=MAX_PAGES, batch=SCORE_BATCH, window_ms=SCORE_WINDOW_MS):
+        self.path = path
+        self.documents = documents
+        self.parse_pool = parse_pool
+        self.score = score      # async (records) -> engine results
+        self.store = store      # async (records, results) -> patient ids
+        self.max_file_bytes = max_file_bytes
+        self.max_pages = max_pages
+        self.batch = batch
+        self.window = window_ms / 1000.0
+        self._pending = asyncio.Queue()
+        self._parsed = asyncio.Queue(PARSED_QUEUE)
+        self._scored = asyncio.Queue(STORE_QUEUE)
+        self._progress = asyncio.Queue()   # at most one small dict per file
+        self._busy = {"parse_cpu": 0.0, "score": 0.0, "store": 0.0}
+        self._counts = {"stored": 0, "skipped": 0, "failed": 0}
+        self._batches = 0
+
+    # --- Stages ---
+
+    async def _parse_worker(self):
+        while True:
+            try:
+                name, size = self._pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            if size > self.max_file_bytes:
+                self._report(name, "failed", message=f"File exceeds the {self.max_file_bytes} byte limit")
+                continue
+            try:
+                result = await self.parse_pool.run(parse_member, self.path, name, self.max_file_bytes, self.max_pages)
+            except Exception as e:
+                self._report(name, "failed", message=f"Parse error: {e}")
+                continue
+            self._busy["parse_cpu"] += result["seconds"]
+            if not found_fields(result["data"]):
+                self._report(name, "skipped", message="No clinical fields found", pages=result["pages"])
+                continue
+            await self._parsed.put((name, result))
+
+    async def _parse_stage(self):
+        for document in self.documents:
+            self._pending.put_nowait(document)
+        workers = max(1, self.parse_pool.max_workers) * PARSE_IN_FLIGHT_PER_WORKER
+        await asyncio.gather(*(self._parse_worker() for _ in range(workers)))
+        await self._parsed.put(_DONE)
+
+    async def _score_stage(self):
+        finished = False
+        while not finished:
+            item = await self._parsed.get()
+            if item is _DONE:
+                break
+            # Whatever else is parsed within the window rides along in the same engine call
+            batch = [item]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.batch:
+                try:
+                    item = self._parsed.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._parsed.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                if item is _DONE:
+                    finished = True
+                    break
+                batch.append(item)
+
+            intakes = [intake_record(result["data"]) for _, result in batch]
+            began = time.perf_counter()
+            try:
+                results = await self.score([record for record, _ in intakes])
+            except Exception as e:
+                for name, _ in batch:
+                    self._report(name, "failed", message=f"Scoring error: {e}")
+                continue
+            finally:
+                self._busy["score"] += time.perf_counter() - began
+            await self._scored.put((batch, intakes, results))
+        await self._scored.put(_DONE)
+
+    async def _store_stage(self):
+        while True:
+            item = await self._scored.get()
+            if item is _DONE:
+                break
+            batch, intakes, results = item
+            scored = []
+            for i, result in enumerate(results):
+                if result.get("status") == "error":
+                    self._report(batch[i][0], "failed", message=result.get("message"))
+                else:
+                    scored.append(i)
+            if not scored:
+                continue
+            began = time.perf_counter()
+            try:
+                ids = await self.store([intakes[i][0] for i in scored], [results[i] for i in scored])
+            except Exception as e:
+                for i in scored:
+                    self._report(batch[i][0], "failed", message=f"DB error: {e}")
+                continue
+            finally:
+                self._busy["store"] += time.perf_counter() - began
+            self._batches += 1
+            for i, patient_id in zip(scored, ids):
+                name, parsed = batch[i]
+                self._report(
+                    name, "stored",
+                    patient_id=patient_id,
+                    risk_level=results[i]["risk_level"],
+                    department=results[i]["department"],
+                    fields=parsed["data"],
+                    defaulted=intakes[i][1],
+                    pages=parsed["pages"]
+                )
+        self._progress.put_nowait(_DONE)
+
+    def _report(self, name, status, **details):
+        self._counts[status] += 1
+        self._progress.put_nowait({"event": "file", "file": name, "status": status, **details})
+
+    def _stage_done(self, task):
+        # A stage that crashed would leave the next one waiting forever: end the run instead
+        if not task.cancelled() and task.exception() is not None:
+            self._progress.put_nowait(task.exception())
+
+    # --- Driver ---
+
+    async def run(self):
+        """Progress dicts: one per file in completion order, then a summary. Closing the generator cancels the stages."""
+        began = time.perf_counter()
+        stages = [asyncio.ensure_future(stage()) for stage in (self._parse_stage, self._score_stage, self._store_stage)]
+        for stage in stages:
+            stage.add_done_callback(self._stage_done)
+        done = 0
+        try:
+            while True:
+                event = await self._progress.get()
+                if event is _DONE:
+                    break
+                if isinstance(event, BaseException):
+                    raise event
+                done += 1
+                yield {**event, "done": done, "total": len(self.documents)}
+        finally:
+            for stage in stages:
+                stage.cancel()
+        seconds = time.perf_counter() - began
+        yield {
+            "event": "summary",
+            "status": "success",
+            "files": len(self.documents),
+            **self._counts,
+            "score_batches": self._batches,
+            "seconds": round(seconds, 3),
+            "files_per_second": round(len(self.documents) / seconds, 1) if seconds else None,
+            "busy_ms": {stage: round(value * 1000, 2) for stage, value in self._busy.items()}
+        }
@@ -0,0 +1,258 @@
+import hashlib
+import json
+import re
+
+from generate_data_v2 import DEPARTMENTS, CONDITIONS
+
+# Bump only for changes to extract() itself; vocabulary, synonym and pattern changes
+# already give the extractor a new version (see ClinicalExtractor.fingerprint)
+EXTRACTOR_REVISION = 2
+
+# Extra surface forms -> canonical term. These win over forms derived from the vocabulary.
+SYMPTOM_SYNONYMS = {
+    'shortness of breath': 'Breathlessness',
+    'short of breath': 'Breathlessness',
+    'breathless': 'Breathlessness',
+    'dyspnea': 'Breathlessness',
+    'dyspnoea': 'Breathlessness',
+    'headache': 'Severe Headache',
+    'cough': 'Cough',
+    'vomit': 'Vomiting',
+    'nausea and vomiting': 'Vomiting',
+    'edema': 'Swelling (Edema)',
+    'oedema': 'Swelling (Edema)',
+    'chills': 'High Fever with Chills',
+    'seizure': 'Seizures',
+    'convulsions': 'Seizures',
+    'rash': 'Skin Rash',
+    'tiredness': 'Fatigue',
+    'hematuria': 'Blood in Urine',
+    'haematuria': 'Blood in Urine',
+    'hemoptysis': 'Coughing Blood',
+    'haemoptysis': 'Coughing Blood',
+}
+CONDITION_SYNONYMS = {
+    'high blood pressure': 'Hypertension',
+    'htn': 'Hypertension',
+    'diabetic': 'Diabetes',
+    'diabetes mellitus': 'Diabetes',
+    't2dm': 'Diabetes',
+    'heart disease': 'Heart Disease',
+    'coronary artery disease': 'Heart Disease',
+    'cad': 'Heart Disease',
+    'asthmatic': 'Asthma',
+}
+
+# A negation cue covers the terms after it up to the end of the clause, or past a
+# comma only while a list of terms goes on ("denies nausea, vomiting and fever")
+NEGATION_CUES = ('no', 'not', 'denies', 'denied', 'without', 'negative for', 'free of', 'absence of', 'no signs of', 'no evidence of')
+# Verbs that start stating findings again ("denies nausea, reports chest pain")
+AFFIRMATION_CUES = r'\b(?:reports?|reporting|presents?\s+with|presenting\s+with|complains?\s+of|complaining\s+of|c/o|has|admits(?:\s+to)?|endorses)\b'
+CLAUSE_BREAKS = r'[.;\n]|\bbut\b|\bhowever\b|\bexcept\b|' + AFFIRMATION_CUES
+# What may sit between two items of a negated list
+LIST_GAP = re.compile(r'[\s,]*(?:(?:and|or|nor)\b[\s,]*)?', re.IGNORECASE)
+
+GENDER_WORDS = {'male': 'Male', 'man': 'Male', 'female': 'Female', 'woman': 'Female'}
+CONSCIOUSNESS_WORDS = {'alert': 'Alert', 'confused': 'Confused', 'disoriented': 'Confused', 'unresponsive': 'Unresponsive'}
+
+
+def _surface_forms(term):
+    """'Swelling (Edema)' -> {'swelling (edema)', 'swelling'}."""
+    forms = {term.lower()}
+    base = re.sub(r'\s*\([^)]*\)', '', term).strip().lower()
+    if base:
+        forms.add(base)
+    return forms
+
+
+def _alternation(forms):
+    """
+    Regex alternation factored into a prefix trie ('chest pain|chronic cough' ->
+    'ch(?:est\\ pain|ronic\\ cough)'), so the scanner checks each character against
+    one branch per shared prefix instead of every term. Longer forms win.
+    """
+    trie = {}
+    for form in forms:
+        node = trie
+        for char in form:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node):
+        ends = '' in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # Greedy optional: keep the longer form when both match
+        return f'(?:{body})?' if ends else body
+
+    return build(trie)
+
+
+class ClinicalExtractor:
+    """
+    Symptoms, conditions, vitals and negations from free text in one pass.
+
+    Every pattern (vocabulary terms, vital signs, demographics, negation cues and
+    clause breaks) is folded into a single compiled alternation with named groups,
+    built once from the training vocabulary, so a document is scanned once by one
+    finditer() however many terms are known. Negation is clause scoped: a cue
+    ("denies", "no", ...) marks the terms that follow it until '.', ';', a newline,
+    "but" or an affirmation verb ("reports", "complains of", ...). After a comma the
+    scope only carries on through a plain list of terms, so "denies nausea, chest
+    pain since morning" negates both but "denies nausea, sweating and chest pain
+    since morning" stops at the first word that is not a term.
+    """
+
+    def __init__(self, symptoms, conditions, symptom_synonyms=SYMPTOM_SYNONYMS, condition_synonyms=CONDITION_SYNONYMS):
+        self.vocabulary = tuple(symptoms)
+        self.terms = {}    # surface form (lowercase) -> ('symptom' | 'condition', canonical)
+        for kind, canonical_terms, synonyms in (
+            ('condition', conditions, condition_synonyms),
+            ('symptom', symptoms, symptom_synonyms),
+        ):
+            for term in canonical_terms:
+                for form in _surface_forms(term):
+                    self.terms.setdefault(form, (kind, term))
+            for form, term in synonyms.items():
+                self.terms[form] = (kind, term)
+
+        sep = r'[\s:=]*(?:of\s+|is\s+|was\s+)?'
+        self.pattern = re.compile('|'.join((
+            rf'(?P<brk>{CLAUSE_BREAKS})',
+            r'(?P<comma>,)',
+            rf'\b(?P<neg>{_alternation(NEGATION_CUES)})\b',
+            rf'\b(?:bp|blood\s+pressure){sep}(?P<bp_sys>\d{{2,3}})(?:\s*/\s*(?P<bp_dia>\d{{2,3}}))?',
+            rf'\b(?:heart\s+rate|hr|pulse(?:\s+rate)?){sep}(?P<hr>\d{{2,3}})',
+            rf'\b(?:temp(?:erature)?){sep}(?P<temp>\d{{2,3}}(?:\.\d+)?)\s*(?:°\s*)?(?P<temp_unit>[cf]\b)?',
+            rf'\b(?:spo2|sao2|o2\s+sat(?:uration)?|oxygen\s+saturation|sats?){sep}(?P<spo2>\d{{2,3}})\s*%?',
+            rf'\bpain(?:\s+(?:score|level|severity))?{sep}(?P<pain>\d{{1,2}})(?:\s*/\s*10)?',
+            rf'\b(?:age{sep}|aged\s+)(?P<age>\d{{1,3}})\b|\b(?P<age_yo>\d{{1,3}})[\s-]*(?:years?|yrs?|y)[\s-]*(?:old|o)\b',
+            rf'\b(?P<term>{_alternation(self.terms)})\b(?:{sep}(?P<term_pain>\d{{1,2}})\s*/\s*10)?',
+            rf'\b(?P<gender>{_alternation(GENDER_WORDS)})\b',
+            rf'\b(?P<consciousness>{_alternation(CONSCIOUSNESS_WORDS)})\b',
+        )), re.IGNORECASE)
+
+        # Cached extractions are keyed on this
+        self.version = self.fingerprint()
+
+    def fingerprint(self):
+        """Integer hash of everything that decides the output: compiled pattern, term tables, revision."""
+        state = json.dumps([
+            EXTRACTOR_REVISION, self.pattern.pattern, sorted(self.terms.items()), self.vocabulary,
+            LIST_GAP.pattern, GENDER_WORDS, CONSCIOUSNESS_WORDS
+        ], sort_keys=True)
+        # 60 bits: fits SQLite's signed 64-bit INTEGER
+        return int(hashlib.sha256(state.encode()).hexdigest()[:15], 16)
+
+    @classmethod
+    def from_training_vocabulary(cls):
+        """Built from the symptom / condition lists the model was trained on (generate_data_v2)."""
+        symptoms = [symptom for department_symptoms in DEPARTMENTS.values() for symptom in department_symptoms]
+        return cls(symptoms, CONDITIONS)
+
+    def extract(self, text):
+        """
+        Entities in order of first mention:
+        {"symptoms", "negated_symptoms", "conditions", "negated_conditions",
+         "vitals": {...}, "age", "gender", "consciousness"} (absent values are omitted / None).
+        """
+        found = {'symptom': {}, 'condition': {}}      # dicts keep first-mention order
+        negated = {'symptom': {}, 'condition': {}}
+        vitals = {}
+        age = gender = consciousness = None
+        text = text or ''
+        negating = False
+        listing = False    # a comma was seen in the negation scope
+        scope_end = 0      # end of the last cue, negated term or comma
+
+        for match in self.pattern.finditer(text):
+            group = match.lastgroup
+            if negating and listing and group in ('comma', 'term', 'term_pain', 'consciousness'):
+                # Past a comma only a list of terms stays negated
+                if not LIST_GAP.fullmatch(text, scope_end, match.start()):
+                    negating = False
+            if group == 'brk':
+                negating = False
+            elif group == 'neg':
+                negating, listing, scope_end = True, False, match.end()
+            elif group == 'comma':
+                if negating:
+                    listing, scope_end = True, match.end()
+            elif group in ('term', 'term_pain'):
+                if negating:
+                    scope_end = match.end()
+                kind, canonical = self.terms[match.group('term').lower()]
+                (negated if negating else found)[kind].setdefault(canonical, None)
+                if match.group('term_pain') and not negating:
+                    vitals.setdefault('pain', int(match.group('term_pain')))
+            elif group in ('bp_sys', 'bp_dia'):
+                vitals.setdefault('bp_systolic', int(match.group('bp_sys')))
+                if match.group('bp_dia'):
+                    vitals.setdefault('bp_diastolic', int(match.group('bp_dia')))
+            elif group == 'hr':
+                vitals.setdefault('heart_rate', int(match.group('hr')))
+            elif group in ('temp', 'temp_unit'):
+                value = float(match.group('temp'))
+                unit = (match.group('temp_unit') or '').lower()
+                if unit == 'f' or (not unit and value > 50):
+                    value = round((value - 32) * 5 / 9, 1)
+                if 30 <= value <= 45:
+                    vitals.setdefault('temperature', value)
+            elif group == 'spo2':
+                value = int(match.group('spo2'))
+                if value <= 100:
+                    vitals.setdefault('spo2', value)
+            elif group == 'pain':
+                vitals.setdefault('pain', min(int(match.group('pain')), 10))
+            elif group in ('age', 'age_yo'):
+                age = age if age is not None else int(match.group(group))
+            elif group == 'gender':
+                gender = gender or GENDER_WORDS[match.group('gender').lower()]
+            elif group == 'consciousness' and not negating:
+                consciousness = consciousness or CONSCIOUSNESS_WORDS[match.group('consciousness').lower()]
+
+        return {
+            "symptoms": list(found['symptom']),
+            "negated_symptoms": [term for term in negated['symptom'] if term not in found['symptom']],
+            "conditions": list(found['condition']),
+            "negated_conditions": [term for term in negated['condition'] if term not in found['condition']],
+            "vitals": vitals,
+            "age": age,
+            "gender": gender,
+            "consciousness": consciousness
+        }
+
+    def primary_symptom(self, symptoms):
+        """The engine takes one symptom: the first one mentioned that the model was trained on."""
+        for symptom in symptoms:
+            if symptom in self.vocabulary:
+                return symptom
+        return symptoms[0] if symptoms else None
+
+    def engine_fields(self, entities):
+        """Entities -> the engine's input fields, only for what the text actually stated."""
+        fields = {}
+        vitals = entities["vitals"]
+        if entities["age"] is not None:
+            fields["Age"] = entities["age"]
+        if entities["gender"]:
+            fields["Gender"] = entities["gender"]
+        symptom = self.primary_symptom(entities["symptoms"])
+        if symptom:
+            fields["Symptoms"] = symptom
+        for key, vital in (("Blood_Pressure", "bp_systolic"), ("Heart_Rate", "heart_rate"), ("Temperature", "temperature"),
+                           ("O2_Saturation", "spo2"), ("Pain_Severity", "pain")):
+            if vital in vitals:
+                fields[key] = vitals[vital]
+        if entities["consciousness"]:
+            fields["Consciousness"] = entities["consciousness"]
+        if entities["conditions"]:
+            fields["Pre_Existing_Conditions"] = entities["conditions"][0]
+        return fields
+
+
+# Compiled once per process at import
+EXTRACTOR = ClinicalExtractor.from_training_vocabulary()
+EXTRACTOR_VERSION = EXTRACTOR.version
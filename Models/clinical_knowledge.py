@@ -0,0 +1,136 @@
+import json
+import os
+import threading
+import time
+from types import MappingProxyType
+
+from generate_data_v2 import DEPARTMENTS
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_KNOWLEDGE_PATH = os.path.join(BASE_DIR, 'data', 'clinical_knowledge.json')
+
+# Multi-symptom inputs (e.g. from /analyze-report) are ';'-joined
+SYMPTOM_SEPARATOR = ';'
+
+# How often (seconds) lookups may stat the data file to pick up edits
+RELOAD_CHECK_INTERVAL = 2.0
+
+
+def _entry(department, disease, specialist, treatment):
+    # (department, disease, specialist, treatment) - the shape get_dept_recommendation returns
+    return (department, disease, specialist, tuple(treatment))
+
+
+def build_index(knowledge, departments=DEPARTMENTS):
+    """
+    Flatten the knowledge file into an immutable {(symptom, risk_level): entry} map.
+    Every training-vocabulary symptom (generate_data_v2.DEPARTMENTS, so the file never
+    carries a copy of it) gets an entry for every risk level: curated conditions first,
+    then its Department from the training data.
+    Returns (index, curated_symptoms, aliases, defaults_by_risk).
+    """
+    risk_levels = knowledge['risk_levels']
+    labels = knowledge.get('department_labels', {})
+    specialists = knowledge.get('department_specialists', {})
+    dept_fallback = knowledge['department_fallback']
+    high = knowledge['high_risk_fallback']
+    default = knowledge['default']
+
+    high_entry = _entry(high['department'], high['disease'], high['specialist'], high['treatment'])
+    default_entry = _entry(default['department'], default['disease'], default['specialist'], default['treatment'])
+    defaults_by_risk = MappingProxyType({risk: high_entry if risk == 'High' else default_entry for risk in risk_levels})
+
+    index = {}
+    for department, symptoms in departments.items():
+        dept_entry = _entry(
+            labels.get(department, f"🏥 {department}"),
+            dept_fallback['disease'],
+            specialists.get(department, f"{department} Specialist"),
+            dept_fallback['treatment']
+        )
+        for symptom in symptoms:
+            for risk in risk_levels:
+                # High risk without a curated entry still routes to emergency care
+                index[(symptom, risk)] = high_entry if risk == 'High' else dept_entry
+
+    for symptom, levels in knowledge['conditions'].items():
+        for risk, info in levels.items():
+            index[(symptom, risk)] = _entry(info['department'], info['disease'], info['specialist'], info['treatment'])
+
+    curated = frozenset(knowledge['conditions'])
+    aliases = MappingProxyType(dict(knowledge.get('symptom_aliases', {})))
+    return MappingProxyType(index), curated, aliases, defaults_by_risk
+
+
+class ClinicalKnowledgeIndex:
+    """
+    O(1) department / disease / specialist / treatment lookups keyed by (symptom, risk_level),
+    loaded once from data/clinical_knowledge.json. The file is re-read when its mtime
+    changes (checked at most every RELOAD_CHECK_INTERVAL seconds) and the new index is
+    swapped in as a single reference - no server restart needed.
+    """
+
+    def __init__(self, path=DEFAULT_KNOWLEDGE_PATH, check_interval=RELOAD_CHECK_INTERVAL, on_reload=None):
+        self.path = path
+        self.check_interval = check_interval
+        # Called after a changed file is swapped in (e.g. to drop cached recommendations)
+        self.on_reload = on_reload
+        self._reload_lock = threading.Lock()
+        self._next_check = 0.0
+        self._mtime = None
+        self._state = None
+        self.reload()
+
+    def reload(self):
+        with self._reload_lock:
+            mtime = os.path.getmtime(self.path)
+            with open(self.path, encoding='utf-8') as f:
+                knowledge = json.load(f)
+            self._state = build_index(knowledge)
+            self._mtime = mtime
+            self._next_check = time.monotonic() + self.check_interval
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        try:
+            if os.path.getmtime(self.path) != self._mtime:
+                self.reload()
+                print(f"Clinical knowledge reloaded from {self.path}")
+                if self.on_reload:
+                    self.on_reload()
+        except Exception as e:
+            # Keep serving the last good index
+            print(f"Warning: clinical knowledge reload failed: {e}")
+
+    def lookup(self, symptom, risk_level):
+        """Return (department, disease, specialist, treatment) for a symptom string and risk level."""
+        self._maybe_reload()
+        index, curated, aliases, defaults_by_risk = self._state
+
+        entry = index.get((symptom, risk_level))
+        if entry is not None:
+            return entry
+        if isinstance(symptom, str) and SYMPTOM_SEPARATOR in symptom:
+            return self._lookup_many(symptom.split(SYMPTOM_SEPARATOR), risk_level)
+        entry = index.get((aliases.get(symptom), risk_level))
+        if entry is not None:
+            return entry
+        return defaults_by_risk.get(risk_level, defaults_by_risk['Low'])
+
+    def _lookup_many(self, symptoms, risk_level):
+        """Multi-symptom input: first curated match wins, then the first vocabulary match."""
+        index, curated, aliases, defaults_by_risk = self._state
+        fallback = None
+        for symptom in symptoms:
+            symptom = symptom.strip()
+            symptom = symptom if (symptom, risk_level) in index else aliases.get(symptom, symptom)
+            entry = index.get((symptom, risk_level))
+            if entry is None:
+                continue
+            if symptom in curated:
+                return entry
+            fallback = fallback or entry
+        return fallback or defaults_by_risk.get(risk_level, defaults_by_risk['Low'])
@@ -0,0 +1,444 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Absolute, so the server can be started from any working directory
+DB_PATH = os.path.join(BASE_DIR, 'patients.db')
+
+POOL_SIZE = 8
+# Seconds a writer waits on another connection's / process's lock before "database is locked"
+BUSY_TIMEOUT = 10.0
+# Seconds a request waits for a free pooled connection
+ACQUIRE_TIMEOUT = 30.0
+# Compiled statements kept per connection (sqlite3's LRU keyed by SQL text)
+STATEMENT_CACHE_SIZE = 256
+
+PRAGMAS = (
+    # WAL: readers never block the writer, and several worker processes can share the file
+    "PRAGMA journal_mode=WAL",
+    # Safe with WAL (a crash can only lose the last commits, never corrupt the file)
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=268435456",   # 256 MB of the file read through the page cache
+    "PRAGMA cache_size=-16000",     # 16 MB page cache per connection
+    "PRAGMA temp_store=MEMORY",
+)
+
+
+class ConnectionPool:
+    """
+    Bounded pool of SQLite connections shared by every route.
+
+    Connections are opened lazily up to `size`, tuned once with PRAGMAS, and reused,
+    so the per-request connect / pragma cost and the statement recompiles go away.
+    Rows come back as sqlite3.Row. Use `connection()` for reads and `transaction()`
+    for writes (commits on success, rolls back on error).
+    """
+
+    def __init__(self, path=DB_PATH, size=POOL_SIZE, timeout=BUSY_TIMEOUT):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._idle = queue.LifoQueue()   # most recently used first: warmest page cache
+        self._slots = threading.BoundedSemaphore(size)
+        self._created = 0
+        self._in_use = 0
+        self._waits = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path, timeout=self.timeout, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _acquire(self):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._waits += 1
+            if not self._slots.acquire(timeout=ACQUIRE_TIMEOUT):
+                raise TimeoutError(f"No database connection free after {ACQUIRE_TIMEOUT}s")
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                conn = self._connect()
+            except Exception:
+                self._slots.release()
+                raise
+            with self._lock:
+                self._created += 1
+        with self._lock:
+            self._in_use += 1
+        return conn
+
+    def _release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+        except sqlite3.Error:
+            # Broken connection: drop it, a fresh one is opened on demand
+            with self._lock:
+                self._created -= 1
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    @contextmanager
+    def transaction(self):
+        with self.connection() as conn:
+            with conn:
+                yield conn
+
+    def stats(self):
+        with self._lock:
+            return {"size": self.size, "open": self._created, "in_use": self._in_use, "waits": self._waits}
+
+    def after_fork(self):
+        # SQLite connections must not cross fork(): forget the parent's, open fresh ones
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+
+    def close(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+PATIENT_INSERT_SQL = '''
+    INSERT INTO patients (user_id, age, gender, symptoms, bp, heart_rate, temp, o2_sat, pain_level, consciousness, condition, risk_level, department, confidence, priority)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# Queue order: lower is seen first. Stored per row in patients.priority so the queue
+# index can serve "Waiting, by priority, then arrival" without sorting.
+RISK_PRIORITY = {'High': 1, 'Medium': 2, 'Low': 3}
+DEFAULT_PRIORITY = 4
+
+
+def risk_priority(risk_level):
+    return RISK_PRIORITY.get(risk_level, DEFAULT_PRIORITY)
+
+
+def _baseline_schema(conn):
+    c = conn.cursor()
+
+    # Unified Users Table (RBAC)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE,
+            password TEXT,
+            role TEXT, -- 'doctor' or 'patient'
+            name TEXT,
+            specialty TEXT -- Nullable, for doctors
+        )
+    ''')
+
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS patients (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER, -- FK to users.id
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            age INTEGER,
+            gender TEXT,
+            symptoms TEXT,
+            bp INTEGER,
+            heart_rate INTEGER,
+            temp REAL,
+            o2_sat INTEGER,
+            pain_level INTEGER,
+            consciousness TEXT,
+            condition TEXT,
+            risk_level TEXT,
+            department TEXT,
+            confidence REAL,
+            visit_status TEXT DEFAULT 'Waiting'
+        )
+    ''')
+
+    # Seed default doctor if not exists
+    c.execute("SELECT count(*) FROM users WHERE username='admin'")
+    if c.fetchone()[0] == 0:
+        c.execute("INSERT INTO users (username, password, role, name, specialty) VALUES (?, ?, ?, ?, ?)",
+                  ('admin', 'admin123', 'doctor', 'Dr. MedCognis Health', 'Chief Medical Officer'))
+        print("✅ Default Doctor (admin) created.")
+
+
+def _queue_priority_and_indexes(conn):
+    columns = {row['name'] for row in conn.execute("PRAGMA table_info(patients)")}
+    if 'priority' not in columns:
+        conn.execute(f"ALTER TABLE patients ADD COLUMN priority INTEGER NOT NULL DEFAULT {DEFAULT_PRIORITY}")
+    # Backfill existing visits with the same mapping the old CASE expression used
+    conn.executemany(
+        "UPDATE patients SET priority=? WHERE risk_level=?",
+        [(priority, risk) for risk, priority in RISK_PRIORITY.items()]
+    )
+    # /doctor/queue and /doctor/next: equality on visit_status, then already in queue order
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_patients_queue ON patients (visit_status, priority, timestamp)")
+    # /history/{user_id}
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_patients_user_history ON patients (user_id, timestamp)")
+
+
+# Counted dimensions of patients (stats_counters.metric). NULLs are stored as ''.
+STATS_METRICS = ('risk_level', 'department', 'visit_status')
+# Rollup buckets: granularity -> strftime format applied to patients.timestamp (UTC)
+ROLLUP_FORMATS = {'hour': '%Y-%m-%d %H:00', 'day': '%Y-%m-%d'}
+# stats_counters row bumped by every trigger, so readers can tell cheaply whether anything changed
+STATS_VERSION_KEY = ('_meta', 'version')
+
+
+def _counter_upsert(metric, value, delta):
+    return f'''
+        INSERT INTO stats_counters (metric, key, count) VALUES ('{metric}', COALESCE({value}, ''), {delta})
+        ON CONFLICT (metric, key) DO UPDATE SET count = count + ({delta});'''
+
+
+def _rollup_upsert(granularity, row):
+    return f'''
+        INSERT INTO stats_rollups (granularity, bucket, department, risk_level, count)
+        VALUES ('{granularity}', strftime('{ROLLUP_FORMATS[granularity]}', {row}.timestamp),
+                COALESCE({row}.department, ''), COALESCE({row}.risk_level, ''), 1)
+        ON CONFLICT (granularity, bucket, department, risk_level) DO UPDATE SET count = count + 1;'''
+
+
+def _version_bump():
+    metric, key = STATS_VERSION_KEY
+    return f"\n        UPDATE stats_counters SET count = count + 1 WHERE metric = '{metric}' AND key = '{key}';"
+
+
+def _stats_tables_and_triggers(conn):
+    # Summary tables kept by triggers inside the writing transaction, so every write
+    # path and every worker process updates them atomically with the row itself
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS stats_counters (
+            metric TEXT NOT NULL,
+            key TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (metric, key)
+        ) WITHOUT ROWID
+    ''')
+    # Arrivals per time bucket, department and risk level (trend charts)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS stats_rollups (
+            granularity TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            department TEXT NOT NULL,
+            risk_level TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (granularity, bucket, department, risk_level)
+        ) WITHOUT ROWID
+    ''')
+
+    # Backfill from the existing rows (the last full scans the dashboard will need)
+    conn.execute("DELETE FROM stats_counters")
+    conn.execute("DELETE FROM stats_rollups")
+    for metric in STATS_METRICS:
+        conn.execute(f'''
+            INSERT INTO stats_counters (metric, key, count)
+            SELECT '{metric}', COALESCE({metric}, ''), COUNT(*) FROM patients GROUP BY 2
+        ''')
+    for granularity, fmt in ROLLUP_FORMATS.items():
+        conn.execute(f'''
+            INSERT INTO stats_rollups (granularity, bucket, department, risk_level, count)
+            SELECT '{granularity}', strftime('{fmt}', timestamp), COALESCE(department, ''), COALESCE(risk_level, ''), COUNT(*)
+            FROM patients WHERE timestamp IS NOT NULL GROUP BY 2, 3, 4
+        ''')
+    conn.execute("INSERT INTO stats_counters (metric, key, count) VALUES (?, ?, 0)", STATS_VERSION_KEY)
+
+    insert_body = ''.join(_counter_upsert(metric, f'NEW.{metric}', 1) for metric in STATS_METRICS)
+    insert_body += ''.join(_rollup_upsert(granularity, 'NEW') for granularity in ROLLUP_FORMATS)
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_patients_stats_insert AFTER INSERT ON patients
+        BEGIN{insert_body}{_version_bump()}
+        END
+    ''')
+
+    # Status changes move one count between visit_status keys. Rollups count arrivals,
+    # so they are not touched by updates or deletes.
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_patients_stats_status AFTER UPDATE OF visit_status ON patients
+        WHEN OLD.visit_status IS NOT NEW.visit_status
+        BEGIN{_counter_upsert('visit_status', 'OLD.visit_status', -1)}{_counter_upsert('visit_status', 'NEW.visit_status', 1)}{_version_bump()}
+        END
+    ''')
+
+    delete_body = ''.join(_counter_upsert(metric, f'OLD.{metric}', -1) for metric in STATS_METRICS)
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_patients_stats_delete AFTER DELETE ON patients
+        BEGIN{delete_body}{_version_bump()}
+        END
+    ''')
+
+
+# Columns copied from the patient row into every queue event
+EVENT_COLUMNS = ('visit_status', 'risk_level', 'department', 'priority')
+# queue_events keeps the newest EVENT_RETENTION rows (the Last-Event-ID replay window),
+# trimmed every EVENT_PRUNE_EVERY events by a trigger, so no process has to own cleanup
+EVENT_RETENTION = 10000
+EVENT_PRUNE_EVERY = 1000
+
+
+def _event_insert(kind):
+    columns = ', '.join(EVENT_COLUMNS)
+    values = ', '.join(f"NEW.{column}" for column in EVENT_COLUMNS)
+    return f'''
+        INSERT INTO queue_events (type, patient_id, {columns}) VALUES ({kind}, NEW.id, {values});'''
+
+
+def _queue_event_log(conn):
+    # Append-only change feed of the patients table, written by triggers in the same
+    # transaction as the change, so every worker process can tail it by id
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS queue_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            type TEXT NOT NULL,
+            patient_id INTEGER NOT NULL,
+            visit_status TEXT,
+            risk_level TEXT,
+            department TEXT,
+            priority INTEGER,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_patients_event_insert AFTER INSERT ON patients
+        BEGIN{_event_insert("'patient_added'")}
+        END
+    ''')
+    status_kind = '''CASE NEW.visit_status
+            WHEN 'Consulting' THEN 'patient_claimed'
+            WHEN 'Completed' THEN 'patient_completed'
+            ELSE 'status_changed' END'''
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_patients_event_status AFTER UPDATE OF visit_status ON patients
+        WHEN OLD.visit_status IS NOT NEW.visit_status
+        BEGIN{_event_insert(status_kind)}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_patients_event_risk AFTER UPDATE OF risk_level, priority, department ON patients
+        WHEN OLD.risk_level IS NOT NEW.risk_level OR OLD.priority IS NOT NEW.priority
+             OR OLD.department IS NOT NEW.department
+        BEGIN{_event_insert("'risk_changed'")}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_queue_events_prune AFTER INSERT ON queue_events
+        WHEN NEW.id % {EVENT_PRUNE_EVERY} = 0
+        BEGIN
+            DELETE FROM queue_events WHERE id <= NEW.id - {EVENT_RETENTION};
+        END
+    ''')
+
+
+def _archive_catalog(conn):
+    # Monthly archive tables (patients_archive_YYYY_MM) are created by archive.py as
+    # completed visits move out of the hot table; this is their catalogue
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS archive_partitions (
+            name TEXT PRIMARY KEY,
+            month TEXT NOT NULL,
+            rows INTEGER NOT NULL DEFAULT 0,
+            min_id INTEGER,
+            max_id INTEGER,
+            archived_at DATETIME
+        )
+    ''')
+    # Which partitions hold visits of a user, so /history only opens those
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS archive_user_partitions (
+            user_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            PRIMARY KEY (user_id, name)
+        ) WITHOUT ROWID
+    ''')
+
+    # Archiving is a move, not a removal: completed visits leaving the hot table keep
+    # their place in the dashboard counters (only the version is bumped)
+    conn.execute("DROP TRIGGER IF EXISTS trg_patients_stats_delete")
+    delete_body = ''.join(_counter_upsert(metric, f'OLD.{metric}', -1) for metric in STATS_METRICS)
+    conn.execute(f'''
+        CREATE TRIGGER trg_patients_stats_delete AFTER DELETE ON patients
+        WHEN OLD.visit_status IS NOT 'Completed'
+        BEGIN{delete_body}{_version_bump()}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_patients_stats_archive AFTER DELETE ON patients
+        WHEN OLD.visit_status IS 'Completed'
+        BEGIN{_version_bump()}
+        END
+    ''')
+
+
+# (version, description, apply(conn)). Append only - never edit or reorder a released step.
+MIGRATIONS = (
+    (1, "users / patients tables and default doctor", _baseline_schema),
+    (2, "patients.priority + queue and history indexes", _queue_priority_and_indexes),
+    (3, "stats counters / rollups summary tables and triggers", _stats_tables_and_triggers),
+    (4, "queue_events change feed and triggers", _queue_event_log),
+    (5, "archive partition catalogue; archiving keeps stats counters", _archive_catalog),
+)
+
+
+def table_columns(pool, table):
+    with pool.connection() as conn:
+        return tuple(row['name'] for row in conn.execute(f"PRAGMA table_info({table})"))
+
+
+def schema_version(pool):
+    with pool.connection() as conn:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(pool, migrations=MIGRATIONS):
+    """
+    Bring the database up to the latest schema. Each pending step runs in its own
+    BEGIN IMMEDIATE transaction together with the PRAGMA user_version bump, so a
+    failed step leaves the previous version intact and concurrent starters (several
+    worker processes) apply every step exactly once.
+    """
+    applied = []
+    with pool.connection() as conn:
+        for version, description, apply in migrations:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+                    conn.rollback()
+                    continue
+                apply(conn)
+                conn.execute(f"PRAGMA user_version = {int(version)}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            applied.append(version)
+            print(f"✅ Database migrated to v{version}: {description}")
+        if applied:
+            # Refresh planner statistics for the new indexes
+            conn.execute("PRAGMA optimize")
+    return applied
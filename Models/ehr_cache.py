@@ -0,0 +1,175 @@
+import json
+import os
+import threading
+import time
+
+from clinical_extractor import EXTRACTOR_VERSION
+from database import ConnectionPool, BASE_DIR
+from prediction_cache import PredictionCache
+
+# Separate file, so cache churn never contends with patients.db's write lock
+EHR_CACHE_PATH = os.path.join(BASE_DIR, 'ehr_cache.db')
+# Memory tier (per process): hot referrals re-uploaded by several staff
+MEMORY_MAX_ENTRIES = 2000
+MEMORY_MAX_BYTES = 32 * 1024 * 1024
+MEMORY_TTL_SECONDS = 24 * 3600
+# Disk tier (shared by every worker process): least recently used entries go first
+DISK_MAX_BYTES = 256 * 1024 * 1024
+DISK_POOL_SIZE = 4
+
+SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS ehr_parse_cache (
+        digest TEXT NOT NULL,
+        variant TEXT NOT NULL,
+        extractor_version INTEGER NOT NULL,
+        result TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        last_used REAL NOT NULL,
+        hits INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (digest, variant)
+    ) WITHOUT ROWID
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_ehr_parse_cache_lru ON ehr_parse_cache (last_used)",
+)
+
+
+class EhrParseCache:
+    """
+    Content-addressed cache of /parse_ehr results: SHA-256 of the uploaded bytes
+    plus a variant (how it was read: 'pdf:<page limit>' or 'text') -> the parse
+    result (fields, entities, text preview, page counts).
+
+    Two tiers: an in-process LRU (PredictionCache) answers repeats in microseconds;
+    behind it a SQLite file shared by all worker processes survives restarts and is
+    kept under `disk_max_bytes` by dropping the least recently used entries. Entries
+    record the EXTRACTOR_VERSION (a hash of the extractor's patterns and vocabulary)
+    that produced them; any other version is a miss, and rows from other versions
+    are purged when the cache opens.
+    """
+
+    def __init__(self, path=EHR_CACHE_PATH, disk_max_bytes=DISK_MAX_BYTES, version=EXTRACTOR_VERSION,
+                 memory_max_entries=MEMORY_MAX_ENTRIES, memory_max_bytes=MEMORY_MAX_BYTES):
+        self.version = version
+        self.disk_max_bytes = disk_max_bytes
+        self.memory = PredictionCache(memory_max_entries, memory_max_bytes, MEMORY_TTL_SECONDS)
+        self.pool = ConnectionPool(path, size=DISK_POOL_SIZE)
+        self._lock = threading.Lock()
+        self._disk_hits = 0
+        self._disk_misses = 0
+        self._stored = 0
+        self._evicted = 0
+        self._purged = 0
+        self._errors = 0
+        with self.pool.transaction() as conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+            self._purged = conn.execute(
+                "DELETE FROM ehr_parse_cache WHERE extractor_version != ?", (self.version,)
+            ).rowcount
+
+    def get(self, digest, variant):
+        """Cached result (a fresh dict) and the tier it came from ('memory' / 'disk'), or (None, None)."""
+        result = self.memory.get((digest, variant))
+        if result is not None:
+            return result, "memory"
+        try:
+            result = self._get_disk(digest, variant)
+        except Exception as e:
+            # A broken cache file must never fail the parse itself
+            with self._lock:
+                self._errors += 1
+            print(f"⚠️ EHR cache read failed: {e}")
+            return None, None
+        if result is None:
+            return None, None
+        self.memory.put((digest, variant), result)
+        return dict(result), "disk"
+
+    def _get_disk(self, digest, variant):
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT result FROM ehr_parse_cache WHERE digest = ? AND variant = ? AND extractor_version = ?",
+                (digest, variant, self.version)
+            ).fetchone()
+        with self._lock:
+            if row is None:
+                self._disk_misses += 1
+                return None
+            self._disk_hits += 1
+        with self.pool.transaction() as conn:
+            conn.execute(
+                "UPDATE ehr_parse_cache SET last_used = ?, hits = hits + 1 WHERE digest = ? AND variant = ?",
+                (time.time(), digest, variant)
+            )
+        return json.loads(row['result'])
+
+    def put(self, digest, variant, result):
+        """Store a fresh parse result in both tiers."""
+        self.memory.put((digest, variant), result)
+        encoded = json.dumps(result, separators=(',', ':'), default=str)
+        now = time.time()
+        try:
+            with self.pool.transaction() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO ehr_parse_cache "
+                    "(digest, variant, extractor_version, result, size, created_at, last_used) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (digest, variant, self.version, encoded, len(encoded), now, now)
+                )
+                evicted = self._evict(conn)
+        except Exception as e:
+            with self._lock:
+                self._errors += 1
+            print(f"⚠️ EHR cache write failed: {e}")
+            return
+        with self._lock:
+            self._stored += 1
+            self._evicted += evicted
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM ehr_parse_cache").fetchone()[0]
+        if total <= self.disk_max_bytes:
+            return 0
+        # Oldest first until back under the limit (walks idx_ehr_parse_cache_lru)
+        excess = total - self.disk_max_bytes
+        victims = []
+        for row in conn.execute("SELECT digest, variant, size FROM ehr_parse_cache ORDER BY last_used"):
+            victims.append((row['digest'], row['variant']))
+            excess -= row['size']
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM ehr_parse_cache WHERE digest = ? AND variant = ?", victims)
+        return len(victims)
+
+    def clear(self):
+        self.memory.clear()
+        with self.pool.transaction() as conn:
+            conn.execute("DELETE FROM ehr_parse_cache")
+
+    def stats(self):
+        with self.pool.connection() as conn:
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ehr_parse_cache").fetchone()
+        with self._lock:
+            return {
+                "extractor_version": self.version,
+                "memory": self.memory.stats(),
+                "disk": {
+                    "entries": entries,
+                    "bytes": size,
+                    "max_bytes": self.disk_max_bytes,
+                    "hits": self._disk_hits,
+                    "misses": self._disk_misses,
+                    "stored": self._stored,
+                    "evictions": self._evicted,
+                    "purged_old_versions": self._purged,
+                    "errors": self._errors
+                }
+            }
+
+    def after_fork(self):
+        self.pool.after_fork()
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.pool.close()
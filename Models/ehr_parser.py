@@ -0,0 +1,210 @@
+import asyncio
+import io
+import os
+import tempfile
+import time
+from pypdf import PdfReader
+
+from clinical_extractor import EXTRACTOR
+
+# Uploads larger than this are rejected while they are being spooled
+MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+# Only the first MAX_PAGES pages of a PDF are ever read
+MAX_PAGES = 50
+# Pages extracted per process-pool task
+PAGES_PER_TASK = 4
+SPOOL_CHUNK_BYTES = 1024 * 1024
+# Spooled uploads go here (system temp dir by default)
+SPOOL_DIR = None
+PREVIEW_CHARS = 200
+
+# Fields that end a PDF read early once all of them have been found
+TARGET_FIELDS = ("Age", "Gender", "Symptoms", "Blood_Pressure", "Heart_Rate", "Temperature", "Pre_Existing_Conditions")
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+def pdf_page_text(reader, start, stop):
+    # One join at the end instead of text += page (quadratic on long documents)
+    return "\n".join((page.extract_text() or "") for page in reader.pages[start:stop]) + "\n"
+
+
+def fields_from_entities(entities):
+    data = EXTRACTOR.engine_fields(entities)
+    data.setdefault("Pre_Existing_Conditions", "None")
+    return data
+
+
+# --- Spooled, page-parallel parsing for /parse_ehr ---
+
+def found_fields(data):
+    """Fields actually matched (the 'None' conditions default doesn't count)."""
+    return {key: value for key, value in data.items() if not (key == "Pre_Existing_Conditions" and value == "None")}
+
+
+def merge_fields(parts):
+    """Per-chunk matches in page order -> one result; the earliest page wins, like a search over the whole text."""
+    data = {}
+    for part in parts:
+        for key, value in part.items():
+            data.setdefault(key, value)
+    data.setdefault("Pre_Existing_Conditions", "None")
+    return data
+
+
+def merge_entities(parts):
+    """Per-chunk entities in page order -> one list per kind, first mention first."""
+    merged = {}
+    for kind in ("symptoms", "negated_symptoms", "conditions", "negated_conditions"):
+        merged[kind] = list(dict.fromkeys(term for part in parts for term in part[kind]))
+    # Stated anywhere outweighs denied somewhere else
+    merged["negated_symptoms"] = [term for term in merged["negated_symptoms"] if term not in merged["symptoms"]]
+    merged["negated_conditions"] = [term for term in merged["negated_conditions"] if term not in merged["conditions"]]
+    return merged
+
+
+def scan_chunk(path, start, stop):
+    """
+    Process-pool task: extract pages [start, stop) of the spooled PDF and run the field
+    extractor on them. Returns the matches and a preview, never the full text, so
+    little crosses the process boundary whatever the page count.
+    """
+    began = time.perf_counter()
+    with open(path, "rb") as f:
+        reader = PdfReader(f)
+        total = len(reader.pages)
+        text = pdf_page_text(reader, start, min(stop, total))
+    entities = EXTRACTOR.extract(text)
+    return {
+        "start": start,
+        "pages": max(0, min(stop, total) - start),
+        "total_pages": total,
+        "fields": found_fields(fields_from_entities(entities)),
+        "entities": entities,
+        "preview": text[:PREVIEW_CHARS],
+        "chars": len(text),
+        "seconds": time.perf_counter() - began
+    }
+
+
+def scan_text_file(path):
+    with open(path, "rb") as f:
+        text = f.read().decode("utf-8")
+    entities = EXTRACTOR.extract(text)
+    return {"fields": found_fields(fields_from_entities(entities)), "entities": entities, "preview": text[:PREVIEW_CHARS], "chars": len(text)}
+
+
+def scan_document(filename, content, max_pages=MAX_PAGES):
+    """
+    Fields and entities of one in-memory document, read page by page in this process
+    and stopped once every TARGET_FIELDS entry is found. For callers that spread whole
+    documents over the process pool (bulk ingestion) instead of page ranges.
+    """
+    if not filename.lower().endswith(".pdf"):
+        entities = EXTRACTOR.extract(content.decode("utf-8"))
+        return {"data": fields_from_entities(entities), "entities": merge_entities([entities]), "pages": None}
+
+    reader = PdfReader(io.BytesIO(content))
+    total = len(reader.pages)
+    limit = min(total, max_pages)
+    parts, found, read = [], [], 0
+    while read < limit and not set().union(*found).issuperset(TARGET_FIELDS):
+        parts.append(EXTRACTOR.extract(pdf_page_text(reader, read, read + 1)))
+        found.append(found_fields(fields_from_entities(parts[-1])))
+        read += 1
+    return {
+        "data": merge_fields(found),
+        "entities": merge_entities(parts),
+        "pages": {"total": total, "read": read, "stopped_early": read < limit}
+    }
+
+
+def _spool_chunk(out, chunk, hasher):
+    out.write(chunk)
+    if hasher is not None:
+        hasher.update(chunk)
+
+
+async def spool_upload(upload, executor, max_bytes=MAX_UPLOAD_BYTES, hasher=None):
+    """
+    Copy an UploadFile to a named temp file chunk by chunk; returns (path, size).
+    A hashlib object passed as `hasher` is fed the same chunks on the way through.
+    """
+    suffix = os.path.splitext(upload.filename or "")[1]
+    fd, path = tempfile.mkstemp(prefix="ehr-", suffix=suffix, dir=SPOOL_DIR)
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await upload.read(SPOOL_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"Upload exceeds the {max_bytes} byte limit")
+                await executor.run(_spool_chunk, out, chunk, hasher)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path, size
+
+
+async def parse_spooled_ehr(path, filename, pool, max_pages=MAX_PAGES, pages_per_task=PAGES_PER_TASK):
+    """
+    Parse a spooled upload on `pool` (the cpu process pool). PDFs are read in
+    page ranges, `pool.max_workers` ranges at a time in page order; reading stops
+    once every TARGET_FIELDS entry has been found or max_pages is reached.
+    """
+    began = time.perf_counter()
+    if not filename.lower().endswith(".pdf"):
+        result = await pool.run(scan_text_file, path)
+        extract_seconds = time.perf_counter() - began
+        return {
+            "status": "success",
+            "data": merge_fields([result["fields"]]),
+            "entities": merge_entities([result["entities"]]),
+            "raw_text_preview": result["preview"],
+            "pages": None,
+            "timings_ms": {"extract": round(extract_seconds * 1000, 2)}
+        }
+
+    # The first range also tells us how many pages there are
+    chunks = [await pool.run(scan_chunk, path, 0, min(pages_per_task, max_pages))]
+    total = chunks[0]["total_pages"]
+    limit = min(total, max_pages)
+    next_page = chunks[0]["pages"]
+    stopped_early = False
+    while next_page < limit:
+        found = set().union(*(chunk["fields"] for chunk in chunks))
+        if found.issuperset(TARGET_FIELDS):
+            stopped_early = True
+            break
+        wave = []
+        while next_page < limit and len(wave) < max(1, pool.max_workers):
+            stop = min(next_page + pages_per_task, limit)
+            wave.append(pool.run(scan_chunk, path, next_page, stop))
+            next_page = stop
+        chunks.extend(await asyncio.gather(*wave))
+
+    extract_seconds = time.perf_counter() - began
+    pages_read = sum(chunk["pages"] for chunk in chunks)
+    return {
+        "status": "success",
+        "data": merge_fields(chunk["fields"] for chunk in chunks),
+        "entities": merge_entities([chunk["entities"] for chunk in chunks]),
+        "raw_text_preview": chunks[0]["preview"],
+        "pages": {
+            "total": total,
+            "read": pages_read,
+            "limit": max_pages,
+            "stopped_early": stopped_early,
+            "truncated": total > max_pages and not stopped_early
+        },
+        "timings_ms": {
+            "extract": round(extract_seconds * 1000, 2),
+            "pages_cpu": round(sum(chunk["seconds"] for chunk in chunks) * 1000, 2),
+            "tasks": len(chunks)
+        }
+    }
@@ -0,0 +1,154 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Pool sizes. XGBoost / NumPy release the GIL, so model work scales on threads;
+# pypdf and training hold it, so they get their own processes.
+MODEL_WORKERS = min(4, os.cpu_count() or 1)
+DB_WORKERS = 4
+IO_WORKERS = 8
+CPU_WORKERS = min(2, os.cpu_count() or 1)
+
+# Recent wait / run samples kept per pool for the percentiles in stats()
+TIMING_SAMPLES = 1024
+
+
+def _timed_call(fn, args, kwargs):
+    # Runs inside the worker (thread or process); wall-clock stamps are comparable
+    # across processes, so the caller can split queue wait from run time.
+    started = time.time()
+    result = fn(*args, **kwargs)
+    return result, started, time.time()
+
+
+def _summary_ms(samples):
+    if not samples:
+        return {"avg": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+    ordered = sorted(samples)
+    return {
+        "avg": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p50": round(ordered[len(ordered) // 2] * 1000, 3),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+        "max": round(ordered[-1] * 1000, 3)
+    }
+
+
+class InstrumentedPool:
+    """
+    A thread or process pool that async route handlers await through `run()`,
+    so blocking work never runs on the event loop. Tracks queue depth, queue
+    wait and run time. Process pools use 'spawn' (the server process holds
+    xgboost threads, which fork would copy in a broken state) and functions
+    sent to them must be importable module-level callables.
+    """
+
+    def __init__(self, name, kind, max_workers):
+        if kind not in ('thread', 'process'):
+            raise ValueError(f"Unknown pool kind '{kind}'")
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._waits = deque(maxlen=TIMING_SAMPLES)
+        self._runs = deque(maxlen=TIMING_SAMPLES)
+
+    def _get_executor(self):
+        # Created on first use: an idle process pool shouldn't cost a spawn at startup
+        with self._lock:
+            if self._executor is None:
+                if self.kind == 'process':
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn')
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+            return self._executor
+
+    async def run(self, fn, *args, **kwargs):
+        """Run `fn(*args, **kwargs)` on the pool and await its result."""
+        loop = asyncio.get_running_loop()
+        submitted_at = time.time()
+        with self._lock:
+            self._in_flight += 1
+            self._submitted += 1
+        try:
+            result, started, finished = await loop.run_in_executor(
+                self._get_executor(), _timed_call, fn, args, kwargs
+            )
+        except BrokenProcessPool:
+            # A worker died (OOM, segfault); start a fresh pool for the next call
+            with self._lock:
+                self._failed += 1
+                self._executor = None
+            raise
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+        with self._lock:
+            self._completed += 1
+            self._waits.append(max(0.0, started - submitted_at))
+            self._runs.append(finished - started)
+        return result
+
+    def stats(self):
+        with self._lock:
+            in_flight = self._in_flight
+            stats = {
+                "kind": self.kind,
+                "max_workers": self.max_workers,
+                "in_flight": in_flight,
+                # Everything beyond the worker count is waiting for a free worker
+                "queue_depth": max(0, in_flight - self.max_workers),
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "wait_ms": _summary_ms(list(self._waits)),
+                "run_ms": _summary_ms(list(self._runs))
+            }
+        return stats
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+class Executors:
+    """
+    The server's executor layer:
+      model - XGBoost / SHAP scoring (threads, GIL released in native code)
+      db    - SQLite queries and writes (threads)
+      io    - file writes, outbound HTTP (threads)
+      cpu   - pypdf extraction and model training (processes)
+    """
+
+    def __init__(self, model_workers=MODEL_WORKERS, db_workers=DB_WORKERS,
+                 io_workers=IO_WORKERS, cpu_workers=CPU_WORKERS):
+        self.model = InstrumentedPool('model', 'thread', model_workers)
+        self.db = InstrumentedPool('db', 'thread', db_workers)
+        self.io = InstrumentedPool('io', 'thread', io_workers)
+        self.cpu = InstrumentedPool('cpu', 'process', cpu_workers)
+        self.pools = (self.model, self.db, self.io, self.cpu)
+
+    def stats(self):
+        return {pool.name: pool.stats() for pool in self.pools}
+
+    def shutdown(self, wait=True):
+        for pool in self.pools:
+            pool.shutdown(wait=wait)
@@ -0,0 +1,77 @@
+import numpy as np
+
+# Per-request explanation modes:
+#   none  - skip explanations entirely (latency-critical callers)
+#   fast  - booster's approximate (Saabas) contributions
+#   exact - booster's exact TreeSHAP contributions, shap.TreeExplainer as fallback
+EXPLAIN_MODES = ('none', 'fast', 'exact')
+
+
+def validate_explain_mode(mode):
+    if mode not in EXPLAIN_MODES:
+        raise ValueError(f"Unknown explain mode '{mode}'. Expected one of: {', '.join(EXPLAIN_MODES)}")
+    return mode
+
+
+class NativeContribExplainer:
+    """
+    Feature contributions straight from the XGBoost booster (`pred_contribs`).
+    One batched call for all rows, indexed by each row's predicted class.
+    """
+
+    def __init__(self, model, approximate=False):
+        import xgboost as xgb
+        self._DMatrix = xgb.DMatrix
+        self.booster = model.get_booster()
+        self.feature_names = self.booster.feature_names
+        self.approximate = approximate
+
+    def explain(self, features, pred_idx):
+        dmatrix = self._DMatrix(features, feature_names=self.feature_names)
+        contribs = self.booster.predict(dmatrix, pred_contribs=True, approx_contribs=self.approximate)
+        # Multi-class: (n_rows, n_classes, n_features + 1); the last column is the bias term
+        if contribs.ndim == 3:
+            return contribs[np.arange(len(pred_idx)), pred_idx, :-1]
+        return contribs[:, :-1]
+
+
+class ShapExplainer:
+    """
+    Optional fallback through shap.TreeExplainer.
+    `shap` is only imported when this backend is actually built.
+    """
+
+    def __init__(self, model):
+        import shap
+        self.explainer = shap.TreeExplainer(model)
+
+    def explain(self, features, pred_idx):
+        shap_values = self.explainer.shap_values(features)
+        # Older SHAP releases return a list with one (n_rows, n_features) array per class
+        if isinstance(shap_values, list):
+            shap_values = np.stack(shap_values, axis=-1)
+        shap_values = np.asarray(shap_values)
+        if shap_values.ndim == 3:
+            # (n_rows, n_features, n_classes) -> pick the predicted class per row
+            return shap_values[np.arange(len(pred_idx)), :, pred_idx]
+        return shap_values
+
+
+def build_explainers(model):
+    """
+    Build the explanation backend for each mode. Native booster contributions are
+    preferred; shap is only imported when the model has no usable booster.
+    Returns {mode: backend} (modes with no working backend are left out).
+    """
+    explainers = {}
+    try:
+        explainers['fast'] = NativeContribExplainer(model, approximate=True)
+        explainers['exact'] = NativeContribExplainer(model, approximate=False)
+    except Exception as e:
+        print(f"Warning: native XGBoost contributions unavailable ({e}), falling back to shap.")
+        try:
+            explainers['exact'] = ShapExplainer(model)
+            explainers['fast'] = explainers['exact']
+        except Exception as shap_error:
+            print(f"Warning: SHAP explainer could not be initialized: {shap_error}")
+    return explainers
@@ -0,0 +1,111 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ExplanationService:
+    """
+    Deferred explanations: /predict returns straight away and the SHAP work runs on a
+    small background pool. Results live in a bounded LRU cache keyed by
+    (model version, explain mode, encoded feature vector), so identical inputs and
+    repeat views of a record never recompute SHAP.
+    """
+
+    def __init__(self, engine, load_record=None, max_workers=2, max_entries=4096):
+        self.engine = engine
+        # Fallback for patient ids we no longer track (evicted or before a restart)
+        self.load_record = load_record
+        self.max_entries = max_entries
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="explain")
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()     # key -> explanation dict
+        self._pending = {}              # key -> Future
+        self._failed = OrderedDict()    # key -> error message
+        self._patients = OrderedDict()  # patient_id -> key
+
+    def _key(self, record, explain):
+        bundle = self.engine.bundle
+        features = bundle.vectorizer.transform_one(record)
+        return (bundle.version, explain, features.tobytes())
+
+    def _compute(self, key, record, explain):
+        explanation, failure = None, None
+        try:
+            result = self.engine.predict_patient(record, explain=explain)
+            if result.get("status") == "error":
+                failure = result.get("message")
+            else:
+                explanation = {
+                    "insights": result["insights"],
+                    "shap_values": result["shap_values"],
+                    "model_version": result["model_version"]
+                }
+        except Exception as e:
+            failure = str(e)
+
+        with self._lock:
+            self._pending.pop(key, None)
+            # The bundle was hot-swapped meanwhile: never file the new model's output (or
+            # its errors) under the old version's key; the next get() resubmits
+            produced_by = explanation["model_version"] if explanation is not None else self.engine.model_version
+            if produced_by != key[0]:
+                return
+            target, value = (self._failed, failure) if explanation is None else (self._cache, explanation)
+            target[key] = value
+            target.move_to_end(key)
+            while len(target) > self.max_entries:
+                target.popitem(last=False)
+
+    def submit(self, patient_id, record, explain="exact"):
+        """Queue the explanation for a stored patient row (no-op if already cached or running)."""
+        key = self._key(record, explain)
+        with self._lock:
+            self._patients[patient_id] = key
+            self._patients.move_to_end(patient_id)
+            while len(self._patients) > self.max_entries:
+                self._patients.popitem(last=False)
+            if key in self._cache or key in self._pending:
+                return
+            self._failed.pop(key, None)
+            self._pending[key] = self._pool.submit(self._compute, key, record, explain)
+
+    def get(self, patient_id, explain="exact"):
+        """
+        Return {"status": "ready", ...}, {"status": "pending"} or None if the patient is unknown.
+        Untracked ids are re-queued from the stored row when `load_record` is available.
+        """
+        with self._lock:
+            key = self._patients.get(patient_id)
+        if key is None or key[0] != self.engine.model_version:
+            record = self.load_record(patient_id) if self.load_record else None
+            if record is None:
+                return None
+            self.submit(patient_id, record, explain)
+            with self._lock:
+                key = self._patients.get(patient_id)
+
+        with self._lock:
+            explanation = self._cache.get(key)
+            if explanation is not None:
+                self._cache.move_to_end(key)
+                return {"status": "ready", **explanation}
+            failure = self._failed.get(key)
+
+        if failure is not None:
+            return {"status": "error", "message": failure}
+        return {"status": "pending"}
+
+    def stats(self):
+        with self._lock:
+            return {"cached": len(self._cache), "pending": len(self._pending), "tracked_patients": len(self._patients)}
+
+    def after_fork(self):
+        # Pre-forked worker: the parent's pool threads don't exist here
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="explain")
+        # A parent thread may have held the lock at fork time; it never releases it here
+        self._lock = threading.Lock()
+        self._pending.clear()
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
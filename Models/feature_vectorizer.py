@@ -0,0 +1,106 @@
+import numpy as np
+
+# Columns must match training data order exactly
+FEATURE_COLUMNS = ['Age', 'Gender', 'Symptoms', 'Blood_Pressure', 'Heart_Rate', 'Temperature', 'O2_Saturation', 'Pain_Severity', 'Consciousness', 'Pre_Existing_Conditions']
+CATEGORICAL_COLUMNS = ['Gender', 'Symptoms', 'Consciousness', 'Pre_Existing_Conditions']
+COLUMN_INDEX = {col: idx for idx, col in enumerate(FEATURE_COLUMNS)}
+
+# Defaults for optional intake fields (Age, Blood_Pressure, Heart_Rate and Temperature are required)
+FEATURE_DEFAULTS = {
+    'Gender': 'Male',
+    'Symptoms': 'Fever',
+    'O2_Saturation': 98,
+    'Pain_Severity': 0,
+    'Consciousness': 'Alert',
+    'Pre_Existing_Conditions': 'None'
+}
+
+# Code written for categories the encoders never saw.
+# Every tree split on an encoded column has a threshold above 0, so -1 follows
+# exactly the same branches as code 0 (the old LabelEncoder fallback).
+UNKNOWN_CODE = -1
+
+# pandas reads "None" / blank cells as NaN, which the training encoders learn as 'nan'
+MISSING_TOKENS = (None, 'None', 'none', 'nan', 'NaN', '')
+
+
+class FeatureVectorizer:
+    """
+    Precompiled feature encoder shared by training and serving.
+    Built once from the fitted LabelEncoders: categories become plain dict lookups
+    and rows are written straight into float32 NumPy arrays in model column order.
+    """
+
+    def __init__(self, vocabularies, unknown_code=UNKNOWN_CODE):
+        self.columns = tuple(FEATURE_COLUMNS)
+        self.n_features = len(self.columns)
+        self.unknown_code = float(unknown_code)
+
+        self.lookups = {}
+        for col in CATEGORICAL_COLUMNS:
+            lookup = {str(cls): float(code) for code, cls in enumerate(vocabularies.get(col, []))}
+            if 'nan' in lookup:
+                for token in MISSING_TOKENS:
+                    lookup.setdefault(token, lookup['nan'])
+            self.lookups[col] = lookup
+
+        # Encoding plan: (column, lookup or None, default, required) in model column order
+        self._plan = tuple(
+            (col, self.lookups.get(col), FEATURE_DEFAULTS.get(col), col not in FEATURE_DEFAULTS)
+            for col in self.columns
+        )
+
+    @classmethod
+    def from_label_encoders(cls, le_dict, unknown_code=UNKNOWN_CODE):
+        """Compile the vectorizer from the `le_dict` stored in the model pickle."""
+        vocabularies = {col: list(encoder.classes_) for col, encoder in (le_dict or {}).items()}
+        return cls(vocabularies, unknown_code)
+
+    def _encode_record(self, record):
+        unknown = self.unknown_code
+        values = []
+        for col, lookup, default, required in self._plan:
+            value = record[col] if required else record.get(col, default)
+            if lookup is not None:
+                value = lookup.get(value, unknown)
+            values.append(value)
+        return values
+
+    def transform_one(self, record, out=None):
+        """Encode one raw patient dict into a float32 row of shape (n_features,)."""
+        if out is None:
+            out = np.empty(self.n_features, dtype=np.float32)
+        out[:] = self._encode_record(record)
+        return out
+
+    def transform(self, records, out=None):
+        """Encode a list of raw patient dicts into a float32 matrix of shape (n, n_features)."""
+        if out is None:
+            out = np.empty((len(records), self.n_features), dtype=np.float32)
+        if len(records):
+            out[:] = [self._encode_record(record) for record in records]
+        return out
+
+    def transform_frame(self, df):
+        """
+        Vectorized encode of a raw DataFrame (training CSV, benchmark sample).
+        Categories go through the same lookups as transform(), so training and
+        serving always agree.
+        """
+        out = np.empty((len(df), self.n_features), dtype=np.float32)
+        for idx, (col, lookup, default, required) in enumerate(self._plan):
+            if col not in df.columns:
+                if required:
+                    raise KeyError(col)
+                series = None
+            else:
+                series = df[col]
+
+            if lookup is None:
+                out[:, idx] = default if series is None else series.to_numpy(dtype=np.float32)
+            elif series is None:
+                out[:, idx] = lookup.get(default, self.unknown_code)
+            else:
+                codes = series.astype(str).map(lookup)
+                out[:, idx] = codes.fillna(self.unknown_code).to_numpy(dtype=np.float32)
+        return out
@@ -0,0 +1,248 @@
+import asyncio
+import json
+import threading
+from collections import deque
+
+# Seconds between reads of the queue_events feed while anyone in this process is
+# listening (local writes wake the reader immediately through notify())
+POLL_INTERVAL = 0.25
+FEED_BATCH = 1000
+# Frames held for one client that reads slower than events arrive; on overflow its
+# backlog is dropped and it gets a 'resync' event (refetch /doctor/queue) instead.
+# Entries reference the shared encoded frames, so a backlog costs pointers, not copies.
+SUBSCRIBER_BUFFER = 4096
+# SSE comment sent on idle streams so proxies keep them open and dead peers are noticed
+HEARTBEAT_INTERVAL = 15.0
+# Streams end after this long; EventSource reconnects with Last-Event-ID (no gap), which
+# also rebalances screens across worker processes and lets shutdowns drain
+STREAM_MAX_SECONDS = 600
+RECONNECT_MS = 2000
+
+FEED_SQL = "SELECT * FROM queue_events WHERE id > ? ORDER BY id LIMIT ?"
+
+
+def _frame(event, data, event_id=None):
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+
+def encode_event(row):
+    """queue_events row -> (id, department, SSE frame). Encoded once, shared by every subscriber."""
+    data = {
+        "id": row['id'],
+        "type": row['type'],
+        "patient_id": row['patient_id'],
+        "visit_status": row['visit_status'],
+        "risk_level": row['risk_level'],
+        "department": row['department'],
+        "priority": row['priority'],
+        "at": row['created_at']
+    }
+    return row['id'], row['department'], _frame(row['type'], data, row['id'])
+
+
+class Subscriber:
+    """One connected screen. Lives on (and is only touched from) its event loop."""
+
+    def __init__(self, loop, department=None, buffer=SUBSCRIBER_BUFFER):
+        self.loop = loop
+        self.department = department
+        self.buffer = buffer
+        self.frames = deque()
+        self.wakeup = asyncio.Event()
+        self.resync = False
+        self.closed = False
+        self.overflows = 0
+
+    def push(self, events):
+        for _, department, frame in events:
+            if self.department is not None and department != self.department:
+                continue
+            if len(self.frames) >= self.buffer:
+                # Slow reader: never block the fan-out or grow without bound
+                self.frames.clear()
+                self.resync = True
+                self.overflows += 1
+            self.frames.append(frame)
+        if self.frames or self.resync:
+            self.wakeup.set()
+
+    def close(self):
+        self.closed = True
+        self.wakeup.set()
+
+
+class QueueBroadcaster:
+    """
+    Server-sent queue deltas for doctor / admin screens.
+
+    Changes to patients are recorded by triggers in queue_events (see database.py),
+    whatever process or route made them. One reader thread per process tails that
+    table by id, only while someone here is subscribed, encodes each event once and
+    hands the batch to every event loop with a single call_soon_threadsafe; each
+    subscriber then keeps a bounded backlog. Screens get pushes instead of polling,
+    and the database sees one primary-key range read per interval per process.
+    """
+
+    def __init__(self, pool, interval=POLL_INTERVAL):
+        self.pool = pool
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._subscribers = {}    # loop -> set of Subscriber
+        self._last_id = None      # feed position, None while nobody listens
+        self._thread = None
+        self._stopping = False
+        self._polls = 0
+        self._events = 0
+        self._replayed = 0
+        self._resyncs = 0
+
+    def _feed_position(self, conn):
+        return conn.execute("SELECT COALESCE(MAX(id), 0) FROM queue_events").fetchone()[0]
+
+    def subscribe(self, loop, department=None, last_event_id=None):
+        """
+        Register a screen (blocking: run it on the db executor). With last_event_id
+        (EventSource reconnects), events it missed are replayed from the feed, or it
+        is told to resync when they have already been pruned or are too many.
+        """
+        subscriber = Subscriber(loop, department)
+        with self.pool.connection() as conn:
+            with self._lock:
+                if self._last_id is None:
+                    self._last_id = self._feed_position(conn)
+                position = self._last_id
+                if last_event_id is not None and last_event_id < position:
+                    rows = conn.execute(FEED_SQL, (last_event_id, subscriber.buffer + 1)).fetchall()
+                    oldest = conn.execute("SELECT MIN(id) FROM queue_events").fetchone()[0]
+                    if len(rows) > subscriber.buffer or oldest is None or oldest > last_event_id + 1:
+                        subscriber.resync = True
+                        self._resyncs += 1
+                    else:
+                        events = [encode_event(row) for row in rows if row['id'] <= position]
+                        subscriber.push(events)
+                        self._replayed += len(events)
+                self._subscribers.setdefault(loop, set()).add(subscriber)
+        self._ensure_thread()
+        return subscriber, position
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._resyncs += subscriber.overflows
+            subscribers = self._subscribers.get(subscriber.loop)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[subscriber.loop]
+            if not self._subscribers:
+                self._last_id = None   # idle: stop reading the feed
+
+    def notify(self):
+        """A local write happened: read the feed now instead of at the next tick."""
+        if self._subscribers:
+            self._wake.set()
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="queue-events", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self._poll()
+            except Exception as e:
+                print(f"Queue events error: {e}")
+
+    def _poll(self):
+        with self._lock:
+            if self._last_id is None:
+                return
+            position = self._last_id
+        with self.pool.connection() as conn:
+            rows = conn.execute(FEED_SQL, (position, FEED_BATCH)).fetchall()
+        with self._lock:
+            self._polls += 1
+            # A subscriber set that went idle and came back meanwhile re-read its position
+            if not rows or self._last_id != position:
+                return
+            self._last_id = rows[-1]['id']
+            self._events += len(rows)
+            targets = [(loop, list(subscribers)) for loop, subscribers in self._subscribers.items()]
+        if len(rows) == FEED_BATCH:
+            self._wake.set()   # more waiting
+        events = [encode_event(row) for row in rows]
+        for loop, subscribers in targets:
+            try:
+                loop.call_soon_threadsafe(self._fan_out, subscribers, events)
+            except RuntimeError:
+                pass  # loop closed; its streams are gone
+
+    @staticmethod
+    def _fan_out(subscribers, events):
+        for subscriber in subscribers:
+            subscriber.push(events)
+
+    async def stream(self, subscriber, position):
+        """SSE byte stream for one subscriber; unsubscribes when the client goes away."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + STREAM_MAX_SECONDS
+        try:
+            yield f"retry: {RECONNECT_MS}\n".encode() + _frame("hello", {"last_event_id": position})
+            while not subscriber.closed and loop.time() < deadline:
+                if not subscriber.frames and not subscriber.resync:
+                    subscriber.wakeup.clear()
+                    try:
+                        await asyncio.wait_for(subscriber.wakeup.wait(), HEARTBEAT_INTERVAL)
+                    except asyncio.TimeoutError:
+                        yield b": keepalive\n\n"
+                    continue
+                chunk = b''
+                if subscriber.resync:
+                    subscriber.resync = False
+                    chunk = _frame("resync", {"reason": "backlog dropped, refetch the queue"})
+                frames = list(subscriber.frames)
+                subscriber.frames.clear()
+                # Everything pending goes out in one write
+                yield chunk + b''.join(frames)
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "subscribers": sum(len(subscribers) for subscribers in self._subscribers.values()),
+                "event_loops": len(self._subscribers),
+                "last_event_id": self._last_id,
+                "polls": self._polls,
+                "events": self._events,
+                "replayed": self._replayed,
+                "resyncs": self._resyncs + sum(
+                    subscriber.overflows for subscribers in self._subscribers.values() for subscriber in subscribers
+                )
+            }
+
+    def after_fork(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._subscribers = {}
+        self._last_id = None
+        self._thread = None
+
+    def close(self):
+        """Stop the reader and end every open stream."""
+        self._stopping = True
+        self._wake.set()
+        with self._lock:
+            targets = [(loop, list(subscribers)) for loop, subscribers in self._subscribers.items()]
+        for loop, subscribers in targets:
+            for subscriber in subscribers:
+                try:
+                    loop.call_soon_threadsafe(subscriber.close)
+                except RuntimeError:
+                    pass
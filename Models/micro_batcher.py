@@ -0,0 +1,137 @@
+import asyncio
+import time
+
+# Coalescing window and batch cap for concurrent /predict calls
+DEFAULT_WINDOW_MS = 2.0
+DEFAULT_MAX_BATCH_SIZE = 32
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+QUEUE_WAIT_BUCKETS_MS = (0.25, 0.5, 1, 2, 5, 10, 25, 50, 100)
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus style: each bucket counts values <= bound)."""
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # last slot is +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        for idx, bound in enumerate(self.bounds):
+            if value <= bound:
+                break
+        else:
+            idx = len(self.bounds)
+        self.counts[idx] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def snapshot(self):
+        buckets = {}
+        running = 0
+        for bound, count in zip(self.bounds + ('+Inf',), self.counts):
+            running += count
+            buckets[str(bound)] = running
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 3) if self.count else 0.0,
+            "max": round(self.max, 3),
+            "buckets": buckets
+        }
+
+
+class MicroBatcher:
+    """
+    Request coalescer in front of TriageEngine.predict_batch.
+
+    Concurrent predict() calls with the same explain mode join an open batch; the
+    batch is dispatched when its window (measured from the first request) elapses or
+    it reaches max_batch_size, scored in one vectorized call on `pool`, and each
+    waiting coroutine gets its own result. A lone request therefore waits at most
+    one window. Batches are kept per event loop and all bookkeeping runs on that
+    loop's thread, so no locks.
+    """
+
+    def __init__(self, engine, pool, window_ms=DEFAULT_WINDOW_MS, max_batch_size=DEFAULT_MAX_BATCH_SIZE):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.engine = engine
+        self.pool = pool
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._open = {}      # (loop, explain mode) -> [(record, future, enqueued_at), ...]
+        self._timers = {}    # (loop, explain mode) -> TimerHandle of its open batch
+        self._in_flight = set()
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_ms = Histogram(QUEUE_WAIT_BUCKETS_MS)
+        self.requests = 0
+        self.batches = 0
+        self.fallbacks = 0
+
+    async def predict(self, record, explain='exact'):
+        """Score one patient record; resolves to the same dict as engine.predict_patient."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        key = (loop, explain)
+        batch = self._open.get(key)
+        if batch is None:
+            batch = self._open[key] = []
+            self._timers[key] = loop.call_later(self.window, self._dispatch, key)
+        batch.append((record, future, time.perf_counter()))
+        self.requests += 1
+        if len(batch) >= self.max_batch_size:
+            self._timers[key].cancel()
+            self._dispatch(key)
+        return await future
+
+    def _dispatch(self, key):
+        batch = self._open.pop(key, None)
+        self._timers.pop(key, None)
+        if not batch:
+            return
+        now = time.perf_counter()
+        self.batches += 1
+        self.batch_sizes.observe(len(batch))
+        for _, _, enqueued_at in batch:
+            self.queue_wait_ms.observe((now - enqueued_at) * 1000)
+        task = asyncio.ensure_future(self._score(key[1], batch))
+        # Keep a reference until done so the task isn't garbage collected mid-flight
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _score(self, explain, batch):
+        records = [record for record, _, _ in batch]
+        try:
+            results = await self.pool.run(self.engine.predict_batch, records, explain=explain)
+        except Exception:
+            # One malformed record (or a bad explain mode) must not fail its batch-mates:
+            # score each on its own, predict_patient reports errors per record
+            self.fallbacks += 1
+            results = await asyncio.gather(
+                *(self.pool.run(self.engine.predict_patient, record, explain=explain) for record in records),
+                return_exceptions=True
+            )
+        for (_, future, _), result in zip(batch, results):
+            if future.done():
+                continue  # caller went away
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self):
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch_size": self.max_batch_size,
+            "requests": self.requests,
+            "batches": self.batches,
+            "fallbacks": self.fallbacks,
+            "open_batches": len(self._open),
+            "batches_in_flight": len(self._in_flight),
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_wait_ms": self.queue_wait_ms.snapshot()
+        }
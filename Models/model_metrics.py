@@ -0,0 +1,106 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def metrics_path_for(bundle):
+    """Metrics live next to the artifact: model_versions/<version>.metrics.json."""
+    return os.path.splitext(bundle.path)[0] + '.metrics.json'
+
+
+class ModelMetricsStore:
+    """
+    Benchmark metrics computed once per model version and served from memory.
+
+    Every swap schedules the version on a background worker: the persisted
+    <artifact>.metrics.json is reused when it belongs to the same version, otherwise
+    the engine scores its fixed, seeded holdout and the result is written next to
+    the artifact. /metrics only ever reads the in-memory dict.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._lock = threading.Lock()
+        self._results = {}     # version -> metrics dict
+        self._pending = set()
+        self._errors = {}      # version -> last error message
+        self._worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-metrics")
+        engine.add_swap_listener(self.schedule)
+
+    def schedule(self, bundle):
+        """Queue metrics for `bundle` unless they are already known or being computed."""
+        with self._lock:
+            if bundle.version in self._results or bundle.version in self._pending:
+                return None
+            self._pending.add(bundle.version)
+            self._errors.pop(bundle.version, None)
+        return self._worker.submit(self._compute, bundle)
+
+    def _read_persisted(self, bundle):
+        try:
+            with open(metrics_path_for(bundle)) as f:
+                metrics = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        # A stale file from older weights at the same path doesn't count
+        return metrics if metrics.get('model_version') == bundle.version else None
+
+    def _persist(self, bundle, metrics):
+        path = metrics_path_for(bundle)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(metrics, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def _compute(self, bundle):
+        try:
+            metrics = self._read_persisted(bundle)
+            if metrics is None:
+                start = time.perf_counter()
+                metrics = self.engine.calculate_benchmarks(bundle=bundle)
+                if 'error' in metrics:
+                    raise RuntimeError(metrics['error'])
+                metrics['computed_at'] = time.strftime('%Y-%m-%d %H:%M:%S')
+                metrics['compute_seconds'] = round(time.perf_counter() - start, 3)
+                try:
+                    self._persist(bundle, metrics)
+                except OSError as e:
+                    print(f"Warning: could not persist metrics for {bundle.version}: {e}")
+                print(f"Metrics for model {bundle.version} computed in {metrics['compute_seconds']}s")
+            with self._lock:
+                self._results[bundle.version] = metrics
+            return metrics
+        except Exception as e:
+            print(f"Metrics Error ({bundle.version}): {e}")
+            with self._lock:
+                self._errors[bundle.version] = str(e)
+            return None
+        finally:
+            with self._lock:
+                self._pending.discard(bundle.version)
+
+    def get(self, version):
+        """Metrics for `version`, or a status dict while they are pending / after a failure."""
+        with self._lock:
+            metrics = self._results.get(version)
+            if metrics is not None:
+                return metrics
+            if version in self._pending:
+                return {"status": "pending", "model_version": version}
+            error = self._errors.get(version)
+        if error is not None:
+            return {"status": "error", "model_version": version, "error": error}
+        return {"status": "unavailable", "model_version": version}
+
+    def wait_idle(self, timeout=None):
+        """Block until everything scheduled so far has finished (single worker, FIFO)."""
+        self._worker.submit(lambda: None).result(timeout)
+
+    def after_fork(self):
+        # The parent's worker thread doesn't exist in a forked child
+        self._worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-metrics")
+
+    def shutdown(self):
+        self._worker.shutdown(wait=False)
@@ -0,0 +1,236 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking (single-process serving only)
+    fcntl = None
+
+from feature_vectorizer import FeatureVectorizer, FEATURE_DEFAULTS
+from explainers import build_explainers
+from tree_compiler import CompiledForest
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MODEL_PATH = os.path.join(BASE_DIR, 'triage_xgboost_v2.pkl')
+VERSIONS_DIR = os.path.join(BASE_DIR, 'model_versions')
+MANIFEST_NAME = 'registry.json'
+LOCK_NAME = 'registry.lock'
+
+# How often (seconds) each serving worker checks the manifest for a new active version
+SWAP_POLL_INTERVAL = 2.0
+
+
+def artifact_version(raw):
+    """Content fingerprint of a pickled model artifact - identical weights, identical version."""
+    return hashlib.sha256(raw).hexdigest()[:12]
+
+
+class ModelBundle:
+    """
+    Everything one model version needs to serve: weights, encoders, compiled trees and
+    explainers. Built completely (and warmed) before the engine swaps it in, and never
+    mutated afterwards, so a request that grabbed the bundle sees one consistent model.
+    """
+
+    def __init__(self, path, compile_trees=True):
+        with open(path, 'rb') as f:
+            raw = f.read()
+        data = pickle.loads(raw)
+
+        self.path = path
+        self.version = artifact_version(raw)
+        self.loaded_at = time.time()
+        self.model = data['model']
+        self.le_risk = data['le_risk']
+        self.le_dict = data['le_dict']
+        self.classes = self.le_risk.classes_
+        # Compile the label encoders once into plain dict lookups for serving
+        self.vectorizer = FeatureVectorizer.from_label_encoders(self.le_dict)
+
+        # Optional flat NumPy copy of the trees for single-row / small-batch scoring
+        self.forest = None
+        if compile_trees and str(self.model.get_params().get('objective', '')).startswith('multi:'):
+            try:
+                self.forest = CompiledForest.from_booster(self.model.get_booster(), len(self.classes))
+            except Exception as e:
+                print(f"Warning: tree compilation failed, scoring through xgboost: {e}")
+
+        # Explanation backends (native booster contributions, shap only as fallback)
+        self.explainers = build_explainers(self.model)
+
+    def warm(self):
+        """Run every scoring path once so the first real request pays no lazy-init cost."""
+        row = dict(FEATURE_DEFAULTS, Age=40, Blood_Pressure=120, Heart_Rate=80, Temperature=37.0)
+        features = self.vectorizer.transform([row])
+        probs = self.model.predict_proba(features)
+        if self.forest is not None:
+            self.forest.predict_proba(features)
+        pred_idx = np.argmax(probs, axis=1)
+        for backend in self.explainers.values():
+            backend.explain(features, pred_idx)
+        return self
+
+
+class ModelRegistry:
+    """
+    Versioned model artifacts kept in model_versions/ next to triage_xgboost_v2.pkl.
+    Each artifact is stored as <version>.pkl; registry.json records the history and
+    which version is active / previous, so restarts come back on the same weights.
+    Several server processes may share one registry: updates hold an flock on
+    registry.lock and re-read the manifest first, and readers refresh on mtime change.
+    """
+
+    def __init__(self, versions_dir=VERSIONS_DIR):
+        self.versions_dir = versions_dir
+        self.manifest_path = os.path.join(versions_dir, MANIFEST_NAME)
+        self.lock_path = os.path.join(versions_dir, LOCK_NAME)
+        self._lock = threading.Lock()
+        os.makedirs(versions_dir, exist_ok=True)
+        self._manifest_mtime = None
+        self._manifest = self._read_manifest()
+
+    def _read_manifest(self):
+        try:
+            self._manifest_mtime = os.path.getmtime(self.manifest_path)
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {"active": None, "previous": None, "versions": []}
+
+    @contextmanager
+    def _locked(self):
+        # Thread lock + cross-process flock; the manifest is re-read inside so
+        # another worker's update is never overwritten with a stale copy
+        with self._lock, open(self.lock_path, 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._manifest = self._read_manifest()
+                yield self._manifest
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def refresh(self):
+        """Re-read the manifest if another process has rewritten it."""
+        with self._lock:
+            try:
+                mtime = os.path.getmtime(self.manifest_path)
+            except FileNotFoundError:
+                return
+            if mtime != self._manifest_mtime:
+                self._manifest = self._read_manifest()
+
+    def _write_manifest(self):
+        # Write-then-rename so readers never see a half-written manifest
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self._manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+        self._manifest_mtime = os.path.getmtime(self.manifest_path)
+
+    def path_for(self, version):
+        return os.path.join(self.versions_dir, f"{version}.pkl")
+
+    def register(self, artifact_path, source=None):
+        """Copy an artifact into the registry (idempotent). Returns its version."""
+        with open(artifact_path, 'rb') as f:
+            version = artifact_version(f.read())
+        with self._locked() as manifest:
+            target = self.path_for(version)
+            if not os.path.exists(target):
+                shutil.copyfile(artifact_path, target + '.tmp')
+                os.replace(target + '.tmp', target)
+            if not any(entry['version'] == version for entry in manifest['versions']):
+                manifest['versions'].append({
+                    "version": version,
+                    "created_at": time.strftime('%Y-%m-%d %H:%M:%S'),
+                    "source": source or os.path.basename(artifact_path)
+                })
+                self._write_manifest()
+        return version
+
+    def bootstrap(self, default_path=DEFAULT_MODEL_PATH):
+        """Artifact path to serve on startup: the active version, or the default pickle registered as v1."""
+        active = self.active_version()
+        if active and os.path.exists(self.path_for(active)):
+            return self.path_for(active)
+        version = self.register(default_path, source='bootstrap')
+        self.mark_active(version)
+        return self.path_for(version)
+
+    def mark_active(self, version):
+        with self._locked() as manifest:
+            current = manifest.get('active')
+            if current != version:
+                manifest['previous'] = current
+                manifest['active'] = version
+                self._write_manifest()
+
+    def active_version(self):
+        self.refresh()
+        with self._lock:
+            return self._manifest.get('active')
+
+    def describe(self):
+        self.refresh()
+        with self._lock:
+            return json.loads(json.dumps(self._manifest))
+
+
+class ActiveVersionWatcher:
+    """
+    Keeps one serving process on the registry's active version. A multi-worker server
+    (serve.py) runs one per worker: whichever worker trains, activates or rolls back
+    updates the manifest, and the others follow within `interval` seconds - instantly
+    when the new active version is the one they still hold as previous.
+    """
+
+    def __init__(self, registry, engine, interval=SWAP_POLL_INTERVAL):
+        self.registry = registry
+        self.engine = engine
+        self.interval = interval
+        self._loading = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def check(self):
+        active = self.registry.active_version()
+        if not active or active in (self.engine.model_version, self._loading):
+            return
+        if active == self.engine.previous_version:
+            self.engine.rollback()
+            print(f"Followed registry rollback to model {active}")
+            return
+        path = self.registry.path_for(active)
+        if not os.path.exists(path):
+            return
+        self._loading = active
+        future = self.engine.load_model_async(path)
+        future.add_done_callback(lambda _: setattr(self, '_loading', None))
+        print(f"Following registry: loading model {active}")
+
+    def _run(self):
+        while True:
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Warning: registry check failed: {e}")
+            if self._stop.wait(self.interval):
+                return
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="registry-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
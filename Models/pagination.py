@@ -0,0 +1,149 @@
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# Rows per streamed chunk (each chunk is one keyset page on a briefly borrowed connection)
+STREAM_CHUNK_ROWS = 200
+
+RESPONSE_FORMATS = ('json', 'ndjson')
+
+
+def encode_cursor(values):
+    """Opaque, URL-safe token for the sort key of the last row of a page."""
+    raw = json.dumps(list(values), separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, size):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Malformed cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Malformed cursor")
+    return values
+
+
+def parse_fields(fields, allowed):
+    """Comma-separated projection -> column tuple (None = every column)."""
+    if not fields:
+        return None
+    columns = tuple(dict.fromkeys(name.strip() for name in fields.split(',') if name.strip()))
+    unknown = [name for name in columns if name not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    return columns or None
+
+
+class KeysetQuery:
+    """
+    Keyset (seek) pagination over one table, or over several tables with the same
+    columns (hot table + archive partitions) read as one sorted UNION ALL.
+
+    `keys` is the ORDER BY as (column, 'ASC' | 'DESC') pairs ending in a unique
+    column, all in one direction, so "rows after the cursor" is a single row-value
+    comparison that an index on the same columns answers without OFFSET scans or a
+    sort (for several tables SQLite merges the per-table index orders). Projected
+    columns are selected alongside the key columns; the key columns only reach the
+    output when they were asked for. `all_columns` is the explicit column list used
+    instead of * when several tables are read, so their column order can't differ.
+    """
+
+    def __init__(self, table, keys, where='1', params=(), columns=None, all_columns=None):
+        directions = {direction for _, direction in keys}
+        if len(directions) != 1:
+            raise ValueError("Keyset columns must share one sort direction")
+        self.tables = (table,) if isinstance(table, str) else tuple(table)
+        self.keys = [column for column, _ in keys]
+        self.direction = directions.pop()
+        self.where = where
+        self.params = tuple(params)
+        self.columns = columns
+        self.all_columns = all_columns
+
+    def sql(self, after=None, limit=None):
+        if self.columns is not None:
+            select = ', '.join(dict.fromkeys(tuple(self.columns) + tuple(self.keys)))
+        elif len(self.tables) > 1 and self.all_columns:
+            select = ', '.join(self.all_columns)
+        else:
+            select = '*'
+        where, arm_params = self.where, list(self.params)
+        if after is not None:
+            op = '<' if self.direction == 'DESC' else '>'
+            where = f"({where}) AND ({', '.join(self.keys)}) {op} ({', '.join('?' * len(self.keys))})"
+            arm_params.extend(after)
+        order = ', '.join(f"{column} {self.direction}" for column in self.keys)
+        sql = ' UNION ALL '.join(f"SELECT {select} FROM {table} WHERE {where}" for table in self.tables)
+        params = arm_params * len(self.tables)
+        sql += f" ORDER BY {order}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return sql, params
+
+    def project(self, row):
+        if self.columns is None:
+            return dict(row)
+        return {column: row[column] for column in self.columns}
+
+    def page(self, conn, cursor=None, limit=DEFAULT_PAGE_SIZE):
+        """One page of at most `limit` rows plus the cursor for the next one (None at the end)."""
+        after = decode_cursor(cursor, len(self.keys)) if cursor else None
+        sql, params = self.sql(after, limit + 1)
+        rows = conn.execute(sql, params).fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][column] for column in self.keys)
+        return [self.project(row) for row in rows], next_cursor
+
+    def iter_chunks(self, pool, fmt='ndjson', prefix=b'', suffix=b''):
+        """
+        Every matching row, encoded as bytes a few hundred rows at a time: memory stays
+        flat however many rows match. 'json' emits one array (wrapped in prefix /
+        suffix), 'ndjson' one object per line.
+
+        Each chunk is its own keyset page on a connection borrowed only for that fetch,
+        so a slow or stalled client never pins a pool slot between chunks. Rows
+        committed mid-stream appear if they sort after the current position.
+        """
+        after = None
+        first = True
+        if fmt == 'json':
+            yield prefix + b'['
+        while True:
+            sql, params = self.sql(after, STREAM_CHUNK_ROWS)
+            with pool.connection() as conn:
+                rows = conn.execute(sql, params).fetchall()
+            if not rows:
+                break
+            after = [rows[-1][column] for column in self.keys]
+            encoded = [json.dumps(self.project(row), default=str) for row in rows]
+            if fmt == 'json':
+                chunk = (',' if not first else '') + ','.join(encoded)
+            else:
+                chunk = ''.join(line + '\n' for line in encoded)
+            first = False
+            yield chunk.encode()
+            if len(rows) < STREAM_CHUNK_ROWS:
+                break
+        if fmt == 'json':
+            yield b']' + suffix
+
+
+async def drive_chunks(chunks, executor):
+    """Async iterator pulling a blocking chunk generator one step at a time on `executor`."""
+    try:
+        while True:
+            chunk = await executor.run(next, chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        try:
+            chunks.close()  # client went away early: no further pages are fetched
+        except ValueError:
+            pass  # still running on the executor; it is closed when garbage collected
@@ -0,0 +1,124 @@
+import heapq
+import threading
+
+# Only succeeds while the row still matches the heap entry it was popped from
+CLAIM_SQL = '''
+    UPDATE patients SET visit_status='Consulting'
+    WHERE id=? AND visit_status='Waiting' AND priority IS ? AND department IS ?
+'''
+# Why a claim changed no row: taken by someone else, or re-triaged since it was loaded
+RECHECK_SQL = "SELECT id, priority, timestamp, department, visit_status FROM patients WHERE id=?"
+
+# New waiting visits since the last sync: a primary-key range scan, usually empty
+CATCH_UP_SQL = '''
+    SELECT id, priority, timestamp, department FROM patients
+    WHERE id > ? AND visit_status = 'Waiting'
+    ORDER BY id
+'''
+
+
+class WaitingQueue:
+    """
+    In-memory priority heap of waiting patients, keyed by (priority, arrival time, id),
+    with one sub-heap per department.
+
+    The heap is filled from SQLite: everything on first use, then only rows with an id
+    above the last one seen before each claim (ids only grow, so visits written by any
+    worker process are picked up). A claim pops the best candidate and persists it
+    with a single conditional UPDATE ... WHERE visit_status='Waiting'; if that changes
+    no row, someone else (another worker, a direct completion) got there first and the
+    next candidate is tried. Popped entries are never handed out twice, and the
+    conditional UPDATE makes double-claims impossible across processes too.
+
+    Priority / department changes to rows already loaded are not pushed to the heap;
+    they are caught when such a row reaches the top (the claim re-checks both) and the
+    row is re-queued with its current values. A re-triage that raises a patient's
+    priority therefore only takes effect once the stale entry surfaces.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._lock = threading.Lock()
+        self._heap = []           # (priority, timestamp, id) across all departments
+        self._departments = {}    # department -> heap of the same entries
+        self._waiting = {}        # id -> (entry, department) for entries still live in the heaps
+        self._last_seen_id = 0
+
+    def _push(self, entry, department):
+        heapq.heappush(self._heap, entry)
+        heapq.heappush(self._departments.setdefault(department, []), entry)
+        self._waiting[entry[2]] = (entry, department)
+
+    def _catch_up(self, conn):
+        rows = conn.execute(CATCH_UP_SQL, (self._last_seen_id,)).fetchall()
+        for row in rows:
+            self._push((row['priority'], row['timestamp'] or '', row['id']), row['department'])
+            self._last_seen_id = max(self._last_seen_id, row['id'])
+        return len(rows)
+
+    def _pop(self, department):
+        heap = self._heap if department is None else self._departments.get(department, [])
+        while heap:
+            entry = heapq.heappop(heap)
+            # Lazy deletion: entries already taken through the other heap, or replaced
+            # by a re-queued copy, are skipped
+            live = self._waiting.get(entry[2])
+            if live is not None and live[0] == entry:
+                del self._waiting[entry[2]]
+                self._maybe_compact()
+                return live
+        return None
+
+    def _maybe_compact(self):
+        # Drop entries left behind in the heap(s) a claim didn't pop from
+        held = len(self._heap) + sum(len(heap) for heap in self._departments.values())
+        if held <= 4 * len(self._waiting) + 128:
+            return
+        self._heap = [entry for entry, _ in self._waiting.values()]
+        heapq.heapify(self._heap)
+        departments = {}
+        for entry, department in self._waiting.values():
+            departments.setdefault(department, []).append(entry)
+        for heap in departments.values():
+            heapq.heapify(heap)
+        self._departments = departments
+
+    def claim(self, department=None):
+        """
+        Atomically move the next waiting patient (optionally of one department) to 'Consulting'.
+        If the UPDATE fails (e.g. still locked after the busy timeout) the candidate is
+        put back before the error propagates, so the patient stays claimable.
+        """
+        with self.pool.connection() as conn:
+            with self._lock:
+                self._catch_up(conn)
+            while True:
+                with self._lock:
+                    popped = self._pop(department)
+                if popped is None:
+                    return None
+                entry, queued_department = popped
+                patient_id = entry[2]
+                try:
+                    with conn:
+                        claimed = conn.execute(CLAIM_SQL, (patient_id, entry[0], queued_department)).rowcount == 1
+                    if claimed:
+                        return dict(conn.execute("SELECT * FROM patients WHERE id=?", (patient_id,)).fetchone())
+                    row = conn.execute(RECHECK_SQL, (patient_id,)).fetchone()
+                except Exception:
+                    with self._lock:
+                        if patient_id not in self._waiting:
+                            self._push(entry, queued_department)
+                    raise
+                if row is not None and row['visit_status'] == 'Waiting':
+                    # Re-triaged since it was loaded: queue it again as it is now
+                    with self._lock:
+                        self._push((row['priority'], row['timestamp'] or '', row['id']), row['department'])
+
+    def sizes(self):
+        """Waiting entries held in memory, overall and per department (as of the last sync)."""
+        with self._lock:
+            per_department = {}
+            for _, department in self._waiting.values():
+                per_department[department] = per_department.get(department, 0) + 1
+            return {"total": len(self._waiting), "departments": per_department}
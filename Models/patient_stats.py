@@ -0,0 +1,119 @@
+import threading
+from collections import deque
+
+from database import ROLLUP_FORMATS, STATS_VERSION_KEY
+
+# Size of the recent-patients ring shown on the admin dashboard
+RECENT_PATIENTS = 10
+# Default trend window per granularity (buckets)
+TREND_BUCKETS = {'hour': 48, 'day': 30}
+
+VERSION_SQL = "SELECT count FROM stats_counters WHERE metric = ? AND key = ?"
+COUNTERS_SQL = "SELECT metric, key, count FROM stats_counters WHERE metric != ? AND count != 0"
+# Newest visits by rowid: a reverse primary-key walk, no sort
+RECENT_SQL = "SELECT * FROM patients ORDER BY id DESC LIMIT ?"
+TRENDS_SQL = '''
+    SELECT bucket, department, risk_level, count FROM stats_rollups
+    WHERE granularity = ? AND bucket >= ?
+    ORDER BY bucket
+'''
+
+
+def _key(value):
+    # Summary tables store NULL dimensions as ''
+    return value if value != '' else None
+
+
+class PatientStats:
+    """
+    Admin dashboard figures served from memory.
+
+    The counters live in SQLite (stats_counters / stats_rollups, maintained by
+    triggers on patients), so they survive restarts and every worker process sees
+    the same numbers. This process keeps a snapshot of them plus a ring buffer of
+    the newest visits, and only re-reads both when the stats version row has moved:
+    a dashboard poll costs one primary-key lookup however large patients grows.
+    """
+
+    def __init__(self, pool, recent_size=RECENT_PATIENTS):
+        self.pool = pool
+        self.recent_size = recent_size
+        self._lock = threading.Lock()
+        self._version = None
+        self._risks = {}
+        self._departments = {}
+        self._statuses = {}
+        self._recent = deque(maxlen=recent_size)
+        self._refreshes = 0
+
+    def _refresh(self, conn, version):
+        counters = {'risk_level': {}, 'department': {}, 'visit_status': {}}
+        for row in conn.execute(COUNTERS_SQL, (STATS_VERSION_KEY[0],)):
+            counters.setdefault(row['metric'], {})[_key(row['key'])] = row['count']
+        recent = [dict(row) for row in conn.execute(RECENT_SQL, (self.recent_size,))]
+        self._risks = counters['risk_level']
+        self._departments = counters['department']
+        self._statuses = counters['visit_status']
+        self._recent.clear()
+        self._recent.extend(recent)
+        self._version = version
+        self._refreshes += 1
+
+    def _sync(self):
+        with self.pool.connection() as conn:
+            # One read transaction, so counters and ring agree with the version read
+            with conn:
+                conn.execute("BEGIN")
+                version = conn.execute(VERSION_SQL, STATS_VERSION_KEY).fetchone()[0]
+                with self._lock:
+                    if version != self._version:
+                        self._refresh(conn, version)
+
+    def summary(self):
+        """Risk distribution, department load, visit statuses and the newest visits."""
+        self._sync()
+        with self._lock:
+            return {
+                "status": "success",
+                "risk_distribution": dict(self._risks),
+                "department_load": dict(self._departments),
+                "visit_status": dict(self._statuses),
+                "recent_patients": list(self._recent)
+            }
+
+    def trends(self, granularity='hour', buckets=None, department=None):
+        """Arrivals per time bucket (UTC) and risk level, optionally for one department."""
+        if granularity not in ROLLUP_FORMATS:
+            return {"status": "error", "message": f"Unknown granularity '{granularity}'. Use one of {tuple(ROLLUP_FORMATS)}."}
+        buckets = buckets or TREND_BUCKETS[granularity]
+        offset = f"-{int(buckets) - 1} {granularity}s"
+        with self.pool.connection() as conn:
+            since = conn.execute(
+                "SELECT strftime(?, 'now', ?)", (ROLLUP_FORMATS[granularity], offset)
+            ).fetchone()[0]
+            rows = conn.execute(TRENDS_SQL, (granularity, since)).fetchall()
+
+        series = {}
+        for row in rows:
+            row_department = _key(row['department'])
+            if department is not None and row_department != department:
+                continue
+            point = series.setdefault(row['bucket'], {"bucket": row['bucket'], "total": 0, "risk_levels": {}, "departments": {}})
+            point["total"] += row['count']
+            risk = _key(row['risk_level'])
+            point["risk_levels"][risk] = point["risk_levels"].get(risk, 0) + row['count']
+            point["departments"][row_department] = point["departments"].get(row_department, 0) + row['count']
+        return {
+            "status": "success",
+            "granularity": granularity,
+            "since": since,
+            "department": department,
+            "series": list(series.values())
+        }
+
+    def stats(self):
+        with self._lock:
+            return {"version": self._version, "refreshes": self._refreshes, "recent_size": self.recent_size}
+
+    def after_fork(self):
+        self._lock = threading.Lock()
@@ -3,6 +3,7 @@ import time
 import statistics
 import concurrent.futures
 import json
+import sys
 
 BASE_URL = "http://localhost:8000"
 
@@ -68,8 +69,214 @@ def run_benchmarks():
     total_time = time.time() - start_time
     print(f"Total time for 10 concurrent requests: {total_time:.2f}s (Throughput: {10/total_time:.2f} req/s)")
 
+def bench_tree_evaluator(batch_sizes=(1, 8, 64, 1024), min_rows=4000):
+    """In-process latency of compiled NumPy trees vs XGBClassifier.predict_proba."""
+    import pandas as pd
+    from triage_logic import TriageEngine
+    from tree_compiler import CompiledForest
+
+    print("--- Compiled Tree Evaluator vs XGBoost predict_proba ---")
+    engine = TriageEngine(compile_trees=False)
+    forest = CompiledForest.from_booster(engine.model.get_booster(), len(engine.le_risk.classes_))
+    X = engine.vectorizer.transform_frame(pd.read_csv("data/final_triage_data_50k_v2.csv"))
+
+    def per_call(fn, batch):
+        iterations = max(20, min_rows // len(batch))
+        fn(batch)  # warm-up
+        latencies = []
+        for _ in range(iterations):
+            start_time = time.perf_counter()
+            fn(batch)
+            latencies.append(time.perf_counter() - start_time)
+        return statistics.median(latencies) * 1e6
+
+    print(f"  {'batch':>6} {'xgboost (us)':>14} {'compiled (us)':>14} {'speedup':>8}")
+    for size in batch_sizes:
+        batch = X[:size]
+        xgb_us = per_call(engine.model.predict_proba, batch)
+        compiled_us = per_call(forest.predict_proba, batch)
+        print(f"  {size:>6} {xgb_us:>14.1f} {compiled_us:>14.1f} {xgb_us / compiled_us:>7.2f}x")
+
+def bench_micro_batching(concurrency=64, requests_per_mode=(("none", 4096), ("fast", 4096), ("exact", 512))):
+    """In-process /predict scoring under concurrency: one engine call per request vs MicroBatcher."""
+    import asyncio
+    import pandas as pd
+    from triage_logic import TriageEngine
+    from executors import Executors
+    from micro_batcher import MicroBatcher
+
+    print(f"--- Micro-batching ({concurrency} concurrent clients) ---")
+    engine = TriageEngine()
+    # Distinct rows, so the prediction cache doesn't serve repeats
+    records = pd.read_csv("data/final_triage_data_50k_v2.csv").to_dict("records")
+
+    async def drive(score, rows):
+        latencies = []
+        queue = iter(rows)
+
+        async def client():
+            for record in queue:
+                start_time = time.perf_counter()
+                await score(record)
+                latencies.append(time.perf_counter() - start_time)
+
+        start_time = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return time.perf_counter() - start_time, latencies
+
+    async def run_all():
+        executors = Executors()
+        offset = 0
+        for explain, total_requests in requests_per_mode:
+            batcher = MicroBatcher(engine, executors.model)
+            runs = [
+                ("per-request", lambda record: executors.model.run(engine.predict_patient, record, explain=explain)),
+                ("micro-batched", lambda record: batcher.predict(record, explain=explain)),
+            ]
+            print(f"  explain={explain}, {total_requests} requests")
+            for name, score in runs:
+                rows = records[offset:offset + total_requests]
+                offset += total_requests
+                elapsed, latencies = await drive(score, rows)
+                p99 = statistics.quantiles(latencies, n=100)[98] * 1000
+                print(f"    {name:>14}: {len(rows) / elapsed:8.1f} req/s, p50 {statistics.median(latencies) * 1000:7.2f}ms, p99 {p99:7.2f}ms")
+            stats = batcher.stats()
+            print(f"    batch size {stats['batch_size']['mean']} avg, queue wait {stats['queue_wait_ms']['mean']}ms avg")
+        executors.shutdown()
+
+    asyncio.run(run_all())
+
+def bench_patient_writes(concurrency=256, total_rows=20000):
+    """Insert throughput on a scratch database: one commit per row vs group commit."""
+    import asyncio
+    import os
+    import tempfile
+    from database import ConnectionPool, migrate, PATIENT_INSERT_SQL
+    from executors import Executors
+    from write_behind import GroupCommitWriter
+
+    print(f"--- Patient inserts ({concurrency} concurrent writers, {total_rows} rows) ---")
+    row = (None, 40, "Male", "Fever", 120, 80, 37.0, 98, 2, "Alert", "None", "Low", "General Medicine", "91.00%", 3)
+
+    async def drive(writer, rows):
+        remaining = iter(range(rows))
+
+        async def client():
+            for _ in remaining:
+                await writer.insert(row)
+
+        start_time = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return time.perf_counter() - start_time
+
+    async def run_all(path):
+        pool = ConnectionPool(path)
+        migrate(pool)
+        executors = Executors()
+        for mode, rows in (("sync", total_rows // 10), ("group", total_rows)):
+            writer = GroupCommitWriter(pool, PATIENT_INSERT_SQL, mode=mode, executor=executors.db)
+            elapsed = await drive(writer, rows)
+            writer.close()
+            stats = writer.stats()
+            print(f"  {mode:>6}: {rows / elapsed:10.1f} rows/s ({stats['avg_rows_per_commit']} rows/commit, {stats['avg_commit_ms']}ms/commit)")
+        executors.shutdown()
+        pool.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run_all(os.path.join(tmp, "bench.db")))
+
+def bench_admin_stats(sizes=(1000, 10000, 100000), polls=200):
+    """Admin dashboard poll on a scratch database: the old GROUP BY scans vs the cached summary."""
+    import os
+    import tempfile
+    from database import ConnectionPool, migrate, PATIENT_INSERT_SQL
+    from patient_stats import PatientStats
+
+    print(f"--- Admin stats poll ({polls} polls per table size) ---")
+    departments = ["General Medicine", "Cardiology", "Emergency Care", "Neurology"]
+
+    def scan(pool):
+        with pool.connection() as conn:
+            conn.execute("SELECT risk_level, COUNT(*) FROM patients GROUP BY risk_level").fetchall()
+            conn.execute("SELECT department, COUNT(*) FROM patients GROUP BY department").fetchall()
+            conn.execute("SELECT * FROM patients ORDER BY timestamp DESC LIMIT 10").fetchall()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = ConnectionPool(os.path.join(tmp, "bench.db"))
+        migrate(pool)
+        stats = PatientStats(pool)
+        inserted = 0
+        for size in sizes:
+            with pool.transaction() as conn:
+                conn.executemany(PATIENT_INSERT_SQL, [
+                    (None, 40, "Male", "Fever", 120, 80, 37.0, 98, 2, "Alert", "None",
+                     ("Low", "Medium", "High")[i % 3], departments[i % 4], "91.00%", 3 - i % 3)
+                    for i in range(inserted, size)
+                ])
+            inserted = size
+            for name, poll in (("group by", lambda: scan(pool)), ("summary", stats.summary)):
+                start_time = time.perf_counter()
+                for _ in range(polls):
+                    poll()
+                elapsed = time.perf_counter() - start_time
+                print(f"  {size:>7} rows {name:>9}: {elapsed / polls * 1000:8.3f}ms/poll")
+        pool.close()
+
+def bench_bulk_ingest(documents=500, per_file_sample=50):
+    """A clinic transfer (zip of notes) against the running server: per-file /parse_ehr + /predict vs /ingest/bulk."""
+    import io
+    import zipfile
+
+    print(f"--- Bulk ingestion ({documents} documents) ---")
+    symptoms = ["Chest Pain", "Fever", "Cough", "Numbness", "Abdominal Pain", "Seizures"]
+    notes = [
+        f"Age: {20 + i % 60}\nGender: {('Male', 'Female')[i % 2]}\nComplaint: {symptoms[i % len(symptoms)]}\n"
+        f"BP: {100 + i % 80}/80, Heart Rate: {60 + i % 70}, Temp: {36.5 + i % 4 / 2}, SpO2: {90 + i % 10}%\n"
+        f"History: {('None', 'Hypertension', 'Diabetes')[i % 3]}"
+        for i in range(documents)
+    ]
+
+    # Old path: two round trips per file (timed on a sample, extrapolated)
+    start_time = time.perf_counter()
+    for i, note in enumerate(notes[:per_file_sample]):
+        parsed = requests.post(f"{BASE_URL}/parse_ehr", files={"file": (f"p{i}.txt", note.encode())}, timeout=30).json()
+        requests.post(f"{BASE_URL}/predict", json={**SAMPLES[0], **parsed["data"]}, timeout=30)
+    per_file = (time.perf_counter() - start_time) / per_file_sample
+    print(f"  per file: {per_file * 1000:7.2f}ms/document (~{per_file * documents:.2f}s for {documents})")
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for i, note in enumerate(notes):
+            archive.writestr(f"transfer/p{i}.txt", note)
+    start_time = time.perf_counter()
+    first_line = None
+    summary = None
+    with requests.post(f"{BASE_URL}/ingest/bulk", files={"file": ("transfer.zip", buffer.getvalue())}, stream=True, timeout=300) as response:
+        for line in response.iter_lines():
+            if not line:
+                continue
+            event = json.loads(line)
+            if first_line is None and event["event"] == "file":
+                first_line = time.perf_counter() - start_time
+            if event["event"] == "summary":
+                summary = event
+    elapsed = time.perf_counter() - start_time
+    print(f"  bulk:     {elapsed:.2f}s total, first progress line after {(first_line or 0) * 1000:.0f}ms")
+    print(f"  summary:  {summary}")
+
 if __name__ == "__main__":
     try:
-        run_benchmarks()
+        if "--engine" in sys.argv:
+            bench_tree_evaluator()
+        elif "--batching" in sys.argv:
+            bench_micro_batching()
+        elif "--writes" in sys.argv:
+            bench_patient_writes()
+        elif "--admin-stats" in sys.argv:
+            bench_admin_stats()
+        elif "--bulk" in sys.argv:
+            bench_bulk_ingest()
+        else:
+            run_benchmarks()
     except Exception as e:
         print(f"Benchmarking failed: {e}")
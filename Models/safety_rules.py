@@ -0,0 +1,67 @@
+import json
+import os
+import numpy as np
+
+from feature_vectorizer import COLUMN_INDEX
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RULES_PATH = os.path.join(BASE_DIR, 'config', 'safety_rules.json')
+
+# Numeric comparisons on the encoded feature matrix
+OPERATORS = {
+    '>=': np.greater_equal,
+    '>': np.greater,
+    '<=': np.less_equal,
+    '<': np.less,
+    '==': np.equal,
+    '!=': np.not_equal,
+}
+
+NO_RULE = -1
+
+
+class SafetyRuleTable:
+    """
+    Declarative safety overrides, loaded from config/safety_rules.json.
+
+    Rules are evaluated in file order as NumPy masks over the whole encoded batch;
+    the first matching rule decides a row. Each rule is either a numeric comparison
+    (`op` + `value`) or a categorical match (`in` + list of raw category strings,
+    resolved through the serving vectorizer's lookups).
+    """
+
+    def __init__(self, rules):
+        for rule in rules:
+            if rule['feature'] not in COLUMN_INDEX:
+                raise ValueError(f"Safety rule '{rule['name']}' references unknown feature '{rule['feature']}'")
+            if 'in' not in rule and rule.get('op') not in OPERATORS:
+                raise ValueError(f"Safety rule '{rule['name']}' has unsupported op '{rule.get('op')}'")
+        self.rules = tuple(rules)
+        self.names = np.array([rule['name'] for rule in rules] + [None], dtype=object)
+        self.reasons = np.array([rule['reason'] for rule in rules] + [None], dtype=object)
+        self.risk_levels = np.array([rule.get('risk_level', 'High') for rule in rules] + [None], dtype=object)
+        self.confidences = np.array([float(rule.get('confidence', 1.0)) for rule in rules] + [np.nan])
+
+    @classmethod
+    def load(cls, path=DEFAULT_RULES_PATH):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f)['rules'])
+
+    def _mask(self, rule, features, vectorizer):
+        column = features[:, COLUMN_INDEX[rule['feature']]]
+        if 'in' in rule:
+            lookup = vectorizer.lookups.get(rule['feature'], {})
+            codes = [lookup[value] for value in rule['in'] if value in lookup]
+            return np.isin(column, codes)
+        return OPERATORS[rule['op']](column, rule['value'])
+
+    def evaluate(self, features, vectorizer):
+        """Index of the first matching rule per row, NO_RULE (-1) where none fired."""
+        decided = np.full(len(features), NO_RULE, dtype=np.int64)
+        # Walk in reverse so earlier (higher-priority) rules overwrite later ones
+        for idx in range(len(self.rules) - 1, -1, -1):
+            decided[self._mask(self.rules[idx], features, vectorizer)] = idx
+        return decided
+
+    def describe(self):
+        return [dict(rule) for rule in self.rules]
@@ -0,0 +1,141 @@
+"""
+Production launcher: N uvicorn workers pre-forked from one warmed parent.
+
+    python serve.py --workers 4 --port 8000
+
+The parent imports app.py once (DB init, model registry, model load + warm, metrics),
+freezes the GC and then forks the workers, so they share the model pages
+copy-on-write instead of unpickling one copy each. All workers accept on the same
+listening socket. Model swaps stay coordinated through model_versions/registry.json:
+every worker runs an ActiveVersionWatcher and follows whatever version another
+worker activates. Dead workers are restarted. Unix only (fork).
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# One OpenMP thread per worker: N workers already keep N cores busy, and libgomp's
+# thread pool must not exist in the parent when it forks (children would hang on it).
+os.environ.setdefault('OMP_NUM_THREADS', '1')
+
+# Restart throttle for workers that die right after starting
+MIN_WORKER_UPTIME = 1.0
+# Seconds a stopping worker waits for open requests; long-lived /events/queue
+# streams are cut after this and their clients reconnect to another worker
+SHUTDOWN_GRACE = 10
+
+
+def build_socket(host, port, backlog=2048):
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app_module, sock, args):
+    import uvicorn
+    from model_registry import ActiveVersionWatcher
+
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    gc.enable()
+    app_module.after_fork()
+
+    watcher = None
+    if app_module.engine:
+        watcher = ActiveVersionWatcher(app_module.registry, app_module.engine, interval=args.swap_poll).start()
+
+    config = uvicorn.Config(
+        app_module.app, log_level=args.log_level, access_log=not args.no_access_log,
+        timeout_graceful_shutdown=SHUTDOWN_GRACE
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+    if watcher:
+        watcher.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MedCognis multi-worker server")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--swap-poll', type=float, default=2.0, help="seconds between registry checks per worker")
+    parser.add_argument('--log-level', default='info')
+    parser.add_argument('--no-access-log', action='store_true')
+    args = parser.parse_args()
+
+    # app.py resolves the DB, static files and data/ relative to Models/
+    os.chdir(BASE_DIR)
+    sys.path.insert(0, BASE_DIR)
+
+    # No collections while the shared heap is being built; freeze it before forking
+    # so workers' GC passes never write to (and un-share) the parent's pages
+    gc.disable()
+    import app as app_module
+    if app_module.model_metrics:
+        app_module.model_metrics.wait_idle()
+
+    sock = build_socket(args.host, args.port)
+    gc.collect()
+    gc.freeze()
+
+    children = {}   # pid -> start time
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(app_module, sock, args)
+            except BaseException as e:
+                print(f"Worker {os.getpid()} crashed: {e}")
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = time.monotonic()
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for _ in range(args.workers):
+        spawn()
+    print(f"✅ Serving on {args.host}:{args.port} with {args.workers} workers (model {app_module.engine.model_version if app_module.engine else 'not loaded'})")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        started = children.pop(pid, None)
+        if stopping or started is None:
+            continue
+        print(f"Worker {pid} exited (status {status}), restarting")
+        if time.monotonic() - started < MIN_WORKER_UPTIME:
+            time.sleep(MIN_WORKER_UPTIME)
+        spawn()
+
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+# The backend is a flat set of modules in Models/, imported by name like app.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import ConnectionPool, migrate, PATIENT_INSERT_SQL, risk_priority
+
+
+def patient_params(risk_level="Low", department="General Medicine", user_id=None):
+    return (user_id, 40, "Male", "Fever", 120, 80, 37.0, 98, 2, "Alert", "None",
+            risk_level, department, "91.00%", risk_priority(risk_level))
+
+
+@pytest.fixture
+def pool(tmp_path):
+    """A migrated scratch patients database."""
+    pool = ConnectionPool(str(tmp_path / "patients.db"))
+    migrate(pool)
+    yield pool
+    pool.close()
+
+
+@pytest.fixture
+def add_patients(pool):
+    def add(rows):
+        with pool.transaction() as conn:
+            return [conn.execute(PATIENT_INSERT_SQL, params).lastrowid for params in rows]
+    return add
@@ -0,0 +1,76 @@
+from archive import PatientArchiver, partition_name
+from conftest import patient_params
+from patient_stats import PatientStats
+
+
+def backdate(pool, timestamps, status='Completed'):
+    """Give visits an old arrival time and a visit status."""
+    with pool.transaction() as conn:
+        conn.executemany("UPDATE patients SET timestamp = ?, visit_status = ? WHERE id = ?",
+                         [(timestamp, status, patient_id) for patient_id, timestamp in timestamps.items()])
+
+
+def rows_by_id(conn, table):
+    return {row['id']: dict(row) for row in conn.execute(f"SELECT * FROM {table}")}
+
+
+def test_completed_visits_move_to_monthly_partitions(pool, add_patients):
+    ids = add_patients([patient_params(risk_level=("High", "Low")[i % 2], user_id=1 if i < 3 else None)
+                        for i in range(8)])
+    backdate(pool, {ids[0]: '2026-01-05 10:00:00', ids[1]: '2026-01-20 10:00:00', ids[2]: '2026-02-03 09:00:00',
+                    ids[3]: '2026-02-10 09:00:00', ids[4]: '2026-02-11 09:00:00'})
+    # Old but still waiting, and completed just now: both stay hot
+    backdate(pool, {ids[5]: '2026-01-06 10:00:00'}, status='Waiting')
+    with pool.transaction() as conn:
+        conn.execute("UPDATE patients SET visit_status = 'Completed' WHERE id = ?", (ids[6],))
+    with pool.connection() as conn:
+        before = rows_by_id(conn, 'patients')
+
+    archiver = PatientArchiver(pool, batch=2)
+    assert archiver.run_once() == 5
+    assert archiver.run_once() == 0
+
+    january, february = partition_name('2026_01'), partition_name('2026_02')
+    with pool.connection() as conn:
+        assert sorted(rows_by_id(conn, 'patients')) == ids[5:]
+        assert rows_by_id(conn, january) == {i: before[i] for i in ids[:2]}
+        assert rows_by_id(conn, february) == {i: before[i] for i in ids[2:5]}
+        # Moved visits are still found by id, through the partition id ranges
+        assert dict(archiver.find(conn, ids[3])) == before[ids[3]]
+        assert dict(archiver.find(conn, ids[7])) == before[ids[7]]
+        assert archiver.find(conn, ids[-1] + 100) is None
+
+    partitions = {p['name']: (p['month'], p['rows'], p['min_id'], p['max_id']) for p in archiver.partitions()}
+    assert partitions == {january: ('2026_01', 2, ids[0], ids[1]), february: ('2026_02', 3, ids[2], ids[4])}
+    # Only the partitions holding user 1's visits are read for their history
+    assert archiver.tables_for_user(1) == ['patients', february, january]
+    assert archiver.tables_for_user(2) == ['patients']
+    assert archiver.stats()["moved"] == 5 and archiver.stats()["runs"] == 2
+
+
+def test_archiving_leaves_dashboard_counters_unchanged(pool, add_patients):
+    ids = add_patients([patient_params(risk_level=("High", "Medium", "Low")[i % 3],
+                                       department=("Cardiology", "Neurology")[i % 2]) for i in range(12)])
+    backdate(pool, {patient_id: '2026-03-01 08:00:00' for patient_id in ids[:9]})
+    stats = PatientStats(pool)
+    before = stats.summary()
+    with pool.connection() as conn:
+        rollups = conn.execute("SELECT * FROM stats_rollups ORDER BY 1, 2, 3, 4").fetchall()
+        version = conn.execute("SELECT count FROM stats_counters WHERE metric = '_meta'").fetchone()[0]
+
+    assert PatientArchiver(pool).run_once() == 9
+
+    after = stats.summary()
+    for figure in ("risk_distribution", "department_load", "visit_status"):
+        assert after[figure] == before[figure]
+    assert before["visit_status"] == {"Completed": 9, "Waiting": 3}
+    with pool.connection() as conn:
+        assert conn.execute("SELECT * FROM stats_rollups ORDER BY 1, 2, 3, 4").fetchall() == rollups
+        # The version still moves, so cached dashboards drop archived rows from the recent list
+        assert conn.execute("SELECT count FROM stats_counters WHERE metric = '_meta'").fetchone()[0] > version
+    assert {patient['id'] for patient in after["recent_patients"]} == set(ids[9:])
+
+    # Deleting a visit that is not completed still takes it off the counters
+    with pool.transaction() as conn:
+        conn.execute("DELETE FROM patients WHERE id = ?", (ids[9],))
+    assert stats.summary()["visit_status"] == {"Completed": 9, "Waiting": 2}
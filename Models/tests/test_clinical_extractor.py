@@ -0,0 +1,40 @@
+import pytest
+
+from clinical_extractor import EXTRACTOR
+
+
+def test_affirmation_after_a_comma_ends_the_negation():
+    entities = EXTRACTOR.extract("Patient denies nausea, reports chest pain. BP 150/90, HR 100")
+    assert entities["symptoms"] == ["Chest Pain"]
+    assert entities["negated_symptoms"] == []
+    fields = EXTRACTOR.engine_fields(entities)
+    assert (fields["Symptoms"], fields["Blood_Pressure"], fields["Heart_Rate"]) == ("Chest Pain", 150, 100)
+
+
+@pytest.mark.parametrize("text", [
+    "Denies fever, vomiting and dizziness.",
+    "denies fever, vomiting, or dizziness",
+    "No fever, vomiting nor dizziness; chest pain since morning",
+])
+def test_a_negated_list_negates_every_item(text):
+    entities = EXTRACTOR.extract(text)
+    assert entities["negated_symptoms"] == ["Fever", "Vomiting", "Dizziness"]
+    assert "Fever" not in entities["symptoms"]
+
+
+@pytest.mark.parametrize("text", [
+    "denies fever and complains of chest pain",
+    "denies fever, c/o chest pain",
+    "denies fever, sweating and chest pain since morning",
+    "no fever, HR 110, chest pain",
+])
+def test_findings_after_the_negated_list_are_affirmed(text):
+    entities = EXTRACTOR.extract(text)
+    assert entities["symptoms"] == ["Chest Pain"]
+    assert entities["negated_symptoms"] == ["Fever"]
+
+
+def test_a_new_cue_starts_a_new_scope():
+    entities = EXTRACTOR.extract("c/o chest pain, no fever, no vomiting. Patient has dizziness")
+    assert entities["symptoms"] == ["Chest Pain", "Dizziness"]
+    assert entities["negated_symptoms"] == ["Fever", "Vomiting"]
@@ -0,0 +1,118 @@
+import itertools
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import ehr_cache
+from clinical_extractor import ClinicalExtractor, EXTRACTOR_VERSION, SYMPTOM_SYNONYMS
+from ehr_cache import EhrParseCache
+from generate_data_v2 import DEPARTMENTS, CONDITIONS
+
+
+def result(name):
+    return {"status": "success", "data": {"Symptoms": name}, "raw_text_preview": name * 50}
+
+
+ENTRY_BYTES = len(json.dumps(result("a"), separators=(',', ':')))
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "ehr_cache.db")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Strictly increasing last_used values, so LRU order never depends on timer resolution
+    ticks = itertools.count(1000)
+    monkeypatch.setattr(ehr_cache, "time", SimpleNamespace(time=lambda: float(next(ticks))))
+
+
+def disk_digests(cache):
+    with cache.pool.connection() as conn:
+        return {row['digest'] for row in conn.execute("SELECT digest FROM ehr_parse_cache")}
+
+
+def test_entries_survive_in_the_shared_disk_tier(cache_path):
+    writer = EhrParseCache(cache_path, version=1)
+    writer.put("d1", "pdf:50", result("a"))
+    assert writer.get("d1", "pdf:50") == (result("a"), "memory")
+
+    # Another worker (or a restart): empty memory tier, same file
+    reader = EhrParseCache(cache_path, version=1)
+    try:
+        assert reader.get("d1", "pdf:50") == (result("a"), "disk")
+        assert reader.get("d1", "pdf:50") == (result("a"), "memory")
+        assert reader.get("d1", "text") == (None, None)
+        assert reader.stats()["disk"]["hits"] == 1 and reader.stats()["disk"]["misses"] == 1
+    finally:
+        reader.close()
+        writer.close()
+
+
+def test_new_extractor_version_misses_and_purges_old_entries(cache_path):
+    old = EhrParseCache(cache_path, version=1)
+    old.put("d1", "pdf:50", result("a"))
+    old.put("d2", "text", result("b"))
+    old.close()
+
+    new = EhrParseCache(cache_path, version=2)
+    try:
+        assert new.stats()["disk"]["purged_old_versions"] == 2
+        assert new.stats()["disk"]["entries"] == 0
+        assert new.get("d1", "pdf:50") == (None, None)
+        new.put("d1", "pdf:50", result("c"))
+    finally:
+        new.close()
+
+    # A process still on the old version never reads the newer result as its own
+    stale = EhrParseCache(cache_path, version=1)
+    try:
+        assert stale.stats()["disk"]["purged_old_versions"] == 1
+        assert stale.get("d1", "pdf:50") == (None, None)
+    finally:
+        stale.close()
+
+
+def test_vocabulary_changes_give_a_new_version_and_invalidate_entries(cache_path):
+    symptoms = [symptom for department_symptoms in DEPARTMENTS.values() for symptom in department_symptoms]
+    assert ClinicalExtractor(symptoms, CONDITIONS).version == EXTRACTOR_VERSION
+    changed = {
+        ClinicalExtractor(symptoms + ['Hiccups'], CONDITIONS).version,
+        ClinicalExtractor(symptoms, CONDITIONS + ['Epilepsy']).version,
+        ClinicalExtractor(symptoms, CONDITIONS, dict(SYMPTOM_SYNONYMS, giddiness='Dizziness')).version,
+    }
+    assert len(changed) == 3 and EXTRACTOR_VERSION not in changed
+
+    cache = EhrParseCache(cache_path)
+    cache.put("d1", "pdf:50", result("a"))
+    cache.close()
+    for version in changed:
+        cache = EhrParseCache(cache_path, version=version)
+        try:
+            assert cache.get("d1", "pdf:50") == (None, None)
+        finally:
+            cache.close()
+    cache = EhrParseCache(cache_path)
+    try:
+        assert cache.stats()["disk"]["entries"] == 0
+    finally:
+        cache.close()
+
+
+def test_disk_tier_evicts_least_recently_used_first(cache_path, clock):
+    # Room for three entries; one memory slot, so reads reach the disk tier
+    cache = EhrParseCache(cache_path, disk_max_bytes=3 * ENTRY_BYTES, version=1, memory_max_entries=1)
+    try:
+        for digest in ("d1", "d2", "d3"):
+            cache.put(digest, "pdf:50", result("a"))
+        assert cache.get("d1", "pdf:50")[1] == "disk"    # d1 is now the most recently used
+        cache.put("d4", "pdf:50", result("a"))
+
+        assert disk_digests(cache) == {"d1", "d3", "d4"}
+        stats = cache.stats()["disk"]
+        assert stats["evictions"] == 1 and stats["bytes"] <= stats["max_bytes"]
+        assert cache.get("d2", "pdf:50") == (None, None)
+    finally:
+        cache.close()
@@ -0,0 +1,42 @@
+import asyncio
+
+from pypdf import PdfWriter
+
+from ehr_parser import parse_spooled_ehr
+
+
+class InlinePool:
+    """Stands in for the cpu process pool: runs each task in this process."""
+    max_workers = 2
+
+    def __init__(self):
+        self.tasks = []
+
+    async def run(self, fn, *args):
+        self.tasks.append((fn.__name__,) + args[1:])
+        return fn(*args)
+
+
+def blank_pdf(path, pages):
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=612, height=792)
+    with open(path, "wb") as f:
+        writer.write(f)
+    return str(path)
+
+
+def test_page_limit_below_the_task_size_caps_the_first_task(tmp_path):
+    path = blank_pdf(tmp_path / "report.pdf", 10)
+    pool = InlinePool()
+    result = asyncio.run(parse_spooled_ehr(path, "report.pdf", pool, max_pages=2, pages_per_task=4))
+    assert pool.tasks == [("scan_chunk", 0, 2)]
+    assert result["pages"]["read"] == 2 and result["pages"]["truncated"]
+
+
+def test_pdf_extension_is_matched_case_insensitively(tmp_path):
+    path = blank_pdf(tmp_path / "REPORT.PDF", 3)
+    pool = InlinePool()
+    result = asyncio.run(parse_spooled_ehr(path, "REPORT.PDF", pool))
+    assert [task[0] for task in pool.tasks] == ["scan_chunk"]
+    assert result["pages"]["total"] == 3
@@ -0,0 +1,67 @@
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+
+from explanation_service import ExplanationService
+
+
+class FakeEngine:
+    """Just enough of TriageEngine: a swappable bundle and predict_patient()."""
+
+    def __init__(self, version):
+        self.swap(version)
+        self.on_predict = None
+
+    def swap(self, version):
+        vectorizer = SimpleNamespace(transform_one=lambda record: np.array([record["Age"]], dtype=float))
+        self.bundle = SimpleNamespace(version=version, vectorizer=vectorizer)
+
+    @property
+    def model_version(self):
+        return self.bundle.version
+
+    def predict_patient(self, record, explain="exact"):
+        if self.on_predict:
+            self.on_predict()
+        return {"status": "success", "insights": [], "shap_values": {}, "model_version": self.model_version}
+
+
+def wait_idle(service):
+    with service._lock:
+        futures = list(service._pending.values())
+    for future in futures:
+        future.result(timeout=5)
+
+
+def test_explanation_from_a_swapped_in_model_is_not_cached_under_the_old_version():
+    engine = FakeEngine("v1")
+    # The bundle is hot-swapped while the explanation is being computed
+    engine.on_predict = lambda: engine.swap("v2")
+    service = ExplanationService(engine, load_record=lambda patient_id: {"Age": 40})
+    try:
+        service.submit(1, {"Age": 40})
+        wait_idle(service)
+        assert service.stats()["cached"] == 0
+
+        # The next read resubmits under the new version and gets v2's explanation
+        engine.on_predict = None
+        assert service.get(1) == {"status": "pending"}
+        wait_idle(service)
+        assert service.get(1) == {"status": "ready", "insights": [], "shap_values": {}, "model_version": "v2"}
+    finally:
+        service.shutdown()
+
+
+def test_after_fork_does_not_inherit_a_held_lock():
+    service = ExplanationService(FakeEngine("v1"))
+    try:
+        # Forked while another thread was inside a locked section
+        service._lock.acquire()
+        child = threading.Thread(target=service.after_fork, daemon=True)
+        child.start()
+        child.join(2)
+        assert not child.is_alive()
+        assert service._lock.acquire(timeout=1)
+    finally:
+        service.shutdown()
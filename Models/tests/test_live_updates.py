@@ -0,0 +1,115 @@
+import asyncio
+import re
+
+from conftest import patient_params
+from live_updates import QueueBroadcaster, Subscriber, SUBSCRIBER_BUFFER
+
+
+def frame_ids(frames):
+    return [int(event_id) for event_id in re.findall(rb"^id: (\d+)$", b"".join(frames), re.M)]
+
+
+def run(coroutine_fn):
+    return asyncio.run(coroutine_fn())
+
+
+def test_last_event_id_replays_missed_events_for_the_department(pool, add_patients):
+    ids = add_patients([patient_params(department=("Cardiology", "Neurology")[i % 2]) for i in range(10)])
+    broadcaster = QueueBroadcaster(pool)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        everyone, position = broadcaster.subscribe(loop, last_event_id=4)
+        cardiology, _ = broadcaster.subscribe(loop, "Cardiology", last_event_id=4)
+        return everyone, cardiology, position
+
+    try:
+        everyone, cardiology, position = run(main)
+    finally:
+        broadcaster.close()
+
+    assert position == len(ids)
+    assert frame_ids(everyone.frames) == list(range(5, 11))
+    # Event i is patient i's insert; odd patients went to Cardiology
+    assert frame_ids(cardiology.frames) == [5, 7, 9]
+    assert not everyone.resync and not cardiology.resync
+    # Counted per reconnect as read from the feed, before the department filter
+    assert broadcaster.stats()["replayed"] == 12
+
+
+def test_reconnect_after_pruning_gets_resync(pool, add_patients):
+    add_patients([patient_params() for _ in range(10)])
+    with pool.transaction() as conn:
+        conn.execute("DELETE FROM queue_events WHERE id <= 6")
+    broadcaster = QueueBroadcaster(pool)
+
+    async def main():
+        subscriber, position = broadcaster.subscribe(asyncio.get_running_loop(), last_event_id=3)
+        stream = broadcaster.stream(subscriber, position)
+        chunks = [await stream.__anext__(), await stream.__anext__()]
+        await stream.aclose()
+        return subscriber, chunks
+
+    try:
+        subscriber, chunks = run(main)
+    finally:
+        broadcaster.close()
+
+    # Events 4-6 are gone: nothing is replayed, the screen refetches instead
+    assert b"event: hello" in chunks[0]
+    assert b"event: resync" in chunks[1]
+    assert frame_ids(chunks[1:]) == []
+    assert not subscriber.frames
+    assert broadcaster.stats()["resyncs"] == 1
+    assert broadcaster.stats()["subscribers"] == 0
+
+
+def test_reconnect_with_more_missed_than_the_buffer_gets_resync(pool, add_patients):
+    add_patients([patient_params() for _ in range(SUBSCRIBER_BUFFER + 5)])
+    broadcaster = QueueBroadcaster(pool)
+
+    async def main():
+        return broadcaster.subscribe(asyncio.get_running_loop(), last_event_id=1)
+
+    try:
+        subscriber, _ = run(main)
+    finally:
+        broadcaster.close()
+
+    assert subscriber.resync and not subscriber.frames
+
+
+def test_slow_subscriber_drops_its_backlog_and_resyncs():
+    loop = asyncio.new_event_loop()
+    try:
+        subscriber = Subscriber(loop, buffer=3)
+        subscriber.push([(event_id, "Cardiology", f"id: {event_id}\n\n".encode()) for event_id in range(1, 6)])
+    finally:
+        loop.close()
+    # The first three filled the buffer; the fourth cleared it
+    assert subscriber.resync and subscriber.overflows == 1
+    assert frame_ids(subscriber.frames) == [4, 5]
+
+
+def test_replay_then_live_events_arrive_without_a_gap(pool, add_patients):
+    add_patients([patient_params() for _ in range(3)])
+    broadcaster = QueueBroadcaster(pool, interval=0.05)
+
+    async def main():
+        subscriber, position = broadcaster.subscribe(asyncio.get_running_loop(), last_event_id=1)
+        stream = broadcaster.stream(subscriber, position)
+        await stream.__anext__()    # hello
+        received = frame_ids([await stream.__anext__()])
+        await asyncio.to_thread(add_patients, [patient_params() for _ in range(2)])
+        broadcaster.notify()
+        while len(received) < 4:
+            received += frame_ids([await asyncio.wait_for(stream.__anext__(), 5)])
+        await stream.aclose()
+        return received
+
+    try:
+        received = run(main)
+    finally:
+        broadcaster.close()
+
+    assert received == [2, 3, 4, 5]
@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+import pagination
+from conftest import patient_params
+from database import ConnectionPool
+from pagination import KeysetQuery, encode_cursor, decode_cursor
+
+HISTORY_KEYS = (('timestamp', 'DESC'), ('id', 'DESC'))
+
+
+@pytest.fixture
+def history(pool, add_patients):
+    ids = add_patients([patient_params(user_id=7) for _ in range(45)])
+    # Timestamp ties across page / chunk boundaries; only the id breaks them
+    with pool.transaction() as conn:
+        conn.execute("UPDATE patients SET timestamp = '2026-01-0' || (id % 3 + 1) || ' 10:00:00'")
+    return ids
+
+
+def expected_order(pool):
+    with pool.connection() as conn:
+        return [row['id'] for row in conn.execute("SELECT id FROM patients ORDER BY timestamp DESC, id DESC")]
+
+
+def test_pages_cover_every_row_once_in_order(pool, history):
+    query = KeysetQuery('patients', HISTORY_KEYS, 'user_id = ?', (7,))
+    seen, cursor = [], None
+    while True:
+        with pool.connection() as conn:
+            rows, cursor = query.page(conn, cursor, 10)
+        seen.extend(row['id'] for row in rows)
+        if cursor is None:
+            break
+    assert seen == expected_order(pool)
+
+
+def test_stream_matches_pages_across_chunk_boundaries(pool, history, monkeypatch):
+    monkeypatch.setattr(pagination, 'STREAM_CHUNK_ROWS', 7)
+    query = KeysetQuery('patients', HISTORY_KEYS, 'user_id = ?', (7,), columns=('id', 'risk_level'))
+    lines = b''.join(query.iter_chunks(pool, 'ndjson')).decode().splitlines()
+    rows = [json.loads(line) for line in lines]
+    assert [row['id'] for row in rows] == expected_order(pool)
+    assert set(rows[0]) == {'id', 'risk_level'}
+
+    body = b''.join(query.iter_chunks(pool, 'json', b'{"patients":', b'}'))
+    assert [row['id'] for row in json.loads(body)['patients']] == expected_order(pool)
+
+
+def test_paused_stream_holds_no_pool_connection(pool, history, monkeypatch):
+    monkeypatch.setattr(pagination, 'STREAM_CHUNK_ROWS', 5)
+    single = ConnectionPool(pool.path, size=1)
+    query = KeysetQuery('patients', HISTORY_KEYS)
+    stalled = query.iter_chunks(single, 'ndjson')
+    next(stalled)   # a client that read one chunk and stopped
+    assert single.stats()['in_use'] == 0
+    with single.connection() as conn:   # would wait ACQUIRE_TIMEOUT if the stream held the only slot
+        assert conn.execute("SELECT COUNT(*) FROM patients").fetchone()[0] == 45
+    stalled.close()
+    single.close()
+
+
+def test_malformed_cursor_is_rejected():
+    assert decode_cursor(encode_cursor(['2026-01-01', 5]), 2) == ['2026-01-01', 5]
+    with pytest.raises(ValueError):
+        decode_cursor('not-a-cursor', 2)
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor([1]), 2)
@@ -0,0 +1,89 @@
+import sqlite3
+import threading
+
+import pytest
+
+from conftest import patient_params
+from database import ConnectionPool
+from patient_queue import WaitingQueue
+
+
+def test_concurrent_claims_across_queues_hand_out_each_patient_once(pool, add_patients):
+    risks = ("High", "Medium", "Low")
+    departments = ("Cardiology", "Neurology", "General Medicine")
+    ids = add_patients([patient_params(risks[i % 3], departments[i % 3]) for i in range(3000)])
+    # Two queue instances over one database stand in for two worker processes
+    queues = [WaitingQueue(pool), WaitingQueue(pool)]
+    claimed = []
+    lock = threading.Lock()
+
+    def doctor(queue, department):
+        while True:
+            patient = queue.claim(department)
+            if patient is None:
+                return
+            with lock:
+                claimed.append(patient['id'])
+
+    # Six doctors take anyone, two only cardiology
+    assignments = [None] * 6 + ["Cardiology"] * 2
+    threads = [threading.Thread(target=doctor, args=(queues[i % 2], department))
+               for i, department in enumerate(assignments)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(claimed) == ids
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM patients WHERE visit_status != 'Consulting'").fetchone()[0] == 0
+
+
+def test_claims_follow_priority_then_arrival(pool, add_patients):
+    low, high, medium, high_later = add_patients([
+        patient_params("Low"), patient_params("High"), patient_params("Medium"), patient_params("High")
+    ])
+    queue = WaitingQueue(pool)
+    assert [queue.claim()['id'] for _ in range(4)] == [high, high_later, medium, low]
+    assert queue.claim() is None
+
+
+def test_failed_claim_update_puts_the_patient_back(pool, add_patients):
+    (patient_id,) = add_patients([patient_params("High")])
+    impatient = ConnectionPool(pool.path, timeout=0.05)
+    queue = WaitingQueue(impatient)
+
+    blocker = sqlite3.connect(pool.path)
+    blocker.execute("BEGIN IMMEDIATE")   # another writer holds the lock past the busy timeout
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            queue.claim()
+    finally:
+        blocker.rollback()
+        blocker.close()
+
+    assert queue.sizes()["total"] == 1
+    assert queue.claim()['id'] == patient_id
+    impatient.close()
+
+
+def test_retriaged_rows_are_requeued_with_current_priority(pool, add_patients):
+    first, second = add_patients([patient_params("High", "Cardiology"), patient_params("Medium", "Cardiology")])
+    queue = WaitingQueue(pool)
+    queue.claim("Neurology")   # loads both rows, claims nothing
+    with pool.transaction() as conn:
+        conn.execute("UPDATE patients SET risk_level='Low', priority=3 WHERE id=?", (first,))
+
+    assert queue.claim()['id'] == second
+    assert queue.claim()['id'] == first
+
+
+def test_rows_moved_to_another_department_are_not_claimed_for_the_old_one(pool, add_patients):
+    (patient_id,) = add_patients([patient_params("High", "Cardiology")])
+    queue = WaitingQueue(pool)
+    queue.claim("Neurology")
+    with pool.transaction() as conn:
+        conn.execute("UPDATE patients SET department='Neurology' WHERE id=?", (patient_id,))
+
+    assert queue.claim("Cardiology") is None
+    assert queue.claim("Neurology")['id'] == patient_id
@@ -0,0 +1,93 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from database import ConnectionPool
+from write_behind import GroupCommitWriter
+
+INSERT_SQL = "INSERT INTO readings (value) VALUES (?)"
+
+
+@pytest.fixture
+def readings(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "readings.db"))
+    with pool.transaction() as conn:
+        conn.execute("CREATE TABLE readings (id INTEGER PRIMARY KEY, value INTEGER NOT NULL)")
+    yield pool
+    pool.close()
+
+
+def stored(pool):
+    with pool.connection() as conn:
+        return {row['id']: row['value'] for row in conn.execute("SELECT id, value FROM readings")}
+
+
+def test_failed_group_falls_back_to_one_row_at_a_time(readings):
+    # A long window keeps every row in one group
+    writer = GroupCommitWriter(readings, INSERT_SQL, window_ms=500, max_rows=10)
+    futures = [writer.submit((value,)) for value in (1, 2, None, 4)]
+    try:
+        rowids = [future.result(timeout=5) for future in (futures[0], futures[1], futures[3])]
+        with pytest.raises(sqlite3.IntegrityError):
+            futures[2].result(timeout=5)
+    finally:
+        writer.close()
+
+    assert stored(readings) == dict(zip(rowids, (1, 2, 4)))
+    stats = writer.stats()
+    assert stats["failed"] == 1
+    # The group's commit rolled back; each good row then committed alone
+    assert stats["rows"] == 3 and stats["commits"] == 3
+
+
+def test_close_flushes_queued_rows_in_order_before_later_inserts(readings):
+    writer = GroupCommitWriter(readings, INSERT_SQL, window_ms=5000, max_rows=1000)
+    futures = [writer.submit((value,)) for value in range(50)]
+    began = time.monotonic()
+    writer.close()
+    # The stop marker ends the open group instead of waiting out the window
+    assert time.monotonic() - began < 2.5
+    assert all(future.done() for future in futures)
+    rowids = [future.result() for future in futures]
+    assert rowids == sorted(rowids)
+
+    # After close() inserts are written synchronously, behind the flushed rows
+    late = writer.submit((50,))
+    assert late.done() and late.result() > rowids[-1]
+    assert asyncio.run(writer.insert((51,))) > late.result()
+    assert sorted(stored(readings).values()) == list(range(52))
+
+
+def test_one_group_resolves_callers_on_several_event_loops(readings):
+    writer = GroupCommitWriter(readings, INSERT_SQL, window_ms=300, max_rows=1000)
+    barrier = threading.Barrier(3)
+    results = {}
+
+    def caller(name, values):
+        async def main():
+            barrier.wait()
+            return await asyncio.gather(*(writer.insert((value,)) for value in values))
+        results[name] = asyncio.run(main())
+
+    threads = [threading.Thread(target=caller, args=(name, values))
+               for name, values in (("a", range(0, 20)), ("b", range(100, 120)))]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    plain = writer.submit((999,))
+    for thread in threads:
+        thread.join(10)
+    try:
+        assert plain.result(timeout=5)
+    finally:
+        writer.close()
+
+    rows = stored(readings)
+    assert [rows[rowid] for rowid in results["a"]] == list(range(0, 20))
+    assert [rows[rowid] for rowid in results["b"]] == list(range(100, 120))
+    assert rows[plain.result()] == 999
+    # Everyone arrived within the window: a single commit served both loops and the thread
+    assert writer.stats()["commits"] == 1
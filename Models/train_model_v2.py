@@ -6,6 +6,7 @@ from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import accuracy_score, classification_report
 import os
+from feature_vectorizer import FeatureVectorizer, FEATURE_COLUMNS, CATEGORICAL_COLUMNS
 
 # Paths
 DATA_PATH = 'data/final_triage_data_50k_v2.csv'
@@ -21,7 +22,7 @@ def train_model(data_path=DATA_PATH, model_path=MODEL_PATH):
     
     # 1. Encoders
     le_dict = {}
-    cat_cols = ['Gender', 'Symptoms', 'Consciousness', 'Pre_Existing_Conditions']
+    cat_cols = CATEGORICAL_COLUMNS
     
     # Ensure all required columns exist
     required_cols = cat_cols + ['Age', 'Blood_Pressure', 'Heart_Rate', 'Temperature', 'O2_Saturation', 'Pain_Severity', 'Risk_Level']
@@ -31,14 +32,17 @@ def train_model(data_path=DATA_PATH, model_path=MODEL_PATH):
 
     for col in cat_cols:
         le = LabelEncoder()
-        df[col] = le.fit_transform(df[col].astype(str))
+        le.fit(df[col].astype(str))
         le_dict[col] = le
+
+    # Encode through the same compiled vectorizer the engine uses at serving time
+    vectorizer = FeatureVectorizer.from_label_encoders(le_dict)
+    X = pd.DataFrame(vectorizer.transform_frame(df), columns=FEATURE_COLUMNS)
         
     # Target Encoding
     le_risk = LabelEncoder()
     df['Risk_Level'] = le_risk.fit_transform(df['Risk_Level'].astype(str))
     
-    X = df[['Age', 'Gender', 'Symptoms', 'Blood_Pressure', 'Heart_Rate', 'Temperature', 'O2_Saturation', 'Pain_Severity', 'Consciousness', 'Pre_Existing_Conditions']]
     y = df['Risk_Level']
     
     # Split
@@ -0,0 +1,122 @@
+import json
+import numpy as np
+
+
+class CompiledForest:
+    """
+    XGBoost gradient-boosted trees flattened into NumPy arrays
+    (feature index, threshold and leaf value per node).
+
+    Every tree is padded to a complete binary tree of the forest's max depth, so the
+    children of slot p are always 2p+1 (left) and 2p+2 (right). Scoring is then one
+    feature gather, one threshold gather and one compare per level for all trees and
+    rows at once - no sklearn wrapper, DMatrix or xgboost thread pool involved.
+    Leaves above the bottom level become pass-through nodes (threshold +inf, always
+    left) that carry the leaf down to the bottom row.
+    """
+
+    def __init__(self, feature, threshold, leaf_value, n_classes, max_depth, base_margin):
+        self.feature = feature          # (n_trees, n_internal) int32
+        self.threshold = threshold      # (n_trees, n_internal) float32
+        self.leaf_value = leaf_value    # (n_trees, n_leaves) float32
+        self.n_trees = feature.shape[0]
+        self.n_classes = n_classes
+        self.max_depth = max_depth
+        self.base_margin = base_margin  # (n_classes,) float32
+
+        n_internal = feature.shape[1]
+        self._tree_offsets = (np.arange(self.n_trees, dtype=np.int64) * n_internal)[np.newaxis, :]
+        self._leaf_offsets = (np.arange(self.n_trees, dtype=np.int64) * leaf_value.shape[1])[np.newaxis, :]
+        self._feature_flat = feature.ravel()
+        self._threshold_flat = threshold.ravel()
+        self._leaf_flat = leaf_value.ravel()
+        self._first_leaf_slot = n_internal
+        # gbtree with one parallel tree stores the trees class by class, round-robin
+        self.class_matrix = np.zeros((self.n_trees, n_classes), dtype=np.float32)
+        self.class_matrix[np.arange(self.n_trees), np.arange(self.n_trees) % n_classes] = 1.0
+
+    @classmethod
+    def from_booster(cls, booster, n_classes):
+        """Compile a trained xgboost Booster (gbtree, numeric splits) into flat arrays."""
+        feature_index = {name: idx for idx, name in enumerate(booster.feature_names or [])}
+
+        def split_index(split):
+            if split in feature_index:
+                return feature_index[split]
+            # Models trained without feature names dump splits as 'f<idx>'
+            return int(split[1:])
+
+        trees = [json.loads(tree_json) for tree_json in booster.get_dump(dump_format='json')]
+
+        def depth_of(node):
+            return 1 + max(depth_of(child) for child in node['children']) if 'children' in node else 0
+
+        max_depth = max(depth_of(tree) for tree in trees)
+        n_internal = 2 ** max_depth - 1
+        n_leaves = 2 ** max_depth
+
+        feature = np.zeros((len(trees), n_internal), dtype=np.int32)
+        threshold = np.full((len(trees), n_internal), np.inf, dtype=np.float32)
+        leaf_value = np.zeros((len(trees), n_leaves), dtype=np.float32)
+
+        for t, tree in enumerate(trees):
+            stack = [(tree, 0)]
+            while stack:
+                node, slot = stack.pop()
+                if slot >= n_internal:
+                    leaf_value[t, slot - n_internal] = node['leaf']
+                    continue
+                if 'leaf' in node:
+                    # Pass-through: threshold stays +inf, so the walk always goes left
+                    stack.append((node, 2 * slot + 1))
+                    continue
+                feature[t, slot] = split_index(node['split'])
+                threshold[t, slot] = node['split_condition']
+                children = {child['nodeid']: child for child in node['children']}
+                stack.append((children[node['yes']], 2 * slot + 1))
+                stack.append((children[node['no']], 2 * slot + 2))
+
+        forest = cls(feature, threshold, leaf_value, n_classes, max_depth, np.zeros(n_classes, dtype=np.float32))
+        forest.base_margin = forest._calibrate_base_margin(booster)
+        return forest
+
+    def _calibrate_base_margin(self, booster):
+        # The intercept format differs between xgboost versions (scalar vs per-class),
+        # so read it back as "booster margin minus summed leaves" on a probe row.
+        import xgboost as xgb
+        probe = np.zeros((1, booster.num_features()), dtype=np.float32)
+        margin = booster.predict(xgb.DMatrix(probe, feature_names=booster.feature_names), output_margin=True)
+        margin = np.asarray(margin, dtype=np.float32).reshape(-1)
+        return (margin - self.leaf_sum(probe)[0]).astype(np.float32)
+
+    def leaf_sum(self, X):
+        """
+        Sum of leaf values per class, shape (n_rows, n_classes), without the intercept.
+        Rows must not contain NaN (missing-value default directions are not compiled).
+        """
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        n_rows, n_features = X.shape
+        # Flat row offsets let a single take() gather each row's own feature values
+        row_offsets = (np.arange(n_rows, dtype=np.int64) * n_features)[:, np.newaxis]
+        X_flat = X.ravel()
+
+        slot = np.zeros((n_rows, self.n_trees), dtype=np.int64)
+        for _ in range(self.max_depth):
+            node = slot + self._tree_offsets
+            x = X_flat.take(row_offsets + self._feature_flat.take(node))
+            slot = 2 * slot + 1 + (x >= self._threshold_flat.take(node))
+        leaves = self._leaf_flat.take(slot - self._first_leaf_slot + self._leaf_offsets)
+        return leaves @ self.class_matrix
+
+    def predict_margin(self, X):
+        return self.leaf_sum(X) + self.base_margin
+
+    def predict_proba(self, X):
+        """Softmax over class margins - matches XGBClassifier.predict_proba (multi:softprob)."""
+        margin = self.predict_margin(X)
+        margin -= margin.max(axis=1, keepdims=True)
+        np.exp(margin, out=margin)
+        margin /= margin.sum(axis=1, keepdims=True)
+        return margin
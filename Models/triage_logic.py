@@ -1,25 +1,93 @@
 import pandas as pd
 import numpy as np
-import pickle
-import shap
 import os
-from sklearn.metrics import accuracy_score, f1_score
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sklearn.metrics import accuracy_score, f1_score, confusion_matrix, precision_recall_fscore_support
+
+from feature_vectorizer import FEATURE_COLUMNS, FEATURE_DEFAULTS
+from explainers import validate_explain_mode
+from prediction_cache import PredictionCache
+from model_registry import ModelBundle, DEFAULT_MODEL_PATH
+from safety_rules import SafetyRuleTable, DEFAULT_RULES_PATH
+from clinical_knowledge import ClinicalKnowledgeIndex, DEFAULT_KNOWLEDGE_PATH
+
+# Batches up to this size are scored by the compiled NumPy forest; beyond it
+# xgboost's multithreaded predictor is faster (see performance_bench.py --engine).
+COMPILED_MAX_ROWS = 16
+
+# /metrics: every model version is scored on the same seeded sample of the training data
+BENCHMARK_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'final_triage_data_50k_v2.csv')
+BENCHMARK_HOLDOUT_SIZE = 5000
+BENCHMARK_SEED = 42
 
 class TriageEngine:
-    def __init__(self, model_path=None):
-        if model_path is None:
-            # Default to file in same directory as this script
-            base_dir = os.path.dirname(os.path.abspath(__file__))
-            self.model_path = os.path.join(base_dir, 'triage_xgboost_v2.pkl')
-        else:
-            self.model_path = model_path
-            
-        self.model = None
-        self.le_risk = None
-        self.le_dict = None
-        self.explainer = None
+    def __init__(self, model_path=None, compile_trees=True, rules_path=None, knowledge_path=None):
+        # Default to file in same directory as this script
+        self.model_path = model_path or DEFAULT_MODEL_PATH
+        self.compile_trees = compile_trees
+
+        # HYBRID RULES: declarative safety table, evaluated before the model
+        self.safety_rules = SafetyRuleTable.load(rules_path or DEFAULT_RULES_PATH)
+        self._rule_stats_lock = threading.Lock()
+        self._rule_stats = {"rows": 0, "short_circuited": 0, "model_rows": 0, "model_seconds": 0.0, "model_seconds_saved": 0.0}
+
+        # The active ModelBundle. Requests read this reference exactly once, and swaps
+        # replace it in a single assignment, so nobody sees a half-updated model.
+        self._bundle = None
+        self._previous_bundle = None
+        self._swap_lock = threading.Lock()
+        self._loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-loader")
+        # Callbacks run with the new bundle after every swap (e.g. metrics computation)
+        self._swap_listeners = []
+
+        # Repeated vitals (kiosk retries, re-submitted forms) are served from here
+        self.prediction_cache = PredictionCache()
+
+        # Department / disease / treatment knowledge, keyed by (symptom, risk_level).
+        # Cached results embed recommendations, so an edited knowledge file drops them.
+        self.knowledge = ClinicalKnowledgeIndex(knowledge_path or DEFAULT_KNOWLEDGE_PATH, on_reload=self.prediction_cache.clear)
         self._load_model()
 
+    # Read-only views of the active bundle
+    @property
+    def bundle(self):
+        return self._bundle
+
+    @property
+    def model(self):
+        return self._bundle.model
+
+    @property
+    def le_risk(self):
+        return self._bundle.le_risk
+
+    @property
+    def le_dict(self):
+        return self._bundle.le_dict
+
+    @property
+    def vectorizer(self):
+        return self._bundle.vectorizer
+
+    @property
+    def forest(self):
+        return self._bundle.forest
+
+    @property
+    def explainers(self):
+        return self._bundle.explainers
+
+    @property
+    def model_version(self):
+        return self._bundle.version
+
+    @property
+    def previous_version(self):
+        previous = self._previous_bundle
+        return previous.version if previous else None
+
     def reload_model(self, model_path=None):
         if model_path:
             self.model_path = model_path
@@ -27,195 +95,188 @@ class TriageEngine:
         self._load_model()
 
     def _load_model(self):
+        self._swap(self._build_bundle(self.model_path))
+
+    def _build_bundle(self, model_path):
+        """Load, compile and warm a model version without touching the serving one."""
         try:
-            # Adjust path if running from root
-            if not os.path.exists(self.model_path):
-                 # Try absolute path or relative to engine folder if needed
-                 pass 
-            
-            with open(self.model_path, 'rb') as f:
-                data = pickle.load(f)
-            self.model = data['model']
-            self.le_risk = data['le_risk']
-            self.le_dict = data['le_dict']
-            
-            # Initialize SHAP explainer gracefully
-            try:
-                self.explainer = shap.TreeExplainer(self.model)
-                print("Model and SHAP explainer loaded successfully.")
-            except Exception as e:
-                print(f"Warning: SHAP explainer could not be initialized: {e}")
-                self.explainer = None
-                print("Model loaded successfully (without SHAP).")
+            bundle = ModelBundle(model_path, self.compile_trees).warm()
+            if bundle.explainers:
+                print(f"Model {bundle.version} and explainers loaded successfully.")
+            else:
+                print(f"Model {bundle.version} loaded successfully (without explanations).")
+            return bundle
         except FileNotFoundError:
-            print(f"CRITICAL ERROR: {self.model_path} file not found at {os.path.abspath(self.model_path)}!")
+            print(f"CRITICAL ERROR: {model_path} file not found at {os.path.abspath(model_path)}!")
             raise
         except Exception as e:
             print(f"CRITICAL ERROR loading model: {e}")
             raise
 
-    def get_shap_explanation(self, input_df):
+    def _swap(self, bundle):
+        with self._swap_lock:
+            self._previous_bundle, self._bundle = self._bundle, bundle
+            self.model_path = bundle.path
+        # Keys carry the version anyway; clearing just releases the old entries
+        self.prediction_cache.clear()
+        self._notify_swap(bundle)
+        return bundle.version
+
+    def after_fork(self):
+        """Fresh loader thread in a pre-forked worker (threads don't survive fork())."""
+        self._loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-loader")
+
+    def add_swap_listener(self, listener):
+        """Call `listener(bundle)` for the active bundle now and after every later swap."""
+        self._swap_listeners.append(listener)
+        if self._bundle is not None:
+            listener(self._bundle)
+
+    def _notify_swap(self, bundle):
+        for listener in self._swap_listeners:
+            try:
+                listener(bundle)
+            except Exception as e:
+                print(f"Warning: swap listener failed: {e}")
+
+    def load_model_async(self, model_path, on_swap=None):
         """
-        Calculate SHAP values for the input.
-        Returns a dict of feature items and their SHAP values.
+        Hot swap: load and warm `model_path` on a background thread, then make it active.
+        Predictions keep using the current version until the swap. Returns a Future
+        resolving to the new version; `on_swap(version)` runs right after the swap.
         """
+        def load_and_swap():
+            version = self._swap(self._build_bundle(model_path))
+            if on_swap:
+                on_swap(version)
+            return version
+        return self._loader.submit(load_and_swap)
+
+    def rollback(self):
+        """Instantly swap back to the previously active version (kept warm in memory)."""
+        with self._swap_lock:
+            if self._previous_bundle is None:
+                raise ValueError("No previous model version to roll back to.")
+            self._bundle, self._previous_bundle = self._previous_bundle, self._bundle
+            self.model_path = self._bundle.path
+            bundle = self._bundle
+        self.prediction_cache.clear()
+        self._notify_swap(bundle)
+        return bundle.version
+
+    def get_shap_explanation(self, features, pred_idx, explain='exact', bundle=None):
+        """
+        Calculate SHAP-style feature contributions towards each row's predicted class.
+        Returns an array of shape (n_rows, n_features), or None when explanations are
+        disabled ('none') or unavailable.
+        """
+        bundle = bundle or self._bundle
+        backend = bundle.explainers.get(explain)
+        if backend is None:
+            return None
         try:
-            shap_values = self.explainer.shap_values(input_df)
-            
-            # shap_values might be a list (one for each class) or a single array
-            # For multi-class XGBoost, it often returns a list.
-            # We want the values for the predicted class or just the max risk class.
-            
-            # Simplified: Just take the sum of absolute SHAP values to show "importance" 
-            # or usage specific logic for the predicted class.
-            
-            # Let's assume binary/regression or we pick the index of the predicted class later regarding implementation details.
-            # For now, let's just return the raw values mapped to columns.
-            
-            # If shap_values is a list (multi-class), we need to know which class prediction we care about.
-            # We will handle this in the main prediction flow.
-            return shap_values
+            return backend.explain(features, pred_idx)
         except Exception as e:
             print(f"SHAP Error: {e}")
             return None
 
-    def hybrid_risk_engine(self, input_df):
+    def _predict_proba(self, features, bundle):
+        """Class probabilities; small NaN-free batches skip xgboost entirely."""
+        if bundle.forest is not None and len(features) <= COMPILED_MAX_ROWS and not np.isnan(features).any():
+            return bundle.forest.predict_proba(features)
+        return bundle.model.predict_proba(features)
+
+    def hybrid_risk_engine_batch(self, features, explain='exact', bundle=None):
+        """
+        AI RISK ENGINE (vectorized): Rule-based Safety Layer first, then one predict_proba
+        and one explanation pass over the rows no rule decided.
+        Returns arrays (risk_labels, confidences, rule_hits, contributions, override_reasons, rule_names);
+        contributions is None when explanations are off, and all-zero for rule-decided rows.
+        """
+        bundle = bundle or self._bundle
+        n_rows = len(features)
+
+        # HYBRID RULES: Safety Overrides (Rule-based Layer), as masks over the whole batch
+        rules = self.safety_rules
+        rule_idx = rules.evaluate(features, bundle.vectorizer)
+        rule_hits = rule_idx >= 0
+        risk_labels = rules.risk_levels[rule_idx].copy()
+        confidences = rules.confidences[rule_idx].copy()
+        override_reasons = rules.reasons[rule_idx]
+        rule_names = rules.names[rule_idx]
+
+        # ML Prediction only for rows the rules left undecided
+        contributions = None
+        model_rows = np.flatnonzero(~rule_hits)
+        model_seconds = 0.0
+        if len(model_rows):
+            start = time.perf_counter()
+            model_features = features[model_rows]
+            probs = self._predict_proba(model_features, bundle)
+            pred_idx = np.argmax(probs, axis=1)
+            risk_labels[model_rows] = bundle.classes[pred_idx]
+            confidences[model_rows] = probs[np.arange(len(model_rows)), pred_idx]
+
+            # SHAP Values (skipped entirely for explain='none')
+            model_contributions = self.get_shap_explanation(model_features, pred_idx, explain, bundle)
+            if model_contributions is not None:
+                contributions = np.zeros((n_rows, features.shape[1]), dtype=np.float32)
+                contributions[model_rows] = model_contributions
+            model_seconds = time.perf_counter() - start
+
+        self._record_rule_stats(n_rows, int(rule_hits.sum()), len(model_rows), model_seconds)
+        return risk_labels, confidences, rule_hits, contributions, override_reasons, rule_names
+
+    def _record_rule_stats(self, n_rows, short_circuited, model_rows, model_seconds):
+        with self._rule_stats_lock:
+            stats = self._rule_stats
+            stats["rows"] += n_rows
+            stats["short_circuited"] += short_circuited
+            stats["model_rows"] += model_rows
+            stats["model_seconds"] += model_seconds
+            # Saved time is estimated from the running average model cost per row
+            if short_circuited and stats["model_rows"]:
+                stats["model_seconds_saved"] += short_circuited * stats["model_seconds"] / stats["model_rows"]
+
+    def rule_stats(self):
+        """Short-circuit counters for the safety layer."""
+        with self._rule_stats_lock:
+            stats = dict(self._rule_stats)
+        stats["short_circuit_rate"] = round(stats["short_circuited"] / stats["rows"], 4) if stats["rows"] else 0.0
+        stats["model_seconds"] = round(stats["model_seconds"], 6)
+        stats["model_seconds_saved"] = round(stats["model_seconds_saved"], 6)
+        stats["rules"] = [rule["name"] for rule in self.safety_rules.rules]
+        return stats
+
+    def hybrid_risk_engine(self, features, explain='exact', bundle=None):
         """
         AI RISK ENGINE: ML Prediction + Rule-based Safety Overrides.
+        `features` is a single encoded row of shape (1, n_features).
         """
-        # ML Prediction
-        probs = self.model.predict_proba(input_df)[0]
-        pred_idx = np.argmax(probs)
-        risk_label = self.le_risk.inverse_transform([pred_idx])[0]
-        confidence = float(np.max(probs))
-        
-        # SHAP Values
-        shap_values = self.get_shap_explanation(input_df)
-        
+        risk_labels, confidences, rule_hits, contributions, override_reasons, rule_names = self.hybrid_risk_engine_batch(features, explain, bundle)
+
         feature_contributions = {}
-        try:
-            # Handle SHAP output structure (can vary by model type/version)
-            if isinstance(shap_values, list):
-                # Multi-class: list of arrays
-                class_shap = shap_values[pred_idx]
-            else:
-                # Single output or binary
-                class_shap = shap_values
-
-            # Ensure we have a 1D array of feature values for this single sample
-            if hasattr(class_shap, 'shape'):
-                print(f"DEBUG: SHAP shape: {class_shap.shape}")
-                
-                # Case 1: (1, features, classes) - XGBoost raw output often 3D
-                if len(class_shap.shape) == 3:
-                    # class_shap is actually all shap values. We need to slice.
-                    # shape: (1, 7, 3) -> Take row 0, all features, specific class index
-                    # But wait, if 'shap_values' was the 3D array, we need to index it by pred_idx
-                    # If we are here, 'class_shap' = 'shap_values' because it wasn't a list.
-                    
-                    # So we take [0, :, pred_idx]
-                    vals = class_shap[0, :, pred_idx]
-                    
-                # Case 2: (1, features)
-                elif len(class_shap.shape) == 2:
-                    vals = class_shap[0]
-                    
-                # Case 3: (features,)
-                elif len(class_shap.shape) == 1:
-                    vals = class_shap
-                else:
-                    vals = None
-                
-                if vals is not None:
-                    for idx, col in enumerate(input_df.columns):
-                        # Safe conversion to float
-                        val = vals[idx]
-                        if isinstance(val, np.ndarray):
-                            val = val.item()
-                        feature_contributions[col] = float(val)
-        except Exception as e:
-            print(f"Error processing SHAP values: {e}")
-
-
-        # HYBRID RULES: Safety Overrides (Rule-based Layer)
-        is_rule_triggered = False
-        override_reason = None
-        
-        if input_df['Blood_Pressure'].values[0] >= 180:
-            risk_label, confidence, is_rule_triggered = "High", 1.0, True
-            override_reason = "Critical Blood Pressure (>180)"
-        elif input_df['Temperature'].values[0] >= 40.0:
-            risk_label, confidence, is_rule_triggered = "High", 1.0, True
-            override_reason = "Critical Body Temperature (>40°C)"
-        elif input_df.get('O2_Saturation', 100).values[0] < 90:
-             risk_label, confidence, is_rule_triggered = "High", 1.0, True
-             override_reason = "Critical Hypoxia (O2 < 90%)"
-        elif input_df.get('Consciousness', 0).values[0] != 0: # 0 is mapped to Alert usually, but let's check encoding
-             # Actually, encoding might vary. Let's rely on ML primarily unless it's obvious.
-             pass
-
-        return risk_label, confidence, is_rule_triggered, feature_contributions, override_reason
+        if contributions is not None and not rule_hits[0]:
+            feature_contributions = dict(zip(FEATURE_COLUMNS, contributions[0].astype(float).tolist()))
+
+        return risk_labels[0], float(confidences[0]), bool(rule_hits[0]), feature_contributions, override_reasons[0], rule_names[0]
 
     def get_dept_recommendation(self, symptom_name, risk_level):
         """
         DEPARTMENT RECOMMENDATION ENGINE: Based on symptoms and risk.
         Now includes disease prediction, treatment mapping, and doctor specialist recommendation.
+        Backed by the precomputed index from data/clinical_knowledge.json; `symptom_name`
+        may be a ';'-joined list of symptoms.
         """
-        medical_knowledge = {
-            'Chest Pain': {
-                'High': {'disease': 'Acute Coronary Syndrome', 'dept': '🚨 Cardiology (ER)', 'specialist': 'Senior Cardiologist', 'treatment': ['ECG Monitoring', 'Troponin Test', 'Aspirin']},
-                'Medium': {'disease': 'Stable Angina / Pericarditis', 'dept': '🫀 Cardiology', 'specialist': 'Cardiology Specialist', 'treatment': ['Stress Test', 'BP Monitoring', 'Follow-up']},
-                'Low': {'disease': 'Musculoskeletal Pain', 'dept': '🏥 General Medicine', 'specialist': 'General Physician', 'treatment': ['Observation', 'Pain Relief']}
-            },
-            'Fever': {
-                'High': {'disease': 'Systemic Sepsis', 'dept': '🚨 Emergency Care', 'specialist': 'Emergency Physician', 'treatment': ['IV Fluids', 'Blood Cultures', 'IV Antibiotics']},
-                'Medium': {'disease': 'Community Acquired Pneumonia', 'dept': '🌡️ Internal Medicine', 'specialist': 'Internal Medicine Specialist', 'treatment': ['Oral Antibiotics', 'Hydration', 'X-Ray']},
-                'Low': {'disease': 'Viral Syndrome', 'dept': '🏥 General Medicine', 'specialist': 'General Physician', 'treatment': ['Antipyretics', 'Rest', 'Fluids']}
-            },
-            'Cough': {
-                'High': {'disease': 'Acute Respiratory Distress', 'dept': '🚨 Pulmonology (ER)', 'specialist': 'Pulmonology Chief', 'treatment': ['O2 Therapy', 'Nebulization', 'Chest CT']},
-                'Medium': {'disease': 'Bronchitis / Asthma Flare', 'dept': '🫁 Pulmonology', 'specialist': 'Pulmonology Specialist', 'treatment': ['Inhalers', 'Steroids', 'Pulse Oximetry']},
-                'Low': {'disease': 'Upper Respiratory Infection', 'dept': '🏥 General Medicine', 'specialist': 'General Physician', 'treatment': ['Steam Inhalation', 'Cough Syrup']}
-            },
-            'Abdominal Pain': {
-                'High': {'disease': 'Acute Appendicitis / Perforation', 'dept': '🚨 Surgery (ER)', 'specialist': 'Emergency Surgeon', 'treatment': ['NPO Status', 'Abdominal CT', 'Surgical Consult']},
-                'Medium': {'disease': 'Gastroenteritis', 'dept': '🧪 Gastroenterology', 'specialist': 'Gastroenterology Specialist', 'treatment': ['IV Fluids', 'Stool Analysis', 'Antispasmodics']},
-                'Low': {'disease': 'Indigestion / Gastritis', 'dept': '🏥 General Medicine', 'specialist': 'General Physician', 'treatment': ['Antacids', 'Dietary Modification']}
-            },
-            'Numbness': {
-                'High': {'disease': 'Acute Ischemic Stroke', 'dept': '🚨 Neurology (ER)', 'specialist': 'Stroke Neurology Chief', 'treatment': ['NIH Stroke Scale', 'Brain MRI', 'TPA Eligibility']},
-                'Medium': {'disease': 'Peripheral Neuropathy', 'dept': '🧠 Neurology', 'specialist': 'Neurology Specialist', 'treatment': ['Nerve Conduction Test', 'B12 Screen']},
-                'Low': {'disease': 'Pinched Nerve', 'dept': '🏥 Orthopedics', 'specialist': 'Orthopedic Surgeon', 'treatment': ['Physical Therapy', 'Observation']}
-            },
-            'Breathlessness': {
-                'High': {'disease': 'Pulmonary Embolism / Acute CHF', 'dept': '🚨 Critical Care', 'specialist': 'Critical Care Chief', 'treatment': ['Anticoagulation', 'Diuretics', 'Echogram']},
-                'Medium': {'disease': 'COPD Exacerbation', 'dept': '🫁 Pulmonology', 'specialist': 'Pulmonology Specialist', 'treatment': ['Bronchodilators', 'Steroids']},
-                'Low': {'disease': 'Anxiety / Mild Asthma', 'dept': '🏥 General Medicine', 'specialist': 'General Physician', 'treatment': ['Breathing Exercises', 'Salbutamol']}
-            }
-        }
-
-        # Handle department override for High risk if not in map
-        if risk_level == "High" and symptom_name not in medical_knowledge:
-            return "🚨 Emergency & Critical Care", "Severe Clinical Condition", "Emergency Physician", ["Immediate Stabilization", "Critical Vitals Monitoring"]
-
-        info = medical_knowledge.get(symptom_name, {}).get(risk_level, {
-            'disease': 'General Clinical Condition',
-            'dept': '🏥 General Medicine',
-            'specialist': 'General Physician',
-            'treatment': ['Clinical Observation', 'Diagnostic Tests']
-        })
-        
-        return info['dept'], info['disease'], info['specialist'], info['treatment']
-
-
+        return self.knowledge.lookup(symptom_name, risk_level)
 
-    def calculate_benchmarks(self, csv_path='data/final_triage_data_50k_v2.csv'):
+    def calculate_benchmarks(self, csv_path=BENCHMARK_DATA_PATH, bundle=None,
+                             holdout_size=BENCHMARK_HOLDOUT_SIZE, seed=BENCHMARK_SEED):
         """
-        Calculate model performance metrics using the dataset.
+        Calculate model performance metrics on a fixed, seeded holdout of the dataset,
+        so every model version is scored on exactly the same rows.
         """
         try:
-            from sklearn.metrics import accuracy_score, f1_score, confusion_matrix
-            
             # Load Data
             if not os.path.exists(csv_path):
                  # Try finding it relative to project root
@@ -224,160 +285,167 @@ class TriageEngine:
             if not os.path.exists(csv_path):
                 return {"error": "Dataset not found for benchmarking."}
 
-            df = pd.read_csv(csv_path).sample(1000) # Use a subset for speed
+            df = pd.read_csv(csv_path)
+            df = df.sample(n=min(holdout_size, len(df)), random_state=seed)
             
             # Preprocess logic (Simplified for demo)
             req_cols = ['Age', 'Gender', 'Symptoms', 'Blood_Pressure', 'Heart_Rate', 'Temperature', 'O2_Saturation', 'Pain_Severity', 'Consciousness', 'Pre_Existing_Conditions', 'Risk_Level']
             if not all(col in df.columns for col in req_cols):
                  return {"error": "Dataset schema mismatch."}
 
-            # Helper for safe map using LabelEncoder objects
-            def safe_map(col, encoder):
-                # Convert LabelEncoder to dict for fast pandas mapping
-                mapping = dict(zip(encoder.classes_, encoder.transform(encoder.classes_)))
-                return df[col].map(mapping).fillna(0).astype(int)
-
-            # Re-create encoders if needed or use stored ones
-            if self.le_dict:
-                df['Gender'] = safe_map('Gender', self.le_dict['Gender'])
-                df['Symptoms'] = safe_map('Symptoms', self.le_dict['Symptoms'])
-                df['Pre_Existing_Conditions'] = safe_map('Pre_Existing_Conditions', self.le_dict['Pre_Existing_Conditions'])
-                if 'Consciousness' in self.le_dict:
-                    df['Consciousness'] = safe_map('Consciousness', self.le_dict['Consciousness'])
-            
-            X = df[['Age', 'Gender', 'Symptoms', 'Blood_Pressure', 'Heart_Rate', 'Temperature', 'O2_Saturation', 'Pain_Severity', 'Consciousness', 'Pre_Existing_Conditions']]
-            y_true = df['Risk_Level']
+            # Same compiled encoder as serving
+            bundle = bundle or self._bundle
+            X = bundle.vectorizer.transform_frame(df)
+            y_true = df['Risk_Level'].astype(str)
             
             # Predict
-            y_pred_idx = self.model.predict(X)
-            y_pred = self.le_risk.inverse_transform(y_pred_idx)
+            y_pred_idx = bundle.model.predict(X)
+            y_pred = bundle.le_risk.inverse_transform(y_pred_idx)
             
-            # Metrics
+            # Metrics (rows of the confusion matrix are true labels, columns predicted)
+            labels = [label for label in ['Low', 'Medium', 'High'] if label in set(bundle.classes)]
             acc = accuracy_score(y_true, y_pred)
             f1 = f1_score(y_true, y_pred, average='weighted')
+            precision, recall, class_f1, support = precision_recall_fscore_support(
+                y_true, y_pred, labels=labels, zero_division=0
+            )
+            per_class = {
+                label: {
+                    "precision": round(float(precision[i]) * 100, 2),
+                    "recall": round(float(recall[i]) * 100, 2),
+                    "f1_score": round(float(class_f1[i]) * 100, 2),
+                    "support": int(support[i])
+                }
+                for i, label in enumerate(labels)
+            }
             
             return {
                 "accuracy": round(acc * 100, 2),
                 "f1_score": round(f1 * 100, 2),
-                "labels": ['Low', 'Medium', 'High']
+                "labels": labels,
+                "per_class": per_class,
+                "confusion_matrix": confusion_matrix(y_true, y_pred, labels=labels).tolist(),
+                "holdout_size": int(len(df)),
+                "seed": seed,
+                "model_version": bundle.version
             }
 
         except Exception as e:
             print(f"Benchmark Error: {e}")
             return {"error": str(e)}
-        # symptom_name might be encoded or raw string. The UI should send raw string ideally, 
-        # but the model needs encoded. We need to handle mapping if input is raw.
-        # For this hackathon, we assume the UI sends the specific string.
-        
-        return dept_map.get(symptom_name, "🏥 General Medicine / OPD")
 
-    def predict_patient(self, data_dict):
+    def predict_patient(self, data_dict, explain='exact'):
         """
         Full Pipeline: Preprocessing -> Prediction -> Recommendation -> Explanation
+        `explain` selects the explanation backend: 'none', 'fast' or 'exact'.
         """
-        # Convert dict to DataFrame
-        # IMPORTANT: Columns must match training data order exactly
-        # Columns: Age, Gender, Symptoms, Blood_Pressure, Heart_Rate, Temperature, O2_Saturation, Pain_Severity, Consciousness, Pre_Existing_Conditions
-        
-        input_dict = {
-            'Age': [data_dict['Age']],
-            'Gender': [data_dict['Gender']],
-            'Symptoms': [data_dict['Symptoms']],
-            'Blood_Pressure': [data_dict['Blood_Pressure']],
-            'Heart_Rate': [data_dict['Heart_Rate']],
-            'Temperature': [data_dict['Temperature']],
-            'O2_Saturation': [data_dict.get('O2_Saturation', 98)],
-            'Pain_Severity': [data_dict.get('Pain_Severity', 0)],
-            'Consciousness': [data_dict.get('Consciousness', 'Alert')],
-            'Pre_Existing_Conditions': [data_dict['Pre_Existing_Conditions']]
-        }
-        df = pd.DataFrame(input_dict)
-        
-        # Preprocessing: Encode strings to numbers using saved encoders
         try:
-            # Gender
-            gender_str = data_dict.get('Gender', 'Male')
-            if self.le_dict and 'Gender' in self.le_dict:
-                 try:
-                     gender_val = self.le_dict['Gender'].transform([gender_str])[0]
-                 except:
-                     gender_val = 0 
-            else:
-                 gender_val = 0
-            df['Gender'] = gender_val
-
-            # Symptoms
-            symptom_str = data_dict.get('Symptoms', 'Fever')
-            if self.le_dict and 'Symptoms' in self.le_dict:
-                 try:
-                    symptom_val = self.le_dict['Symptoms'].transform([symptom_str])[0]
-                 except:
-                    symptom_val = 0
-            else:
-                symptom_val = 0
-            df['Symptoms'] = symptom_val
-                
-            # Pre-Existing
-            condition_str = data_dict.get('Pre_Existing_Conditions', 'None')
-            if self.le_dict and 'Pre_Existing_Conditions' in self.le_dict:
-                 try:
-                    condition_val = self.le_dict['Pre_Existing_Conditions'].transform([condition_str])[0]
-                 except:
-                    condition_val = 0
-            else:
-                condition_val = 0
-            df['Pre_Existing_Conditions'] = condition_val
-
-            # Consciousness
-            consc_str = data_dict.get('Consciousness', 'Alert')
-            if self.le_dict and 'Consciousness' in self.le_dict:
-                 try:
-                    consc_val = self.le_dict['Consciousness'].transform([consc_str])[0]
-                 except:
-                    consc_val = 0
-            else:
-                consc_val = 0 # Default alert
-            df['Consciousness'] = consc_val
+            validate_explain_mode(explain)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
 
+        # One consistent model version for the whole request, even if a swap lands mid-way
+        bundle = self._bundle
+
+        # Preprocessing: encode straight into a float32 row in training column order
+        try:
+            features = bundle.vectorizer.transform_one(data_dict)[np.newaxis, :]
         except Exception as e:
             print(f"Encoding Error: {e}")
             return {"status": "error", "message": f"Encoding Error: {e}"}
+        symptom_str = data_dict.get('Symptoms', FEATURE_DEFAULTS['Symptoms'])
+
+        cache_key = self._cache_key(bundle, features[0], symptom_str, explain)
+        cached = self.prediction_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         try:
             # Predict
-            risk, conf, rule_hit, shap_dict, override_reason = self.hybrid_risk_engine(df)
-            
-            # Recommendation
-            dept, disease, specialist, treatment = self.get_dept_recommendation(symptom_str, risk)
-            
-            # Simple Insights (Fallback or Addition)
-            insights = []
-            if override_reason:
-                insights.append(f"⚠️ {override_reason}")
-            
-            # Top SHAP contributors
-            sorted_shap = sorted(shap_dict.items(), key=lambda x: abs(x[1]), reverse=True)
-            top_factors = sorted_shap[:3] # Top 3
-            
-            for feature, impact in top_factors:
-                direction = "increased" if impact > 0 else "decreased"
-                if abs(impact) > 0.01: # Filter tiny noise
-                    insights.append(f"{feature} {direction} risk (Impact: {impact:.2f})")
-
-            return {
-                "status": "success",
-                "risk_level": risk,
-                "confidence": f"{conf*100:.2f}%",
-                "department": dept,
-                "predicted_disease": disease,
-                "recommended_specialist": specialist,
-                "curing_process": treatment,
-                "rule_triggered": rule_hit,
-                "insights": insights,
-                "shap_values": shap_dict
-            }
+            risk, conf, rule_hit, shap_dict, override_reason, rule_name = self.hybrid_risk_engine(features, explain, bundle)
+            result = self._build_result(symptom_str, risk, conf, rule_hit, shap_dict, override_reason, rule_name, bundle.version)
+            self.prediction_cache.put(cache_key, result)
+            return dict(result)
 
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
+    def _cache_key(self, bundle, feature_row, symptom_str, explain):
+        # The raw symptom string is part of the key: unknown symptoms share one encoded
+        # value but still get different department recommendations.
+        return (bundle.version, explain, symptom_str, feature_row.tobytes())
+
+    def predict_batch(self, records, explain='exact'):
+        """
+        Batch Pipeline: scores N patients with a single predict_proba and explanation pass.
+        Returns one result dict per record, in input order.
+        """
+        validate_explain_mode(explain)
+        if not records:
+            return []
+
+        bundle = self._bundle
+        features = bundle.vectorizer.transform(records)
+        symptoms = [record.get('Symptoms', FEATURE_DEFAULTS['Symptoms']) for record in records]
+
+        # Serve cached rows, then score only the misses in one vectorized pass
+        results = [None] * len(records)
+        cache_keys = [self._cache_key(bundle, features[i], symptoms[i], explain) for i in range(len(records))]
+        for i, key in enumerate(cache_keys):
+            results[i] = self.prediction_cache.get(key)
+        missing = [i for i, result in enumerate(results) if result is None]
+        if not missing:
+            return results
+
+        risks, confs, rule_hits, contributions, override_reasons, rule_names = self.hybrid_risk_engine_batch(features[missing], explain, bundle)
+
+        for j, i in enumerate(missing):
+            shap_dict = {}
+            if contributions is not None and not rule_hits[j]:
+                shap_dict = dict(zip(FEATURE_COLUMNS, contributions[j].astype(float).tolist()))
+            result = self._build_result(
+                symptoms[i], risks[j], float(confs[j]), bool(rule_hits[j]), shap_dict,
+                override_reasons[j], rule_names[j], bundle.version
+            )
+            self.prediction_cache.put(cache_keys[i], result)
+            results[i] = dict(result)
+        return results
+
+    def _build_result(self, symptom_str, risk, conf, rule_hit, shap_dict, override_reason, rule_name, model_version):
+        """
+        Recommendation + Explanation: turn one scored row into the API response dict.
+        """
+        # Recommendation
+        dept, disease, specialist, treatment = self.get_dept_recommendation(symptom_str, risk)
+
+        # Simple Insights (Fallback or Addition)
+        insights = []
+        if override_reason:
+            insights.append(f"⚠️ {override_reason}")
+
+        # Top SHAP contributors
+        sorted_shap = sorted(shap_dict.items(), key=lambda x: abs(x[1]), reverse=True)
+        top_factors = sorted_shap[:3] # Top 3
+
+        for feature, impact in top_factors:
+            direction = "increased" if impact > 0 else "decreased"
+            if abs(impact) > 0.01: # Filter tiny noise
+                insights.append(f"{feature} {direction} risk (Impact: {impact:.2f})")
+
+        return {
+            "status": "success",
+            "risk_level": risk,
+            "confidence": f"{conf*100:.2f}%",
+            "department": dept,
+            "predicted_disease": disease,
+            "recommended_specialist": specialist,
+            "curing_process": treatment,
+            "rule_triggered": rule_hit,
+            "rule_name": rule_name,
+            "insights": insights,
+            "shap_values": shap_dict,
+            "model_version": model_version
+        }
+
 # Singleton instance for simple import
-# engine = TriageEngine() 
\ No newline at end of file
+# engine = TriageEngine()
\ No newline at end of file
@@ -0,0 +1,40 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+from triage_logic import TriageEngine
+from tree_compiler import CompiledForest
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_PATH = os.path.join(BASE_DIR, 'data', 'final_triage_data_50k_v2.csv')
+
+# float32 leaf sums vs xgboost's accumulation order
+PROB_TOLERANCE = 1e-5
+
+def test_compiled_parity():
+    print("Testing compiled tree evaluator against XGBClassifier.predict_proba...")
+    engine = TriageEngine(compile_trees=False)
+    forest = CompiledForest.from_booster(engine.model.get_booster(), len(engine.le_risk.classes_))
+
+    df = pd.read_csv(DATA_PATH)
+    X = engine.vectorizer.transform_frame(df)
+
+    expected = engine.model.predict_proba(X)
+    actual = forest.predict_proba(X)
+
+    max_diff = float(np.abs(expected - actual).max())
+    label_mismatches = int((expected.argmax(axis=1) != actual.argmax(axis=1)).sum())
+    print(f"  Rows: {len(X)}, max |dp|: {max_diff:.2e}, label mismatches: {label_mismatches}")
+
+    # Single rows take the same code path as the request handler
+    single_diff = max(float(np.abs(forest.predict_proba(X[i]) - expected[i]).max()) for i in range(100))
+
+    if max_diff <= PROB_TOLERANCE and label_mismatches == 0 and single_diff <= PROB_TOLERANCE:
+        print("✅ Compiled trees match predict_proba")
+        return True
+    print(f"❌ Parity failed (single-row max |dp|: {single_diff:.2e})")
+    return False
+
+if __name__ == "__main__":
+    sys.exit(0 if test_compiled_parity() else 1)
@@ -0,0 +1,197 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+WRITE_MODES = ('sync', 'group')
+
+# Group commit: after the first queued row, wait up to this long for more
+GROUP_WINDOW_MS = 2.0
+GROUP_MAX_ROWS = 512
+
+_STOP = object()
+
+
+def _settle(settled):
+    # Resolve (future, rowid-or-exception) pairs; works for asyncio and concurrent futures
+    for future, outcome in settled:
+        if future.done():
+            continue  # caller went away
+        if isinstance(outcome, BaseException):
+            future.set_exception(outcome)
+        else:
+            future.set_result(outcome)
+
+
+class GroupCommitWriter:
+    """
+    Write-behind queue for single-row INSERTs.
+
+    mode='sync':  every insert is its own transaction, run on `executor` (one commit
+                  per request, as before).
+    mode='group': rows are queued to one writer thread, which commits everything that
+                  arrives within `window_ms` (or `max_rows`) in a single transaction.
+
+    In both modes insert() resolves only after the row's transaction has committed and
+    returns its rowid, so an acknowledged row is as durable as the connection's
+    synchronous setting makes it. If a group fails, its rows are retried one by one so
+    a bad row only fails its own caller. close() flushes the queue (call on shutdown).
+    """
+
+    def __init__(self, pool, insert_sql, mode='group', executor=None,
+                 window_ms=GROUP_WINDOW_MS, max_rows=GROUP_MAX_ROWS):
+        if mode not in WRITE_MODES:
+            raise ValueError(f"Unknown write mode '{mode}'. Use one of {WRITE_MODES}.")
+        self.pool = pool
+        self.insert_sql = insert_sql
+        self.mode = mode
+        self.executor = executor
+        self.window = window_ms / 1000.0
+        self.max_rows = max_rows
+        self._queue = queue.Queue()
+        self._thread = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self._rows = 0
+        self._commits = 0
+        self._failed = 0
+        self._commit_seconds = 0.0
+
+    def _insert_one(self, params):
+        start = time.perf_counter()
+        with self.pool.transaction() as conn:
+            rowid = conn.execute(self.insert_sql, params).lastrowid
+        self._record(1, time.perf_counter() - start)
+        return rowid
+
+    def _record(self, rows, seconds):
+        with self._lock:
+            self._rows += rows
+            self._commits += 1
+            self._commit_seconds += seconds
+
+    def _insert_alone(self, params):
+        # Rowid, or the exception to hand back to this row's caller
+        try:
+            return self._insert_one(params)
+        except Exception as e:
+            with self._lock:
+                self._failed += 1
+            return e
+
+    def submit(self, params):
+        """Queue one row; returns a concurrent.futures.Future resolving to its rowid."""
+        future = Future()
+        if self.mode == 'sync' or self._closed:
+            _settle([(future, self._insert_alone(params))])
+            return future
+        self._ensure_thread()
+        self._queue.put((params, future, None))
+        return future
+
+    async def insert(self, params):
+        """Insert one row from a coroutine and return its rowid once committed."""
+        if self.mode == 'sync' or self._closed:
+            if self.executor is not None:
+                return await self.executor.run(self._insert_one, params)
+            return await asyncio.get_running_loop().run_in_executor(None, self._insert_one, params)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._ensure_thread()
+        self._queue.put((params, future, loop))
+        return await future
+
+    def _ensure_thread(self):
+        # Started on first use, so a pre-fork parent never owns the writer thread
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_rows:
+                try:
+                    # Take whatever is already queued, then wait out the window
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+
+    def _commit(self, batch):
+        start = time.perf_counter()
+        try:
+            with self.pool.transaction() as conn:
+                outcomes = [conn.execute(self.insert_sql, params).lastrowid for params, _, _ in batch]
+            self._record(len(batch), time.perf_counter() - start)
+        except Exception:
+            # Isolate the bad row(s): everyone else still gets their insert
+            outcomes = [self._insert_alone(params) for params, _, _ in batch]
+        self._deliver(batch, outcomes)
+
+    def _deliver(self, batch, outcomes):
+        # One wake-up per event loop for the whole group instead of one per row
+        by_loop = {}
+        for (_, future, loop), outcome in zip(batch, outcomes):
+            by_loop.setdefault(loop, []).append((future, outcome))
+        for loop, settled in by_loop.items():
+            if loop is None:
+                _settle(settled)
+                continue
+            try:
+                loop.call_soon_threadsafe(_settle, settled)
+            except RuntimeError:
+                pass  # loop already closed, nobody is waiting
+
+    def stats(self):
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "window_ms": self.window * 1000,
+                "max_rows": self.max_rows,
+                "queued": self._queue.qsize(),
+                "rows": self._rows,
+                "commits": self._commits,
+                "failed": self._failed,
+                "avg_rows_per_commit": round(self._rows / self._commits, 2) if self._commits else 0.0,
+                "avg_commit_ms": round(self._commit_seconds / self._commits * 1000, 3) if self._commits else 0.0
+            }
+
+    def after_fork(self):
+        # The writer thread (if any) belongs to the parent; queued rows stay with it
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def close(self, timeout=10.0):
+        """Flush everything queued, then stop the writer thread. Later inserts run synchronously."""
+        self._closed = True
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join(timeout)
+        # Rows that raced in behind the stop marker
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                self._deliver([item], [self._insert_alone(item[0])])